@@ -0,0 +1,68 @@
+"""
+Benchmark of AbstractBatchSubmission.check_finished for output files of increasing size.
+
+The first poll of a job searches its whole output file. Later polls of an unfinished job only read the bytes appended since the
+previous poll, so their cost doesn't depend on the size of the output file. For comparison, the full scan with readlines used before
+is timed as well.
+
+Usage: python benchmarks/bench_check_finished.py [max size in MB]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from pybatchsub.slurm_submission import SlurmSubmission
+
+LINE = "x" * 99 + "\n"
+POLLS = 100
+
+
+def full_scan(path, finished_token):
+    """
+    The search for the finished token by reading all lines of the output file.
+    """
+    with open(path, "r") as f:
+        for el in f.readlines():
+            if finished_token == el.strip("\n"):
+                return True
+    return False
+
+
+def main(max_size_mb=256):
+    directory = tempfile.mkdtemp()
+    job = SlurmSubmission("bench", directory, ["echo __FINISHED__"], "00:00:02", "1000M", "bench_output.out", "bench_error.err")
+    job.jobid = 1
+
+    print("{:>10} {:>18} {:>18} {:>18}".format("size (MB)", "first poll (ms)", "next polls (ms)", "full scan (ms)"))
+    size_mb = 1
+    while size_mb <= max_size_mb:
+        with open(job.output, "w") as f:
+            for i in range(0, size_mb * 1024 * 1024 // len(LINE)):
+                f.write(LINE)
+        job.finished = False
+        job.output_offset = 0
+
+        start = time.perf_counter()
+        job.check_finished()
+        first_poll = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(0, POLLS):
+            with open(job.output, "a") as f:
+                f.write(LINE)
+            job.check_finished()
+        next_polls = (time.perf_counter() - start) / POLLS
+
+        start = time.perf_counter()
+        full_scan(job.output, job.finished_token)
+        full = time.perf_counter() - start
+
+        print("{:>10} {:>18.3f} {:>18.3f} {:>18.3f}".format(size_mb, first_poll * 1e3, next_polls * 1e3, full * 1e3))
+        size_mb *= 4
+
+    os.remove(job.output)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,53 @@
+"""
+Benchmark of the construction of jobs through BatchSubmissionFactory.
+
+The batch submission system is detected once per process, and the time and memory of each job are translated with precomputed argument
+positions. get_batch_jobs also translates every distinct pair of time and memory only once. The construction of the jobs with one factory
+per job and with get_batch_jobs is timed. The batch system is selected with PYBATCHSUB_BATCH_SYSTEM, so no scheduler is needed.
+
+Usage: python benchmarks/bench_factory.py [number of jobs]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("PYBATCHSUB_BATCH_SYSTEM", "slurm")
+
+from pybatchsub.batch_submission_factory import BatchSubmissionFactory
+
+
+def get_rows(directory, n_jobs):
+    """
+    Return the arguments of n_jobs jobs, with a few distinct times and memories.
+    """
+    return [("bench_{}".format(i), directory, ["echo {}".format(i), "echo __FINISHED__"], ["workday", "00:00:02"][i % 2], "{}G".format(1 + i % 4),\
+            "bench_output_{}.out".format(i), "bench_error_{}.err".format(i)) for i in range(0, n_jobs)]
+
+
+def construct_one_by_one(rows):
+    start = time.perf_counter()
+    for row in rows:
+        BatchSubmissionFactory(*row).get_batch_job()
+    return time.perf_counter() - start
+
+
+def construct_in_bulk(rows):
+    start = time.perf_counter()
+    BatchSubmissionFactory.get_batch_jobs(rows)
+    return time.perf_counter() - start
+
+
+def main(n_jobs=100000):
+    directory = tempfile.mkdtemp()
+    rows = get_rows(directory, n_jobs)
+    print("{:>10} {:>22} {:>22}".format("jobs", "get_batch_job (jobs/s)", "get_batch_jobs (jobs/s)"))
+    one_by_one = construct_one_by_one(rows)
+    bulk = construct_in_bulk(rows)
+    print("{:>10} {:>22.0f} {:>22.0f}".format(n_jobs, n_jobs / one_by_one, n_jobs / bulk))
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,62 @@
+"""
+Benchmark of the construction of jobs, and of writing the script of every job into its job directory.
+
+Constructing a job doesn't touch the file system; its scripts are written when it is first submitted.
+
+The scripts and their directories are prepared in-process, and a job directory shared by many jobs is only created and made writable
+once. For comparison, the construction of the same jobs with the shell commands used before (one chmod for the job directory and two
+for the script of every job) is timed as well.
+
+Usage: python benchmarks/bench_job_construction.py [number of jobs]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from pybatchsub.slurm_submission import SlurmSubmission
+
+
+class ShellSubmission(SlurmSubmission):
+    """
+    A SlurmSubmission that prepares its script by shelling out to chmod, as before.
+    """
+    def _create_submission_script(self):
+        if not os.path.exists(self.job_directory):
+            os.makedirs(self.job_directory)
+
+        os.system("chmod 777 {}".format(self.job_directory))
+        with open(self.script, "w") as f:
+            f.write("#!/bin/sh\n")
+            for c in self.commands:
+                f.write(c + "\n")
+        os.system("chmod 777 {}".format(self.script))
+        os.system("chmod 777 {}".format(self.script))
+
+
+def construct(job_class, n_jobs, materialize=True):
+    """
+    Construct n_jobs jobs of job_class in a new directory, optionally writing their scripts, and return the time it took in seconds.
+    """
+    directory = tempfile.mkdtemp()
+    start = time.perf_counter()
+    for i in range(0, n_jobs):
+        job = job_class("bench_{}".format(i), directory, ["echo {}".format(i), "echo __FINISHED__"], "00:00:02", "1000M", "bench_output_{}.out".format(i), "bench_error_{}.err".format(i))
+        if materialize:
+            job.materialize_script()
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(directory)
+    return elapsed
+
+
+def main(n_jobs=2000):
+    print("{:>10} {:>20} {:>20} {:>20}".format("jobs", "lazy (jobs/s)", "in-process (jobs/s)", "shell (jobs/s)"))
+    lazy = construct(SlurmSubmission, n_jobs, materialize = False)
+    in_process = construct(SlurmSubmission, n_jobs)
+    shell = construct(ShellSubmission, n_jobs)
+    print("{:>10} {:>20.0f} {:>20.0f} {:>20.0f}".format(n_jobs, n_jobs / lazy, n_jobs / in_process, n_jobs / shell))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,71 @@
+"""
+Benchmark of the memory used by the jobs of a large BatchSubmissionSet.
+
+Jobs are slotted, and store the paths of their files relative to their job directory, which is shared by all jobs in the same directory.
+For comparison, the memory of the same jobs with the attribute dictionary and full paths used before is measured as well.
+
+Usage: python benchmarks/bench_job_memory.py [number of jobs]
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from pybatchsub.slurm_submission import SlurmSubmission
+
+
+class DictSubmission:
+    """
+    A job with the attributes of a SlurmSubmission, stored in an attribute dictionary with full paths, as before.
+    """
+    def __init__(self, jobname, job_directory, commands, time, memory, output, error):
+        self.commands = commands
+        self.jobname = jobname
+        self.job_directory = job_directory
+        self.time = time
+        self.memory = memory
+        self.finished_token = "__FINISHED__"
+        self.in_container = False
+        self.container_script_function = None
+        self.output = os.path.join(job_directory, output)
+        self.error = os.path.join(job_directory, error)
+        self.script = os.path.join(job_directory, jobname + ".sh")
+        self.outside_of_container_script = self.script
+        self.finished = False
+        self.submitted = False
+        self.jobid = None
+        self.attempts = 0
+        self.batch_status = None
+        self.output_offset = 0
+        self.script_materialized = False
+
+
+def measure(function):
+    """
+    Return the result of function, and the memory that it allocated and kept in MB.
+    """
+    tracemalloc.start()
+    result = function()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size / 1024 / 1024
+
+
+def create_jobs(job_class, directory, n_jobs):
+    return [job_class("bench_{}".format(i), directory, ["python fit.py --seed {}".format(i), "echo __FINISHED__"], "01:00:00", "2000M",\
+            "bench_output_{}.out".format(i), "bench_error_{}.err".format(i)) for i in range(0, n_jobs)]
+
+
+def main(n_jobs=500000):
+    # a long job directory, as is typical for jobs on a shared file system
+    directory = os.path.join(tempfile.gettempdir(), "campaigns", "2024", "analysis", "systematics", "nominal")
+    jobs, slotted = measure(lambda: create_jobs(SlurmSubmission, directory, n_jobs))
+    dict_jobs, dictionary = measure(lambda: create_jobs(DictSubmission, directory, n_jobs))
+    del dict_jobs
+
+    print("{:>10} {:>20} {:>20}".format("jobs", "slotted (MB)", "dictionary (MB)"))
+    print("{:>10} {:>20.1f} {:>20.1f}".format(n_jobs, slotted, dictionary))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,47 @@
+"""
+Benchmark of the memory used by a parameter sweep, defined either as a ParametricJobSet or as one SlurmSubmission per job.
+
+A ParametricJobSet only keeps its parameter table and the state of every job in memory, so the sweep with the largest number of jobs
+is only measured for the ParametricJobSet. The memory of the list of jobs is measured for a smaller sweep, and scaled to the same number
+of jobs.
+
+Usage: python benchmarks/bench_parametric_memory.py [number of jobs]
+"""
+import sys
+import tempfile
+import tracemalloc
+
+from pybatchsub.parametric import JobTemplate, ParametricJobSet
+from pybatchsub.slurm_submission import SlurmSubmission
+
+# The number of jobs constructed one by one, for comparison.
+N_OBJECTS = 20000
+
+
+def measure(function):
+    """
+    Return the result of function, and the memory that it allocated and kept in MB.
+    """
+    tracemalloc.start()
+    result = function()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size / 1024 / 1024
+
+
+def main(n_jobs=1000000):
+    directory = tempfile.mkdtemp()
+    template = JobTemplate(SlurmSubmission, "sweep_{index}", directory, ["python fit.py --seed {seed} --alpha {alpha}", "echo __FINISHED__"], "01:00:00", "2000M",\
+            "sweep_output_{index}.out", "sweep_error_{index}.err")
+    jobset, parametric = measure(lambda: ParametricJobSet(template, {"seed": range(0, n_jobs), "alpha": [0.01 * (i % 100) for i in range(0, n_jobs)]}))
+
+    def create_jobs():
+        return [template.create_job(i, {"seed": i, "alpha": 0.01 * (i % 100)}) for i in range(0, N_OBJECTS)]
+    jobs, objects = measure(create_jobs)
+
+    print("{:>10} {:>25} {:>25}".format("jobs", "ParametricJobSet (MB)", "list of jobs (MB)"))
+    print("{:>10} {:>25.1f} {:>25.1f}".format(n_jobs, parametric, objects * n_jobs / N_OBJECTS))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
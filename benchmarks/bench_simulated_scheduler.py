@@ -0,0 +1,61 @@
+"""
+Benchmark of the submission and polling of a large BatchSubmissionSet against the simulated slurm scheduler, without a cluster.
+
+The jobs are submitted as job arrays, and the set is polled with status_summary while all jobs are pending, and again after all of them
+have terminated. The number of calls to sbatch, squeue and sacct made by the library is reported with the time of each phase.
+
+Usage: python benchmarks/bench_simulated_scheduler.py [number of jobs] [latency of a command in seconds] [fraction of jobs that fail]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from pybatchsub.batch_submission import BatchSubmissionSet
+from pybatchsub.simulator import SchedulerSimulator
+from pybatchsub.slurm_submission import SlurmSubmission
+
+
+def main(n_jobs=100000, latency=0.0, job_failure_rate=0.01):
+    os.environ.setdefault("USER", "benchmark")
+    directory = tempfile.mkdtemp()
+    jobs = [SlurmSubmission("bench_{}".format(i), directory, ["echo {}".format(i), "echo __FINISHED__"], "00:00:02", "1000M",\
+            "bench_output_{}.out".format(i), "bench_error_{}.err".format(i)) for i in range(0, n_jobs)]
+    jobset = BatchSubmissionSet(jobs)
+
+    with SchedulerSimulator(tick = None, pending_time = 3600, latency = latency, job_failure_rate = job_failure_rate) as simulator:
+        start = time.perf_counter()
+        jobset.submit(array = True)
+        submission = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pending = jobset.status_summary()
+        pending_poll = time.perf_counter() - start
+
+        simulator.configure(pending_time = 0)
+        scheduler = simulator.get_scheduler()
+        scheduler._connection.execute("UPDATE jobs SET start = 0, end = 0")
+        start = time.perf_counter()
+        scheduler.advance()
+        termination = time.perf_counter() - start
+
+        SlurmSubmission.invalidate_job_queue()
+        start = time.perf_counter()
+        terminated = jobset.status_summary()
+        terminated_poll = time.perf_counter() - start
+
+        calls = {command: scheduler.get_counter("calls_{}".format(command)) for command in ["sbatch", "squeue", "sacct"]}
+        scheduler.close()
+
+    print("{} jobs, {} s latency per command".format(n_jobs, latency))
+    print("{:<40} {:>10.2f} s".format("submission as job arrays", submission))
+    print("{:<40} {:>10.2f} s  {}".format("status_summary, all pending", pending_poll, pending.counts))
+    print("{:<40} {:>10.2f} s".format("termination of all jobs (simulator)", termination))
+    print("{:<40} {:>10.2f} s  {}".format("status_summary, all terminated", terminated_poll, terminated.counts))
+    print("calls to the scheduler: {}".format(calls))
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(*[float(arg) if "." in arg else int(arg) for arg in sys.argv[1:]])
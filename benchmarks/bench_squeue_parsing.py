@@ -0,0 +1,87 @@
+"""
+Benchmark of the parsing of the queue of slurm.
+
+The queue used to be read with all default columns of squeue, decoded and split into lines in memory, and then parsed. It is now read
+with only the jobid column and without header, and parsed line by line from the pipe of the squeue process. Both are timed on a queue
+with as many lines as given, a tenth of which are array tasks, printed by cat in place of squeue. The peak memory of the parsing is
+measured with tracemalloc, in a separate run.
+
+Usage: python benchmarks/bench_squeue_parsing.py [number of lines]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pybatchsub.slurm_submission import parse_jobid, parse_queue_stream
+from pybatchsub.utils import do_multiple_subprocess_attempts, stream_subprocess_output, RetryPolicy
+
+HEADER = "JOBID     USER              ACCOUNT           NAME  ST  TIME_LEFT NODES CPUS TRES_PER_N MIN_MEM NODELIST (REASON) \n"
+LINE = "{}  user      def-account_cpu        test.sh  PD       1:00     1    1        N/A   1000M  (Priority) \n"
+
+
+def parse_queue_output_in_memory(long_info):
+    """
+    The former parsing of the full output of squeue.
+    """
+    long_info = long_info.decode("utf-8")
+    long_info = long_info.rstrip("\n")
+    lines = long_info.split("\n")
+    if len(lines) < 2: return set()
+    lines = lines[1:] #remove the header line
+    lines = [l.strip() for l in lines]
+    job_ids = set()
+    for l in lines:
+        job_ids.update(parse_jobid(l.split(" ")[0]))
+    return job_ids
+
+
+def write_queues(directory, n_lines):
+    """
+    Write the output of squeue with the default columns and with the jobid column only, and return the paths of both.
+    """
+    jobids = ["{}_{}".format(9000000, i) if i % 10 == 0 else str(10000000 + i) for i in range(0, n_lines)]
+    full = os.path.join(directory, "squeue_full.txt")
+    with open(full, "w") as f:
+        f.write(HEADER)
+        f.writelines(LINE.format(jobid) for jobid in jobids)
+    narrow = os.path.join(directory, "squeue_jobids.txt")
+    with open(narrow, "w") as f:
+        f.writelines(jobid + "\n" for jobid in jobids)
+    return full, narrow
+
+
+def measure(function):
+    """
+    Return the result, the time in seconds and the peak of the memory allocated by Python in MB of function. The peak is measured in a
+    second call, since tracemalloc slows the allocations down.
+    """
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(n_lines=500000):
+    directory = tempfile.mkdtemp()
+    full, narrow = write_queues(directory, n_lines)
+    policy = RetryPolicy(max_attempts = 1)
+
+    in_memory, in_memory_time, in_memory_peak = measure(lambda: parse_queue_output_in_memory(do_multiple_subprocess_attempts(["cat", full], retry_policy = policy)))
+    streamed, streamed_time, streamed_peak = measure(lambda: stream_subprocess_output(["cat", narrow], parse_queue_stream, retry_policy = policy))
+    assert in_memory == streamed
+
+    print("{:>10} {:>30} {:>10} {:>15}".format("lines", "parsing", "time (s)", "peak (MB)"))
+    print("{:>10} {:>30} {:>10.3f} {:>15.1f}".format(n_lines, "all columns, in memory", in_memory_time, in_memory_peak))
+    print("{:>10} {:>30} {:>10.3f} {:>15.1f}".format(n_lines, "jobid column, streamed", streamed_time, streamed_peak))
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,79 @@
+"""
+Benchmark of BatchSubmissionSet.status_summary for a large set of submitted jobs, half of which are in the queue and half of which are
+known to be finished.
+
+For comparison, the counts are also computed by checking every job with check_running and check_finished, as a loop over the jobs
+using the existing methods would. If numpy is available, the counts and indices of the summary are computed with numpy.
+
+Usage: python benchmarks/bench_status_summary.py [number of jobs]
+"""
+import sys
+import tempfile
+import time
+
+from pybatchsub.batch_submission import BatchSubmissionSet
+from pybatchsub.job_queue import LazyJobQueue
+from pybatchsub.slurm_submission import SlurmSubmission
+
+
+class QueueSubmission(SlurmSubmission):
+    """
+    A SlurmSubmission whose queue is a fixed set of jobids.
+    """
+    __slots__ = ()
+    queue = set()
+
+    def _get_job_queue(self):
+        return type(self).queue
+
+
+def count_by_loop(jobset):
+    """
+    Count the running, finished and failed jobs by checking every job.
+    """
+    queue = LazyJobQueue(jobset.jobs[0].get_job_queue)
+    running, finished, failed = 0, 0, 0
+    for job in jobset.jobs:
+        if job.check_running(job_queue = queue):
+            running += 1
+        elif job.check_finished():
+            finished += 1
+        else:
+            failed += 1
+    return running, finished, failed
+
+
+def main(n_jobs=1000000):
+    try:
+        import numpy
+        lookup = "numpy"
+    except ImportError:
+        lookup = "python"
+
+    directory = tempfile.mkdtemp()
+    QueueSubmission.use_sacct = False
+    jobs = []
+    for i in range(0, n_jobs):
+        job = QueueSubmission("bench_{}".format(i), directory, ["echo {}".format(i)], "01:00:00", "2000M", "bench_output_{}.out".format(i), "bench_error_{}.err".format(i))
+        job.submitted = True
+        job.jobid = "{}_{}".format(1000 + i // 1000, i % 1000)
+        job.finished = i % 2 == 1
+        jobs.append(job)
+    QueueSubmission.queue = {job.jobid for job in jobs if not job.finished}
+    jobset = BatchSubmissionSet(jobs)
+
+    start = time.perf_counter()
+    summary = jobset.status_summary()
+    summary_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count_by_loop(jobset)
+    loop_time = time.perf_counter() - start
+
+    print("{:>10} {:>20} {:>20} {:>20}".format("jobs", "aggregation", "status_summary (s)", "loop (s)"))
+    print("{:>10} {:>20} {:>20.3f} {:>20.3f}".format(n_jobs, lookup, summary_time, loop_time))
+    print(summary.counts)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
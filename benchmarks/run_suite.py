@@ -0,0 +1,97 @@
+"""
+Run the benchmark suite of benchmarks/suite.py, optionally saving the timings and comparing them with timings saved before.
+
+Every benchmark is run repeat times for each of its parameters, and the shortest time is kept. With --compare, the benchmarks that became
+slower than the saved timings by more than --threshold are reported, and the exit code is 1 if there are any.
+
+Usage: python benchmarks/run_suite.py [--filter substring] [--repeat N] [--save timings.json] [--compare timings.json] [--threshold 1.5]
+"""
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import suite
+
+
+def get_benchmarks(name_filter=None):
+    """
+    Return a list of (name, class, method name, parameter) for every benchmark of the suite whose name contains name_filter.
+    """
+    benchmarks = []
+    for class_name, benchmark_class in inspect.getmembers(suite, inspect.isclass):
+        if benchmark_class.__module__ != suite.__name__: continue
+        for method_name in sorted(name for name in dir(benchmark_class) if name.startswith("time_")):
+            for parameter in getattr(benchmark_class, "params", [None]):
+                name = "{}.{}[{}]".format(class_name, method_name, parameter)
+                if name_filter is None or name_filter in name:
+                    benchmarks.append((name, benchmark_class, method_name, parameter))
+    return benchmarks
+
+
+def run_benchmark(benchmark_class, method_name, parameter, repeat):
+    """
+    Return the shortest of repeat timings of a benchmark, in seconds. Setup and teardown are not timed.
+    """
+    timings = []
+    for attempt in range(0, repeat):
+        instance = benchmark_class()
+        if hasattr(instance, "setup"): instance.setup(parameter)
+        try:
+            start = time.perf_counter()
+            getattr(instance, method_name)(parameter)
+            timings.append(time.perf_counter() - start)
+        finally:
+            if hasattr(instance, "teardown"): instance.teardown(parameter)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Run the benchmark suite of pybatchsub.")
+    parser.add_argument("--filter", default = None, help = "only run the benchmarks whose name contains this substring")
+    parser.add_argument("--repeat", type = int, default = 3, help = "the number of timings of each benchmark")
+    parser.add_argument("--save", default = None, help = "save the timings to this JSON file")
+    parser.add_argument("--compare", default = None, help = "compare the timings with those saved in this JSON file")
+    parser.add_argument("--threshold", type = float, default = 1.5, help = "the ratio to the saved timing above which a benchmark regressed")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    timings = {}
+    regressions = []
+    for name, benchmark_class, method_name, parameter in get_benchmarks(args.filter):
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w") # the library prints a line per job
+        try:
+            timings[name] = run_benchmark(benchmark_class, method_name, parameter, args.repeat)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+        line = "{:<60} {:>12.6f} s".format(name, timings[name])
+        if name in baseline:
+            ratio = timings[name] / baseline[name] if baseline[name] > 0 else float("inf")
+            line += "  {:>6.2f}x".format(ratio)
+            if ratio > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(timings, f, indent = 1, sort_keys = True)
+
+    if regressions:
+        print("{} benchmarks regressed by more than {}x: {}".format(len(regressions), args.threshold, ", ".join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
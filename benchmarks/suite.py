@@ -0,0 +1,184 @@
+"""
+The benchmark suite of the hot paths of pybatchsub: job construction, submission, check_finished, parsing of the job queue and time
+translation. The benchmarks follow the conventions of asv: every class with time_* methods is a benchmark, params is the list of
+parameters with which every benchmark is run, and setup and teardown are called, with the parameter, around each of them. The scheduler
+is the one of the simulator, so no cluster is needed. Run the suite with benchmarks/run_suite.py.
+"""
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault("USER", "benchmark")
+
+import pybatchsub.batch_submission_factory as batch_submission_factory
+from pybatchsub.batch_submission import BatchSubmissionSet
+from pybatchsub.batch_submission_factory import BatchSubmissionFactory, BATCH_SYSTEM_VARIABLE, time_translation_slurm_to_condor,\
+        time_translation_condor_to_slurm, get_time_in_seconds, ORDERED_CONDOR_TIMES
+from pybatchsub.simulator import SchedulerSimulator
+from pybatchsub.slurm_submission import SlurmSubmission
+import pybatchsub.slurm_submission as slurm_submission
+import pybatchsub.condor_submission as condor_submission
+from pybatchsub.utils import memory_translation_to_slurm, memory_translation_to_condor
+
+
+def get_rows(directory, n_jobs):
+    """
+    Return the arguments of n_jobs jobs.
+    """
+    return [("bench_{}".format(i), directory, ["echo {}".format(i), "echo __FINISHED__"], "00:00:02", "1000M",\
+            "bench_output_{}.out".format(i), "bench_error_{}.err".format(i)) for i in range(0, n_jobs)]
+
+
+class Construction:
+    """
+    The construction of jobs through BatchSubmissionFactory, one factory per job and in bulk.
+    """
+    params = [1000, 10000]
+
+    def setup(self, n_jobs):
+        self.original_variable = os.environ.get(BATCH_SYSTEM_VARIABLE)
+        os.environ[BATCH_SYSTEM_VARIABLE] = "slurm"
+        batch_submission_factory.BATCH_SYSTEM = None
+        self.directory = tempfile.mkdtemp()
+        self.rows = get_rows(self.directory, n_jobs)
+
+    def teardown(self, n_jobs):
+        batch_submission_factory.BATCH_SYSTEM = None
+        if self.original_variable is None: os.environ.pop(BATCH_SYSTEM_VARIABLE, None)
+        else: os.environ[BATCH_SYSTEM_VARIABLE] = self.original_variable
+        shutil.rmtree(self.directory)
+
+    def time_get_batch_job(self, n_jobs):
+        for row in self.rows:
+            BatchSubmissionFactory(*row).get_batch_job()
+
+    def time_get_batch_jobs(self, n_jobs):
+        BatchSubmissionFactory.get_batch_jobs(self.rows)
+
+
+class SimulatedJobSet:
+    """
+    The setup of the submission benchmarks: a set of jobs, whose scripts are written, and the simulated slurm scheduler.
+    """
+    def setup(self, n_jobs):
+        self.directory = tempfile.mkdtemp()
+        self.simulator = SchedulerSimulator(tick = None, pending_time = 3600)
+        self.simulator.install()
+        self.jobset = BatchSubmissionSet([SlurmSubmission(*row) for row in get_rows(self.directory, n_jobs)])
+        self.jobset.materialize_scripts()
+
+    def teardown(self, n_jobs):
+        self.simulator.uninstall()
+        shutil.rmtree(self.directory)
+        shutil.rmtree(self.simulator.directory)
+
+
+class Submission(SimulatedJobSet):
+    """
+    BatchSubmissionSet.submit against the simulated slurm scheduler, as job arrays.
+    """
+    params = [10, 1000]
+
+    def time_submit_array(self, n_jobs):
+        self.jobset.submit(array = True)
+
+
+class SubmissionOneByOne(SimulatedJobSet):
+    """
+    BatchSubmissionSet.submit against the simulated slurm scheduler, with one call to sbatch per job.
+    """
+    params = [10, 100]
+
+    def time_submit(self, n_jobs):
+        self.jobset.submit()
+
+
+class CheckFinished:
+    """
+    BatchSubmissionSet.check_finished for 100 finished jobs whose output files have sizes in bytes given by the parameter, with the
+    finished token on the last line.
+    """
+    params = [1000, 1000000, 10000000]
+    n_jobs = 100
+
+    def setup(self, output_size):
+        self.directory = tempfile.mkdtemp()
+        self.jobs = [SlurmSubmission(*row) for row in get_rows(self.directory, self.n_jobs)]
+        line = "x" * 99 + "\n"
+        content = line * (output_size // len(line)) + "__FINISHED__\n"
+        for job in self.jobs:
+            job.jobid = 1
+            job.submitted = True
+            with open(job.output, "w") as f:
+                f.write(content)
+        self.jobset = BatchSubmissionSet(self.jobs)
+        self.original_use_sacct = SlurmSubmission.use_sacct
+        self.original_get_job_queue = SlurmSubmission._get_job_queue
+        SlurmSubmission.use_sacct = False
+        SlurmSubmission._get_job_queue = lambda job: set()
+
+    def teardown(self, output_size):
+        SlurmSubmission.use_sacct = self.original_use_sacct
+        SlurmSubmission._get_job_queue = self.original_get_job_queue
+        shutil.rmtree(self.directory)
+
+    def time_check_finished(self, output_size):
+        for job in self.jobs:
+            job.finished = False
+            job.output_offset = 0
+        self.jobset.check_finished()
+
+
+class QueueParsing:
+    """
+    The parsing of the job queue of both batch systems, for queues with as many jobs as the parameter. A tenth of the slurm jobs are array
+    tasks, and the condor jobs are split equally between the idle, running and held states.
+    """
+    params = [1000, 10000, 100000, 1000000]
+
+    def setup(self, n_jobs):
+        lines = ["JOBID     USER              ACCOUNT           NAME  ST  TIME_LEFT NODES CPUS TRES_PER_N MIN_MEM NODELIST (REASON) "]
+        for i in range(0, n_jobs):
+            jobid = "{}_{}".format(9000000, i) if i % 10 == 0 else str(10000000 + i)
+            lines.append("{}  user      def-account_cpu        test.sh  PD       1:00     1    1        N/A   1000M  (Priority) ".format(jobid))
+        self.squeue_output = ("\n".join(lines) + "\n").encode()
+        self.squeue_jobid_lines = [line.split(" ", 1)[0].encode() + b"\n" for line in lines[1:]]
+        self.classads = [{"ClusterId": 1000 + i // 100, "ProcId": i % 100, "JobStatus": [1, 2, 5][i % 3]} for i in range(0, n_jobs)]
+
+    def time_parse_slurm_queue(self, n_jobs):
+        slurm_submission.parse_queue_output(self.squeue_output)
+
+    def time_parse_slurm_queue_stream(self, n_jobs):
+        slurm_submission.parse_queue_stream(self.squeue_jobid_lines)
+
+    def time_parse_condor_queue(self, n_jobs):
+        condor_submission.parse_queue_output(self.classads)
+
+
+class Translation:
+    """
+    The translation of 10000 times and memories between slurm and condor.
+    """
+    params = [10000]
+
+    def setup(self, n):
+        self.slurm_times = ["{:02d}:{:02d}:{:02d}".format(i % 7, i % 24, i % 60) for i in range(0, n)]
+        self.condor_times = [ORDERED_CONDOR_TIMES[i % len(ORDERED_CONDOR_TIMES)] for i in range(0, n)]
+        self.memories = ["{}{}".format(1 + i % 64, "MG"[i % 2]) for i in range(0, n)]
+
+    def time_slurm_to_condor(self, n):
+        for time in self.slurm_times:
+            time_translation_slurm_to_condor(time)
+
+    def time_condor_to_slurm(self, n):
+        for time in self.condor_times:
+            time_translation_condor_to_slurm(time)
+
+    def time_get_time_in_seconds(self, n):
+        for time in self.slurm_times:
+            get_time_in_seconds(time)
+
+    def time_memory_translation(self, n):
+        for memory in self.memories:
+            memory_translation_to_slurm(memory)
+            memory_translation_to_condor(memory)
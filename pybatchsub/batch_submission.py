@@ -1,7 +1,62 @@
 from abc import ABC, abstractmethod
+from collections import namedtuple
+import asyncio
 import os
 import random
-from pybatchsub.utils import do_multiple_subprocess_attempts
+import sys
+import time
+from pybatchsub.utils import do_multiple_subprocess_attempts, find_line_in_file, map_in_parallel, prepare_directory, remove_file
+from pybatchsub.job_queue import LazyJobQueue, get_queued_mask
+
+# The states of a job, as reported by the batch system through a source other than the job queue, e.g. an event log.
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+HELD = "HELD"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+ACTIVE_STATES = {PENDING, RUNNING}
+TERMINAL_STATES = {COMPLETED, FAILED}
+
+# The bounds of the interval, in seconds, between two polls of BatchSubmissionSet.wait.
+MIN_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 600
+# The factor by which the poll interval of BatchSubmissionSet.wait grows while no job changes its state.
+POLL_BACKOFF = 1.5
+# BatchSubmissionSet.wait polls again once this fraction of the active jobs is expected to have completed.
+POLL_COMPLETION_FRACTION = 0.05
+# The number of polls made during the requested time of the shortest job, before any job has completed.
+POLLS_PER_JOB_TIME = 20
+
+# The states of the jobs of a BatchSubmissionSet in a status summary, in addition to PENDING, RUNNING and FAILED.
+NOT_SUBMITTED = "NOT_SUBMITTED"
+FINISHED = "FINISHED"
+SUMMARY_STATES = [NOT_SUBMITTED, PENDING, RUNNING, HELD, FINISHED, FAILED]
+
+BatchJobStatus = namedtuple("BatchJobStatus", ["state", "exit_code", "reason"])
+BatchJobStatus.__doc__ = """
+The status of a job as reported by the batch system.
+
+Attributes
+----------
+    state : str
+        One of PENDING, RUNNING, HELD, COMPLETED or FAILED.
+    exit_code : int or None
+        The exit code of the job, if it has terminated and the exit code is known.
+    reason : str or None
+        The reason given by the batch system for the state, e.g. the reason a job was held.
+"""
+
+StatusSummary = namedtuple("StatusSummary", ["counts", "indices"])
+StatusSummary.__doc__ = """
+The state of every job of a BatchSubmissionSet, as returned by BatchSubmissionSet.status_summary.
+
+Attributes
+----------
+    counts : dict of str to int
+        The number of jobs in each of the SUMMARY_STATES.
+    indices : dict of str to numpy.ndarray or list of int
+        The indices in BatchSubmissionSet.jobs of the jobs in each of the SUMMARY_STATES. These are numpy arrays if numpy is available.
+"""
 
 
 class BatchSubmissionSet:
@@ -13,22 +68,42 @@ class BatchSubmissionSet:
     ----------
         jobs : list of AbstractBatchSubmission
             The set of AbstractBatchSubmissions to monitor for completion and submission.
+        state_store : JobStateStore or None
+            The durable store where the state of the jobs is recorded.
 
     Methods
     -------
+        load
+            Recreate a BatchSubmissionSet from the jobs recorded in a JobStateStore.
+        save
+            Record the state of the jobs in the state store.
+        update_batch_status
+            Update the status of all jobs reported by the batch system, with one bulk update per job type.
+        status_summary
+            Return the number of jobs and their indices in each state.
         check_finished
             Return True if all jobs are not running and finished.
         submit
-            Submit all jobs to the batch system.
+            Submit all jobs to the batch system. Optionally group the jobs into job arrays.
         get_failed_jobs
             Return the list of failed jobs.
         resubmit
             Resubmit all failed jobs.
+        materialize_scripts
+            Write the scripts of all jobs that weren't written yet, optionally in parallel.
         test_job_locally
             Run a job locally.
+        submit_async
+            Submit all jobs to the batch system, without blocking the event loop.
+        as_completed_async
+            Asynchronously iterate over the jobs as they stop running.
+        wait
+            Wait until no job is active, polling at an adaptive interval, and optionally resubmit failed jobs.
+        wait_async
+            Wait until no job is running, without blocking the event loop.
     """
 
-    def __init__(self, jobs):
+    def __init__(self, jobs, state_store=None):
         """
         Initialize a BatchSubmissionSet.
 
@@ -36,6 +111,8 @@ class BatchSubmissionSet:
         ----------
             jobs : list of AbstractBatchSubmission
                 The set of AbstractBatchSubmissions to monitor for completion and submission.
+            state_store : JobStateStore (optional)
+                A durable store where the state of the jobs is recorded whenever they are submitted or checked.
 
         Returns
         -------
@@ -51,6 +128,107 @@ class BatchSubmissionSet:
             if not issubclass(job_type, AbstractBatchSubmission):
                 raise TypeError("All elements of jobs must be of type AbstractBatchSubmission")
         self.jobs = jobs
+        self.state_store = state_store
+        self.save()
+
+    @classmethod
+    def load(cls, path, container_script_function=None):
+        """
+        Reattach to the jobs recorded in a state store, e.g. after the process monitoring them was restarted. The jobs are recreated
+        with their recorded jobids and status, without writing their scripts or reading their output files. The offsets up to which
+        their output files and user logs were read are restored as recorded with their last change of state, so that the parts read
+        after it are read again. Functions are not recorded: the container_script_function of the jobs has to be given again.
+
+        Parameters
+        ----------
+            path : str
+                The path of the database of a JobStateStore.
+            container_script_function : callable, optional
+                The function creating the container scripts of the jobs that aren't written yet, e.g. a ContainerScriptCache.
+                By default, create_container_script.
+
+        Returns
+        -------
+            BatchSubmissionSet
+                The set of the recorded jobs, which records further changes to the same store.
+        """
+        from pybatchsub.state_store import JobStateStore
+        state_store = JobStateStore(path)
+        return cls(state_store.load_jobs(container_script_function), state_store = state_store)
+
+    def save(self):
+        """
+        Record the state of all jobs that changed since they were last recorded in self.state_store, if there is one.
+        """
+        if self.state_store is None: return
+        for job in self.jobs:
+            self.state_store.record(job)
+        self.state_store.flush()
+
+    def update_batch_status(self):
+        """
+        Update the batch_status of all jobs, with one bulk update per job type. See AbstractBatchSubmission.update_batch_status.
+        """
+        jobs_by_type = {}
+        for job in self.jobs:
+            jobs_by_type.setdefault(type(job), []).append(job)
+
+        for job_type, jobs_of_type in jobs_by_type.items():
+            job_type.update_batch_status(jobs_of_type)
+
+    def status_summary(self):
+        """
+        Determine the state of every job in one pass, and return the number of jobs and their indices in each state. Unlike check_finished
+        or get_failed_jobs, this doesn't stop at the first job that is running or unfinished.
+
+        The state of each job is one of:
+            NOT_SUBMITTED if the job was never submitted,
+            PENDING or RUNNING if the job is in the queue. Jobs whose batch_status is unknown are counted as RUNNING,
+            HELD if the batch system holds the job in the queue, e.g. a condor job that exceeded its memory,
+            FINISHED if the finished token was found in the output of the job,
+            FAILED if the job left the queue without finishing.
+        The queue is queried at most once, and all jobids are looked up in it at once with get_queued_mask. The output files are only read
+        for jobs that are neither known to be finished nor in the queue. If numpy is available, the counts and indices are computed with
+        numpy from an array of the states.
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+            StatusSummary
+                The counts and indices of the jobs in each state.
+        """
+        self.update_batch_status()
+
+        queued = None
+        states = []
+        for index, job in enumerate(self.jobs):
+            status = job.batch_status
+            if not job.submitted or job.jobid is None:
+                states.append(NOT_SUBMITTED)
+            elif job.finished:
+                states.append(FINISHED)
+            elif status is not None and status.state in ACTIVE_STATES:
+                states.append(status.state)
+            elif status is not None and status.state in (HELD, FAILED):
+                states.append(status.state)
+            else:
+                if status is None:
+                    if queued is None:
+                        job_queue = self.jobs[0].get_job_queue()
+                        queued = get_queued_mask([job.jobid for job in self.jobs], job_queue)
+                        held = getattr(job_queue, "held", frozenset())
+                    if queued[index]:
+                        states.append(RUNNING)
+                        continue
+                    if job.jobid in held:
+                        states.append(HELD)
+                        continue
+                states.append(FINISHED if job.check_finished() else FAILED)
+
+        self.save()
+        return get_status_summary(states)
 
     def check_finished(self):
         """
@@ -58,53 +236,107 @@ class BatchSubmissionSet:
         """
         if len(self.jobs) == 0: return True
 
+        self.update_batch_status()
         first_job = self.jobs[0]
-        queue = first_job.get_job_queue()
+        queue = LazyJobQueue(first_job.get_job_queue)
 
+        all_finished = True
         for job in self.jobs:
 
             running = job.check_running(job_queue = queue)
             if running:
-                return False
+                all_finished = False
+                break
 
             finished = job.check_finished()
             if not finished:
-                return False
+                all_finished = False
+                break
 
-        return True
+        self.save()
+        return all_finished
 
     def check_running(self):
         """
         Return True if any job is running.
         """
+        if len(self.jobs) == 0: return False
+
+        self.update_batch_status()
+        first_job = self.jobs[0]
+        queue = LazyJobQueue(first_job.get_job_queue)
+
+        any_running = False
         for job in self.jobs:
-            if job.check_running():
-                return True
-        return False
+            if job.check_running(job_queue = queue):
+                any_running = True
+                break
 
-    def submit(self):
+        self.save()
+        return any_running
+
+    def submit(self, array=False, max_workers=1):
         """
         Submit all jobs to the batch system.
+
+        Parameters
+        ----------
+            array : bool (optional)
+                If True, jobs of the same type are handed to their class's submit_array method, so that batch systems
+                supporting job arrays can submit many jobs with a single scheduler call.
+            max_workers : int (optional)
+                The maximum number of submissions in flight at once. If larger than one, the jobs are submitted from a pool of threads.
+                The rate of submissions to each batch system is further limited by the submission_rate_limiter of the job class.
+
+        Returns
+        -------
+            list of AbstractBatchSubmission
+                The jobs that were submitted, in the order of self.jobs.
         """
-        if len(self.jobs) == 0: return
+        if len(self.jobs) == 0: return []
 
+        self.update_batch_status()
         first_job = self.jobs[0]
-        queue = first_job.get_job_queue()
+        queue = LazyJobQueue(first_job.get_job_queue)
 
+        jobs_to_submit = []
         for job in self.jobs:
             running = job.check_running(job_queue = queue)
             if running:
                 continue
 
-            job.submit()
+            jobs_to_submit.append(job)
+
+        self._submit_jobs(jobs_to_submit, array = array, max_workers = max_workers)
+        return jobs_to_submit
+
+    def _submit_jobs(self, jobs, array=False, max_workers=1):
+        """
+        Submit the list of jobs, either one by one or grouped by job type through submit_array. Up to max_workers submissions
+        are made at once.
+        """
+        try:
+            if not array:
+                map_in_parallel(_submit_job, jobs, max_workers = max_workers)
+                return
+
+            jobs_by_type = {}
+            for job in jobs:
+                jobs_by_type.setdefault(type(job), []).append(job)
+
+            map_in_parallel(_submit_array, list(jobs_by_type.values()), max_workers = max_workers)
+        finally:
+            self.save()
 
     def get_failed_jobs(self):
         """
         Return the list of failed jobs.
         """
         if len(self.jobs) == 0: return []
+
+        self.update_batch_status()
         first_job = self.jobs[0]
-        queue = first_job.get_job_queue()
+        queue = LazyJobQueue(first_job.get_job_queue)
 
         failed_jobs = []
 
@@ -112,16 +344,216 @@ class BatchSubmissionSet:
             if job.check_failed(job_queue = queue):
                 failed_jobs.append(job)
 
+        self.save()
         return failed_jobs
 
-    def resubmit(self):
+    def resubmit(self, array=False, max_workers=1, escalation_policy=None):
         """
         Resubmit all failed jobs.
+
+        Parameters
+        ----------
+            array : bool (optional)
+                If True, resubmit the failed jobs as job arrays. See submit.
+            max_workers : int (optional)
+                The maximum number of submissions in flight at once. See submit.
+            escalation_policy : EscalationPolicy (optional)
+                If given, only the failed jobs selected by the policy are resubmitted, with more memory or time if they ran out of them.
+
+        Returns
+        -------
+            list of AbstractBatchSubmission
+                The jobs that were resubmitted.
         """
         failed_jobs = self.get_failed_jobs()
+        if escalation_policy is not None:
+            failed_jobs = escalation_policy.select(failed_jobs)
         for job in failed_jobs:
             print("Resubmitting job {} in directory {} with error file {}".format(job.jobname, job.job_directory, job.error))
-            job.submit()
+        self._submit_jobs(failed_jobs, array = array, max_workers = max_workers)
+        return failed_jobs
+
+    def wait(self, timeout=None, on_progress=None, max_attempts=1, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL, escalation_policy=None):
+        """
+        Wait until no job is pending or running, and optionally resubmit the jobs that failed. Held jobs are neither waited for nor
+        resubmitted, since they stay in the queue until they are released or removed.
+
+        The interval between two polls adapts to the jobs. Before any job completes, the interval is a fraction of the requested time of
+        the shortest job, such that a set of nextweek jobs is polled much less often than a set of espresso jobs. Once jobs complete,
+        the interval is chosen such that a small fraction of the active jobs is expected to complete before the next poll, given the
+        rate of completions observed so far. While no job changes its state, the interval grows by POLL_BACKOFF. The interval is always
+        between min_interval and max_interval.
+
+        Parameters
+        ----------
+            timeout : float (optional)
+                The largest number of seconds to wait. If None, wait until no job is active.
+            on_progress : function (optional)
+                A function called with the StatusSummary of the jobs after every poll.
+            max_attempts : int (optional)
+                The largest number of times that a job is submitted. Jobs that failed after fewer attempts are resubmitted.
+            min_interval : float (optional)
+                The shortest interval in seconds between two polls.
+            max_interval : float (optional)
+                The longest interval in seconds between two polls.
+            escalation_policy : EscalationPolicy (optional)
+                If given, the policy selects the failed jobs to resubmit instead of max_attempts, and increases their memory or time
+                if they ran out of them.
+
+        Returns
+        -------
+            bool
+                True if all jobs have finished, False if jobs failed, weren't submitted or were still active at the timeout.
+        """
+        from pybatchsub.batch_submission_factory import get_time_in_seconds
+        start = time.monotonic()
+
+        job_times = [get_time_in_seconds(job_time) for job_time in {job.time for job in self.jobs}]
+        job_times = [job_time for job_time in job_times if job_time is not None]
+        interval = max_interval if len(job_times) == 0 else min(job_times) / POLLS_PER_JOB_TIME
+        interval = min(max(interval, min_interval), max_interval)
+
+        previous_counts = None
+        previous_poll = None
+        while True:
+            summary = self.status_summary()
+            now = time.monotonic()
+            if on_progress is not None:
+                on_progress(summary)
+
+            counts = summary.counts
+            n_active = counts[PENDING] + counts[RUNNING]
+            if n_active == 0:
+                failed_jobs = [self.jobs[index] for index in summary.indices[FAILED]]
+                if escalation_policy is not None:
+                    retry = escalation_policy.select(failed_jobs)
+                else:
+                    retry = [job for job in failed_jobs if job.attempts < max_attempts]
+                if len(retry) == 0:
+                    return counts[FINISHED] == len(self.jobs)
+                for job in retry:
+                    print("Resubmitting job {} in directory {} with error file {}".format(job.jobname, job.job_directory, job.error))
+                self._submit_jobs(retry)
+                previous_counts, previous_poll = None, None
+                interval = min_interval
+                continue
+
+            if timeout is not None and now - start >= timeout:
+                return False
+
+            if previous_counts is not None:
+                completed = (counts[FINISHED] + counts[FAILED]) - (previous_counts[FINISHED] + previous_counts[FAILED])
+                if completed > 0:
+                    rate = completed / max(now - previous_poll, 1e-9)
+                    interval = n_active * POLL_COMPLETION_FRACTION / rate
+                elif counts == previous_counts:
+                    interval *= POLL_BACKOFF
+            interval = min(max(interval, min_interval), max_interval)
+            previous_counts, previous_poll = counts, now
+
+            sleep_time = interval if timeout is None else min(interval, max(timeout - (now - start), 0))
+            time.sleep(sleep_time)
+
+    async def submit_async(self, max_in_flight=16):
+        """
+        Submit all jobs that are not running to the batch system, without blocking the event loop.
+
+        Parameters
+        ----------
+            max_in_flight : int (optional)
+                The maximum number of submissions awaited at once. The rate of submissions to each batch system is further limited by
+                the submission_rate_limiter of the job class.
+
+        Returns
+        -------
+            list of AbstractBatchSubmission
+                The jobs that were submitted, in the order of self.jobs.
+        """
+        if len(self.jobs) == 0: return []
+
+        queue = await self.jobs[0].get_job_queue_async()
+        jobs_to_submit = [job for job in self.jobs if not job.check_running(job_queue = queue)]
+
+        semaphore = asyncio.Semaphore(max_in_flight)
+        async def submit_job(job):
+            async with semaphore:
+                if job.submission_rate_limiter is not None:
+                    await job.submission_rate_limiter.acquire_async()
+                await job.submit_async()
+
+        try:
+            await asyncio.gather(*[submit_job(job) for job in jobs_to_submit])
+        finally:
+            self.save()
+        return jobs_to_submit
+
+    async def as_completed_async(self, poll_interval=30):
+        """
+        Asynchronously iterate over the submitted jobs as they stop running, either because they finished or because they failed.
+        The batch system is polled every poll_interval seconds, and each job is yielded once.
+
+        Parameters
+        ----------
+            poll_interval : float (optional)
+                The number of seconds to wait between polls of the batch system.
+
+        Yields
+        ------
+            AbstractBatchSubmission
+                A job that is no longer running.
+        """
+        loop = asyncio.get_running_loop()
+        pending = [job for job in self.jobs if job.submitted]
+        while len(pending) > 0:
+            await loop.run_in_executor(None, self.update_batch_status)
+            queue = await pending[0].get_job_queue_async()
+
+            still_running = []
+            for job in pending:
+                if job.check_running(job_queue = queue):
+                    still_running.append(job)
+                else:
+                    yield job
+            pending = still_running
+            self.save()
+
+            if len(pending) > 0:
+                await asyncio.sleep(poll_interval)
+
+    async def wait_async(self, poll_interval=30):
+        """
+        Wait until no job is running, without blocking the event loop.
+
+        Parameters
+        ----------
+            poll_interval : float (optional)
+                The number of seconds to wait between polls of the batch system.
+
+        Returns
+        -------
+            bool
+                True if all jobs have finished.
+        """
+        async for job in self.as_completed_async(poll_interval = poll_interval):
+            pass
+        return all(job.check_finished() for job in self.jobs)
+
+    def materialize_scripts(self, max_workers=1):
+        """
+        Write the scripts of all jobs that weren't written yet. Scripts are otherwise written one at a time as the jobs are submitted,
+        which is slow for jobs that run inside of a container, since the container script of every job is created by an external tool.
+
+        Parameters
+        ----------
+            max_workers : int (optional)
+                The largest number of scripts written at the same time.
+
+        Returns
+        -------
+            None
+        """
+        jobs = [job for job in self.jobs if not job.script_materialized]
+        map_in_parallel(lambda job: job.materialize_script(), jobs, max_workers = max_workers)
 
     def test_job_locally(self):
         """
@@ -132,6 +564,73 @@ class BatchSubmissionSet:
         random_job_index = random.randint(0,len(self.jobs) - 1)
         self.jobs[random_job_index].run_local()
 
+def get_status_summary(states):
+    """
+    Count the jobs in each of the SUMMARY_STATES, and collect their indices.
+
+    Parameters
+    ----------
+        states : list of str
+            The state of every job.
+
+    Returns
+    -------
+        StatusSummary
+            The counts and indices of the jobs in each state. The indices are numpy arrays if numpy is available.
+    """
+    try:
+        import numpy
+    except ImportError:
+        indices = {state: [] for state in SUMMARY_STATES}
+        for index, state in enumerate(states):
+            indices[state].append(index)
+        return StatusSummary({state: len(indices[state]) for state in SUMMARY_STATES}, indices)
+
+    code_of_state = {state: code for code, state in enumerate(SUMMARY_STATES)}
+    codes = numpy.fromiter((code_of_state[state] for state in states), dtype=numpy.int8, count=len(states))
+    counts = numpy.bincount(codes, minlength=len(SUMMARY_STATES))
+    indices = {state: numpy.flatnonzero(codes == code) for code, state in enumerate(SUMMARY_STATES)}
+    return StatusSummary({state: int(counts[code]) for code, state in enumerate(SUMMARY_STATES)}, indices)
+
+
+def _submit_job(job):
+    """
+    Submit a single job, respecting the submission rate limit of its class.
+    """
+    if job.submission_rate_limiter is not None:
+        job.submission_rate_limiter.acquire()
+    job.submit()
+    return job.jobid
+
+
+def _submit_array(jobs):
+    """
+    Submit a list of jobs of the same class through submit_array, respecting the submission rate limit of the class.
+    """
+    job_type = type(jobs[0])
+    if job_type.submission_rate_limiter is not None:
+        job_type.submission_rate_limiter.acquire()
+    job_type.submit_array(jobs)
+    return [job.jobid for job in jobs]
+
+
+def intern_string(value):
+    """
+    Intern a string, such that the equal strings of many jobs, e.g. their job directory, share one object.
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+def get_relative_path(directory, path):
+    """
+    Return path relative to directory if it is inside of directory, otherwise return path unchanged.
+    """
+    prefix = os.path.join(directory, "")
+    if path.startswith(prefix):
+        return path[len(prefix):]
+    return path
+
+
 def create_container_script(script):
     """
     Given a shell script, create a new script that will run inside of a sinulgarity container on ComputeCanada
@@ -176,15 +675,37 @@ class AbstractBatchSubmission(ABC):
         outside_of_container_script : str
             The path of the script to run this job locally inside of the singularity container. This is useful for testing the job.
             This path is identical to self.script unless in_container is true. 
+        attempts : int
+            The number of times that this job was submitted.
+        batch_status : BatchJobStatus or None
+            The status of the job as last reported by the batch system through a source other than the job queue, if available.
+        output_offset : int
+            The number of bytes at the start of self.output that were already searched for the finished_token by check_finished.
+        script_materialized : bool
+            True if the scripts of this job were written. The scripts are written by materialize_script, when the job is first
+            submitted or run locally. Until then, self.script is the path of the script outside of the container.
+        queue_cache : JobQueueCache (class attribute)
+            The cache of the job queue shared by all jobs of this class. If None, the batch system is queried on every call to get_job_queue.
+        submission_rate_limiter : RateLimiter (class attribute)
+            Limits the rate at which a BatchSubmissionSet submits jobs of this class. If None, the rate is not limited.
+        retry_policy : RetryPolicy (class attribute)
+            The policy used to retry failed calls to the batch system. If None, the default policy of do_multiple_subprocess_attempts is used.
 
     Methods
     -------
+        materialize_script
+            Write the scripts of this job, unless they were already written.
         check_failed
             A method to check that the job has failed to execute
         check_finished
             A method to check that the job has finished executing
+        update_batch_status
+            A class method to update the batch_status of many jobs of this class at once. By default, this does nothing.
         get_job_queue
-            An abstract method to retrieve the jobqueue as a set of jobids. Needs to be implemented by any inherited classes.
+            A method to retrieve the jobqueue as a set of jobids. If the class has a queue_cache, the snapshot of the queue is shared
+            between all jobs of this class and only refreshed when it expires or is invalidated.
+        _get_job_queue
+            An abstract method to query the jobqueue as a set of jobids. Needs to be implemented by any inherited classes.
             This method is abstract because it depends on the kind of batch submission system, i.e. Slurm vs Condor.
         check_running
             A method to confirm if the job is currently running
@@ -194,35 +715,153 @@ class AbstractBatchSubmission(ABC):
         submit
             A method that submits the job to the batch system. This method calls _submit, but also resets the status of this jod. This means
             that self.finished is set to False, self.running is set to true and self.jobid is updated based on the ID returned by _submit.
+        submit_async
+            The counterpart of submit for asyncio. It awaits _submit_async, which runs _submit in an executor unless a batch
+            system overrides it.
+        get_job_queue_async
+            The counterpart of get_job_queue for asyncio.
+        submit_array
+            A class method that submits a list of jobs of this class. By default each job is submitted on its own, but batch systems that
+            support job arrays override this to submit all of the jobs with one call to the scheduler.
         run_local
             Run the job locally.
     """
 
+    # Jobs are slotted, since sets of many thousands of jobs are common. The paths of the output, error and script files are stored
+    # relative to the job directory, which is shared by all jobs in the same directory, and joined when they are accessed.
+    __slots__ = ("jobname", "job_directory", "commands", "time", "memory", "finished_token", "in_container", "container_script_function",\
+            "_output", "_error", "_script", "finished", "submitted", "jobid", "attempts", "batch_status", "output_offset", "script_materialized")
+
+    queue_cache = None
+    submission_rate_limiter = None
+    retry_policy = None
+
     def __init__(self, jobname, job_directory, commands, time, memory, output, error, finished_token="__FINISHED__", in_container=False, container_script_function = create_container_script):
         self.commands = commands
         self.jobname = jobname
-        self.job_directory = job_directory
-        self.time = time
-        self.memory = memory
-        self.finished_token = finished_token
+        self.job_directory = intern_string(job_directory)
+        self.time = intern_string(time)
+        self.memory = intern_string(memory)
+        self.finished_token = intern_string(finished_token)
         self.in_container = in_container
         self.container_script_function = container_script_function
 
+        if ".out" != output[-4:]:
+            output += ".out"
         self.output = os.path.join(job_directory, output)
-        if ".out" != self.output[-4:]:
-            self.output += ".out"
 
+        if ".err" != error[-4:]:
+            error += ".err"
         self.error = os.path.join(job_directory, error)
-        if ".err" != self.error[-4:]:
-            self.error += ".err"
 
-        self.script = os.path.join(job_directory, jobname + ".sh")
-        self.outside_of_container_script = self.script
+        self._script = None
         self.finished = False
         self.submitted = False
         self.jobid = None
+        self.attempts = 0
+        self.batch_status = None
+        self.output_offset = 0
+        self.script_materialized = False
+
+    @property
+    def output(self):
+        return os.path.join(self.job_directory, self._output)
+
+    @output.setter
+    def output(self, path):
+        self._output = get_relative_path(self.job_directory, path)
+
+    @property
+    def error(self):
+        return os.path.join(self.job_directory, self._error)
+
+    @error.setter
+    def error(self, path):
+        self._error = get_relative_path(self.job_directory, path)
+
+    @property
+    def outside_of_container_script(self):
+        return os.path.join(self.job_directory, self.jobname + ".sh")
+
+    @property
+    def script(self):
+        if self._script is None:
+            return self.outside_of_container_script
+        return os.path.join(self.job_directory, self._script)
+
+    @script.setter
+    def script(self, path):
+        self._script = None if path == self.outside_of_container_script else get_relative_path(self.job_directory, path)
+
+    def get_parameters(self):
+        """
+        Return the parameters of this job that are needed to recreate it with from_record, as a dictionary that can be serialized to JSON.
+        """
+        return {\
+            "jobname": self.jobname,\
+            "job_directory": self.job_directory,\
+            "commands": self.commands,\
+            "time": self.time,\
+            "memory": self.memory,\
+            "output": self.output,\
+            "error": self.error,\
+            "script": self.script,\
+            "finished_token": self.finished_token,\
+            "in_container": self.in_container,\
+            "script_materialized": self.script_materialized,\
+            "output_offset": self.output_offset,\
+        }
+
+    def get_state(self):
+        """
+        Return the state of this job that changes as it is submitted and monitored, as a tuple of
+        (jobid, submitted, finished, attempts, batch state, exit code, reason).
+        """
+        batch_status = self.batch_status if self.batch_status is not None else BatchJobStatus(None, None, None)
+        return (self.jobid, self.submitted, self.finished, self.attempts) + tuple(batch_status)
+
+    @classmethod
+    def from_record(cls, parameters, state, container_script_function=None):
+        """
+        Recreate a job from the parameters returned by get_parameters and the state returned by get_state, without writing its scripts.
 
+        Parameters
+        ----------
+            parameters : dict
+                The parameters of the job, as returned by get_parameters.
+            state : tuple
+                The state of the job, as returned by get_state.
+            container_script_function : callable, optional
+                The function creating the container script of the job. By default, create_container_script.
+
+        Returns
+        -------
+            AbstractBatchSubmission
+                The recreated job.
+        """
+        job = cls.__new__(cls)
+        job.jobname = parameters["jobname"]
+        job.job_directory = intern_string(parameters["job_directory"])
+        for name, value in parameters.items():
+            if name == "outside_of_container_script": continue
+            setattr(job, name, value)
+        job.container_script_function = create_container_script if container_script_function is None else container_script_function
+        job.output_offset = parameters.get("output_offset", 0)
+        job.script_materialized = parameters.get("script_materialized", True)
+
+        job.jobid, job.submitted, job.finished, job.attempts, state, exit_code, reason = state
+        job.batch_status = None if state is None else BatchJobStatus(state, exit_code, reason)
+        return job
+
+    def materialize_script(self):
+        """
+        Write the scripts of this job, unless they were already written. This is called before the job is submitted or run locally,
+        so that constructing jobs that are only monitored doesn't touch the file system. To write the scripts of many jobs at once,
+        see BatchSubmissionSet.materialize_scripts.
+        """
+        if self.script_materialized: return
         self._create_submission_script()
+        self.script_materialized = True
 
     def _create_submission_script(self):
         """
@@ -230,20 +869,18 @@ class AbstractBatchSubmission(ABC):
         If the job will be run inside of a container, create the script for that by calling self.container_script_function.
         """
 
-        if not os.path.exists(self.job_directory):
-            os.makedirs(self.job_directory)
-
-        os.system("chmod 777 {}".format(self.job_directory))
+        prepare_directory(self.job_directory)
         with open(self.script, "w") as f:
             f.write("#!/bin/sh\n")
             for c in self.commands:
                 f.write(c + "\n")
-        os.system("chmod 777 {}".format(self.script))
+        os.chmod(self.script, 0o777)
 
         # working inside of a container, and therefore, create a script to run jobs inside of the conatiner.
         if self.in_container:
             self.script = self.container_script_function(self.script)
-        os.system("chmod 777 {}".format(self.script))
+            if os.path.exists(self.script):
+                os.chmod(self.script, 0o777)
 
     def check_failed(self, job_queue = None):
         """
@@ -267,29 +904,79 @@ class AbstractBatchSubmission(ABC):
         """
         Check if a job has finished executing. This function returns true if the output file exists and
         self.finished_token is written on any line of self.output. The function returns false otherwise.
+        If the batch system reported that the job failed, return False without reading the output file.
         """
         if self.finished: return True
+        if self.batch_status is not None and self.batch_status.state == FAILED: return False
 
         output_file_exists = os.path.exists(self.output)
         if not output_file_exists: return False #the output file was not made
 
-        #look for the finished token in the output_file
-        with open(self.output, "r") as f:
-            lines = f.readlines()
-            for el in lines:
-                if self.finished_token == el.strip("\n"):
-                    self.finished = True
-                    print("Job with id {} has finished".format(self.jobid))
-                    return True
+        #look for the finished token in the part of the output_file that was written since the last check
+        found, self.output_offset = find_line_in_file(self.output, self.finished_token, self.output_offset)
+        if found:
+            self.finished = True
+            print("Job with id {} has finished".format(self.jobid))
+            return True
 
         print("Job with id {} has not finished yet ...".format(self.jobid))
         return False
 
-    @abstractmethod
     def get_job_queue(self):
         """
         Return a set of jobIDs, representing all of the jobs currently running. The values don't matter; a set is used for 
-        an O(1) lookup time, compared to O(N) for a list.
+        an O(1) lookup time, compared to O(N) for a list. The queue is read through self.queue_cache, if this class has one.
+
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+            set {int}
+                A set of integers of the job ids of all currently running jobs
+        """
+        if self.queue_cache is None:
+            return self._get_job_queue()
+        return self.queue_cache.get(self._get_job_queue)
+
+    @classmethod
+    def update_batch_status(cls, jobs):
+        """
+        Update the batch_status of many jobs of this class at once, e.g. from the accounting database of the batch system.
+        By default, this does nothing.
+
+        Parameters
+        ----------
+            jobs : list of AbstractBatchSubmission
+                The jobs to update. All jobs must be instances of cls.
+
+        Returns
+        -------
+            None
+        """
+        pass
+
+    async def get_job_queue_async(self):
+        """
+        The counterpart of get_job_queue for asyncio. The queue is read through self.queue_cache, if this class has one.
+        """
+        if self.queue_cache is None:
+            return await self._get_job_queue_async()
+        return await self.queue_cache.get_async(self._get_job_queue_async)
+
+    async def _get_job_queue_async(self):
+        """
+        Query the batch system for the set of jobIDs of all of the jobs currently running, without blocking the event loop.
+        By default, _get_job_queue is run in the default executor of the event loop. Batch systems that are queried through a
+        subprocess override this method to use an asyncio subprocess instead.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self._get_job_queue)
+
+    @abstractmethod
+    def _get_job_queue(self):
+        """
+        Query the batch system for the set of jobIDs of all of the jobs currently running.
 
 
         Parameters
@@ -302,10 +989,18 @@ class AbstractBatchSubmission(ABC):
         """
         pass
 
+    @classmethod
+    def invalidate_job_queue(cls):
+        """
+        Discard the cached snapshot of the job queue of this class, e.g. after new jobs were submitted.
+        """
+        if cls.queue_cache is not None:
+            cls.queue_cache.invalidate()
+
     def check_running(self, job_queue=None):
         """
         Return True of the job is running, and false otherwise. If the job is doesn't have a jobid (jobid is None), return False. If it does exist,
-        return whether the jobid is in the job_queue.
+        return whether the jobid is in the job_queue. If the batch system reported that the job terminated, the job_queue isn't used.
 
         Parameters
         ----------
@@ -319,6 +1014,7 @@ class AbstractBatchSubmission(ABC):
                 The jobid of the submission.
         """
         if self.jobid is None: return False
+        if self.batch_status is not None and self.batch_status.state in TERMINAL_STATES: return False
 
         if job_queue is None:
             job_queue = self.get_job_queue()
@@ -341,24 +1037,71 @@ class AbstractBatchSubmission(ABC):
         pass
 
     def clear_output_files(self):
-        while os.path.exists(self.output):
-            os.system("rm {}".format(self.output))
-
-        while os.path.exists(self.error):
-            os.system("rm {}".format(self.error))
+        """
+        Remove the output and error files of a previous submission of this job.
+        """
+        remove_file(self.output)
+        remove_file(self.error)
 
-    def submit(self):
+    def _prepare_submission(self):
         """
-        Submit the job to the batch system, and return the jobid for book keeping
+        Reset the status of this job before it is submitted to the batch system.
         """
         self.finished = False
         self.submitted = True
+        self.attempts += 1
+        self.batch_status = None
+        self.output_offset = 0
+        self.materialize_script()
         self.clear_output_files()
+
+    def submit(self):
+        """
+        Submit the job to the batch system, and return the jobid for book keeping
+        """
+        self._prepare_submission()
         self.jobid = self._submit()
+        self.invalidate_job_queue()
         print("Submitted job with id {}".format(self.jobid))
 
+    async def submit_async(self):
+        """
+        Submit the job to the batch system without blocking the event loop. See submit. The scripts of the job are written, and its
+        output files removed, in the default executor of the event loop, since writing a container script runs batchScript.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._prepare_submission)
+        self.jobid = await self._submit_async()
+        self.invalidate_job_queue()
+        print("Submitted job with id {}".format(self.jobid))
+
+    async def _submit_async(self):
+        """
+        Submit the job to the batch system without blocking the event loop, and return the jobid for book keeping.
+        By default, _submit is run in the default executor of the event loop.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self._submit)
+
+    @classmethod
+    def submit_array(cls, jobs):
+        """
+        Submit a list of jobs of this class to the batch system. The default implementation submits the jobs one at a time.
+        Batch systems that support job arrays override this method, and set the jobid of every job in jobs.
+
+        Parameters
+        ----------
+            jobs : list of AbstractBatchSubmission
+                The jobs to be submitted. All jobs must be instances of cls.
+
+        Returns
+        -------
+            None
+        """
+        for job in jobs:
+            job.submit()
+
     def run_local(self):
         """
         Run the job locally.
         """
+        self.materialize_script()
         os.system("source {}".format(self.script))
@@ -1,9 +1,22 @@
+from collections import namedtuple, OrderedDict
+import inspect
+import os
+import shutil
+
 from pybatchsub.slurm_submission import SlurmSubmission
 from pybatchsub.condor_submission import CondorSubmission
+from pybatchsub.local_submission import LocalSubmission
 from pybatchsub.batch_submission import AbstractBatchSubmission
-from pybatchsub.utils import check_for_command
+from pybatchsub.utils import check_if_memory, memory_translation_to_slurm, memory_translation_to_condor
 
+# The name of the batch submission system used by the factories, found once per process by detect_batch_system.
 BATCH_SYSTEM = None
+# The environment variable that selects the batch submission system, instead of detecting it.
+BATCH_SYSTEM_VARIABLE = "PYBATCHSUB_BATCH_SYSTEM"
+
+# The names of the arguments of AbstractBatchSubmission.__init__, in order, and the position of each name.
+ARGUMENT_NAMES = [name for name in inspect.signature(AbstractBatchSubmission.__init__).parameters if name != "self"]
+ARGUMENT_POSITIONS = {name: position for position, name in enumerate(ARGUMENT_NAMES)}
 
 TIME_TRANSLATION_CONDOR_TO_SLURM=\
 {\
@@ -74,6 +87,117 @@ def time_translation_condor_to_slurm(time):
         raise ValueError("{} is not a valid queue for condor")
     return TIME_TRANSLATION_CONDOR_TO_SLURM[time]
 
+def get_time_in_seconds(time):
+    """Return the number of seconds in a condor time (e.g. workday) or a slurm time string of the form XX:XX:XX (days, hours and minutes). Return None if time is neither."""
+    if not isinstance(time, str): return None
+    if check_if_condor_time(time):
+        time = TIME_TRANSLATION_CONDOR_TO_SLURM[time]
+    raw_time = get_raw_time_from_slurm_time(time)
+    if raw_time is None: return None
+    days, hours, minutes = raw_time
+    return ((days * 24 + hours) * 60 + minutes) * 60
+
+def translate_slurm_resources(time, memory):
+    """Return the time and memory of a job translated for slurm, e.g. ("00:08:00", "4096M") for ("workday", "4G")."""
+    if check_if_condor_time(time):
+        time = time_translation_condor_to_slurm(time)
+    if not check_if_slurm_time(time):
+        raise ValueError("{} is not avalid time for SLURM".format(time))
+    return time, memory_translation_to_slurm(memory)
+
+def translate_condor_resources(time, memory):
+    """Return the time and memory of a job translated for condor, e.g. ("workday", "4096") for ("00:08:00", "4G")."""
+    if check_if_slurm_time(time):
+        time = time_translation_slurm_to_condor(time)
+    if not check_if_condor_time(time):
+        raise ValueError("{} is not avalid time for CONDOR".format(time))
+    return time, memory_translation_to_condor(memory)
+
+def translate_local_resources(time, memory):
+    """Return the time and memory of a job run by LocalSubmission, which are not enforced, after checking that the memory is valid."""
+    if not check_if_memory(memory):
+        raise ValueError("{} is not a valid memory request".format(memory))
+    return time, memory
+
+BatchSystem = namedtuple("BatchSystem", ["name", "command", "job_class", "translate"])
+BatchSystem.__doc__ = """
+A batch submission system known to BatchSubmissionFactory.
+
+Attributes
+----------
+    name : str
+        The name of the batch submission system, e.g. "slurm".
+    command : str
+        A command that is found on the PATH if the batch submission system is installed, e.g. "squeue".
+    job_class : type
+        The class of the jobs submitted to the batch submission system, derived from AbstractBatchSubmission.
+    translate : function
+        The function that translates the time and memory of a job for the batch submission system, e.g. translate_slurm_resources.
+"""
+
+# The registered batch submission systems. detect_batch_system picks the first one that is installed.
+BATCH_SYSTEMS = OrderedDict()
+
+def register_batch_system(name, command, job_class, translate):
+    """
+    Register a batch submission system, such that BatchSubmissionFactory can create its jobs.
+
+    Parameters
+    ----------
+        name : str
+            The name of the batch submission system, which can be selected with the environment variable PYBATCHSUB_BATCH_SYSTEM.
+        command : str or None
+            A command that is found on the PATH if the batch submission system is installed. If None, the system is only used if selected.
+        job_class : type
+            The class of the jobs, derived from AbstractBatchSubmission.
+        translate : function
+            The function that translates the time and memory of a job, given as arguments, and returns them as a tuple.
+
+    Returns
+    -------
+        None
+    """
+    BATCH_SYSTEMS[name] = BatchSystem(name, command, job_class, translate)
+
+register_batch_system("condor", "condor_q", CondorSubmission, translate_condor_resources)
+register_batch_system("slurm", "squeue", SlurmSubmission, translate_slurm_resources)
+register_batch_system("local", None, LocalSubmission, translate_local_resources)
+
+def detect_batch_system():
+    """
+    Return the name of the batch submission system to use. The system is found once per process, and stored in BATCH_SYSTEM: it is the
+    one named by the environment variable PYBATCHSUB_BATCH_SYSTEM if it is set, otherwise the first registered system whose command is
+    found on the PATH. Set BATCH_SYSTEM to None to detect it again.
+
+    Returns
+    -------
+        str
+            The name of the batch submission system, a key of BATCH_SYSTEMS.
+
+    Raises
+    ------
+        ValueError if the selected batch submission system isn't registered, or if none of the registered systems is installed.
+    """
+    global BATCH_SYSTEM
+    if BATCH_SYSTEM is not None:
+        return BATCH_SYSTEM
+
+    selected = os.environ.get(BATCH_SYSTEM_VARIABLE)
+    if selected:
+        if selected not in BATCH_SYSTEMS:
+            raise ValueError("{} selected by {} is not one of the supported batch submission systems: {}".format(selected, BATCH_SYSTEM_VARIABLE, ", ".join(BATCH_SYSTEMS)))
+        BATCH_SYSTEM = selected
+        return BATCH_SYSTEM
+
+    for batch_system in BATCH_SYSTEMS.values():
+        if batch_system.command is not None and shutil.which(batch_system.command) is not None:
+            print("Found {} installed. Using {}.".format(batch_system.name, batch_system.name))
+            BATCH_SYSTEM = batch_system.name
+            return BATCH_SYSTEM
+    detectable = [batch_system.name for batch_system in BATCH_SYSTEMS.values() if batch_system.command is not None]
+    raise ValueError("None of the supported batch submission systems, {},  were found".format(" or ".join(detectable)))
+
+
 class BatchSubmissionFactory:
     """
     A factory for the creation of an object of a class that inherits from AbstractBachSubmission.
@@ -97,13 +221,17 @@ class BatchSubmissionFactory:
     -------
         translate_parameters
             Convert the arguments to the necessary batch submission system.
+        get_batch_job
+            Return the job for the batch submission system that is installed.
+        get_batch_jobs
+            Return the jobs for many sets of arguments at once.
 
     """
 
     def __init__(self, *args, **kwargs):
         self.args = list(args)
         self.kwargs = kwargs
-        self.supported = {"slurm", "condor"}
+        self.supported = set(BATCH_SYSTEMS)
 
     def translate_parameters(self, kind):
         """
@@ -117,43 +245,12 @@ class BatchSubmissionFactory:
                 string
                     Name of batch submission system. Must be in self.supported.
         """
-        all_argnames = AbstractBatchSubmission.__init__.__code__.co_varnames # the parameters of the __init__ of the abstract base submission class.
-        argnames = all_argnames[1:len(self.args) + 1]
-        kw_argnames = all_argnames[len(self.args) + 1:]
-
-        if kind == "slurm":
-
-            #translate the time parameters
-            time_index = argnames.index("time")
-            if check_if_condor_time(self.args[time_index]):
-                self.args[time_index] = time_translation_condor_to_slurm(self.args[time_index])
-
-            if not check_if_slurm_time(self.args[time_index]):
-                raise ValueError("{} is not avalid time for SLURM".format(self.args[time_index]))
-
-            #translate the memory parameters
-            #TBD
-
-
-        elif kind == "condor":
-
-            #translate the time parameters
-            time_index = argnames.index("time")
-            if check_if_slurm_time(self.args[time_index]):
-                self.args[time_index] = time_translation_slurm_to_condor(self.args[time_index])
-
-            if not check_if_condor_time(self.args[time_index]):
-                raise ValueError("{} is not avalid time for SLURM".format(self.args[time_index]))
-
-            #translate the memory parameters
-            #TBD
-
+        translate_arguments(self.args, self.kwargs, BATCH_SYSTEMS[kind].translate)
 
     def get_batch_job(self):
         """
         Return an instance of a class with the interface defined in AbstractBatchSubmission.
-        This function should find out if condor, slurm or another batch submission software is available,
-        and return an object that will submit jobs to it.
+        The batch submission system is found with detect_batch_system, once per process.
 
         Arguments
         ---------
@@ -162,22 +259,58 @@ class BatchSubmissionFactory:
         -------
             An instance of a class that follows the AbstractBatchSubmission interface.
         """
+        kind = detect_batch_system()
+        self.translate_parameters(kind)
+        return BATCH_SYSTEMS[kind].job_class(*self.args, **self.kwargs)
 
-        global BATCH_SYSTEM
-        condor_q = ["which", "condor_q"]
-        slurm_q = ["which", "squeue"]
-
-        if BATCH_SYSTEM == "condor" or (BATCH_SYSTEM is None and check_for_command(condor_q)):
-            if BATCH_SYSTEM is None: print("Found condor installed. Using condor.")
-            BATCH_SYSTEM = "condor"
-            self.translate_parameters("condor")
-            return CondorSubmission(*self.args, **self.kwargs)
+    @staticmethod
+    def get_batch_jobs(param_rows):
+        """
+        Return the jobs for many sets of arguments, for the batch submission system that is installed. This is equivalent to calling
+        get_batch_job on a factory for every set of arguments, but the time and memory are translated once for each distinct pair.
 
-        if BATCH_SYSTEM == "slurm" or (BATCH_SYSTEM is None and check_for_command(slurm_q)):
-            if BATCH_SYSTEM is None: print("Found slurm installed. Using slurm.")
-            BATCH_SYSTEM = "slurm"
-            self.translate_parameters("slurm")
-            return SlurmSubmission(*self.args, **self.kwargs)
+        Parameters
+        ----------
+            param_rows : iterable of dict or sequence
+                The arguments of each job: a dict of keyword arguments, or a sequence of positional arguments, of AbstractBatchSubmission.
 
-        else:
-            raise ValueError("None of the supported batch submission systems, condor or slurm,  were found")
+        Returns
+        -------
+            list of AbstractBatchSubmission
+                The jobs, in the order of param_rows.
+        """
+        batch_system = BATCH_SYSTEMS[detect_batch_system()]
+        translations = {}
+
+        def translate(time, memory):
+            key = (time, memory)
+            if key not in translations:
+                translations[key] = batch_system.translate(time, memory)
+            return translations[key]
+
+        jobs = []
+        for row in param_rows:
+            if isinstance(row, dict):
+                args, kwargs = [], dict(row)
+            else:
+                args, kwargs = list(row), {}
+            translate_arguments(args, kwargs, translate)
+            jobs.append(batch_system.job_class(*args, **kwargs))
+        return jobs
+
+
+def translate_arguments(args, kwargs, translate):
+    """
+    Translate, in place, the time and memory in the positional and keyword arguments of AbstractBatchSubmission with a translate function
+    of a BatchSystem.
+    """
+    time_in_args = len(args) > ARGUMENT_POSITIONS["time"]
+    memory_in_args = len(args) > ARGUMENT_POSITIONS["memory"]
+    time = args[ARGUMENT_POSITIONS["time"]] if time_in_args else kwargs["time"]
+    memory = args[ARGUMENT_POSITIONS["memory"]] if memory_in_args else kwargs["memory"]
+    time, memory = translate(time, memory)
+
+    if time_in_args: args[ARGUMENT_POSITIONS["time"]] = time
+    else: kwargs["time"] = time
+    if memory_in_args: args[ARGUMENT_POSITIONS["memory"]] = memory
+    else: kwargs["memory"] = memory
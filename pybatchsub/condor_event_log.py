@@ -0,0 +1,162 @@
+from collections import namedtuple
+import os
+import re
+
+from pybatchsub.batch_submission import BatchJobStatus, PENDING, RUNNING, HELD, COMPLETED, FAILED
+
+SUBMIT_EVENT = 0
+EXECUTE_EVENT = 1
+EVICTED_EVENT = 4
+TERMINATED_EVENT = 5
+ABORTED_EVENT = 9
+HELD_EVENT = 12
+RELEASED_EVENT = 13
+
+EVENT_SEPARATOR = "..."
+EVENT_HEADER = re.compile(r"^(\d{3}) \((\d+)\.(\d+)\.(\d+)\) (.*)$")
+RETURN_VALUE = re.compile(r"\(return value (-?\d+)\)")
+SIGNAL = re.compile(r"\(signal (\d+)\)")
+
+JobEvent = namedtuple("JobEvent", ["code", "cluster", "proc", "description", "lines"])
+JobEvent.__doc__ = """
+An event of a condor user log.
+
+Attributes
+----------
+    code : int
+        The event number, e.g. 5 for a terminated job.
+    cluster : int
+        The ClusterId of the job.
+    proc : int
+        The ProcId of the job.
+    description : str
+        The remainder of the first line of the event, following the event time.
+    lines : list of str
+        The following lines of the event, with leading whitespace removed.
+"""
+
+
+def parse_event(lines):
+    """
+    Parse a single event of a condor user log.
+
+    Parameters
+    ----------
+        lines : list of str
+            The lines of the event, without the terminating "..." line.
+
+    Returns
+    -------
+        JobEvent or None
+            The parsed event, or None if the lines are not an event.
+    """
+    if len(lines) == 0: return None
+    match = EVENT_HEADER.match(lines[0])
+    if match is None: return None
+    code, cluster, proc, subproc, description = match.groups()
+    return JobEvent(int(code), int(cluster), int(proc), description, [l.strip() for l in lines[1:]])
+
+
+def update_status_from_event(status, event):
+    """
+    Return the status of a job after the event.
+
+    Parameters
+    ----------
+        status : BatchJobStatus or None
+            The status of the job before the event.
+        event : JobEvent
+            The event of the job.
+
+    Returns
+    -------
+        BatchJobStatus or None
+            The status of the job after the event. Events that don't change the status of the job return status unchanged.
+    """
+    if event.code in (SUBMIT_EVENT, EVICTED_EVENT, RELEASED_EVENT):
+        return BatchJobStatus(PENDING, None, None)
+
+    if event.code == EXECUTE_EVENT:
+        return BatchJobStatus(RUNNING, None, None)
+
+    if event.code == HELD_EVENT:
+        reason = " ".join(l for l in event.lines if l)
+        return BatchJobStatus(HELD, None, reason)
+
+    if event.code == ABORTED_EVENT:
+        # a held job that is removed keeps the reason it was held, e.g. for escalating its memory
+        reason = status.reason if status is not None and status.state == HELD and status.reason else "aborted"
+        return BatchJobStatus(FAILED, None, reason)
+
+    if event.code == TERMINATED_EVENT:
+        for line in event.lines:
+            match = RETURN_VALUE.search(line)
+            if match is not None:
+                exit_code = int(match.group(1))
+                return BatchJobStatus(COMPLETED if exit_code == 0 else FAILED, exit_code, None)
+            match = SIGNAL.search(line)
+            if match is not None:
+                return BatchJobStatus(FAILED, None, "signal {}".format(match.group(1)))
+        return BatchJobStatus(FAILED, None, None)
+
+    return status
+
+
+class CondorEventLogReader:
+    """
+    An incremental reader of a condor user log. Each call to read_events only reads the bytes appended to the log since the
+    previous call, and only returns complete events. An incomplete event at the end of the log is read again by the next call.
+
+    Attributes
+    ----------
+        path : str
+            The path of the user log.
+        offset : int
+            The number of bytes of the log that have been read.
+
+    Methods
+    -------
+        read_events
+            Return the list of complete events appended to the log since the previous call.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+
+    def read_events(self):
+        """
+        Return the list of JobEvents appended to the log since the previous call. If the log is shorter than the number of bytes
+        already read, it was recreated, and it is read again from the beginning.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+
+        if size < self.offset:
+            self.offset = 0
+        if size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+
+        # only read up to the end of the last complete event
+        end = data.rfind(("\n" + EVENT_SEPARATOR + "\n").encode())
+        if end < 0: return []
+        end += len(EVENT_SEPARATOR) + 2
+        self.offset += end
+
+        events = []
+        lines = []
+        for line in data[:end].decode("utf-8", errors="replace").split("\n"):
+            if line != EVENT_SEPARATOR:
+                lines.append(line)
+                continue
+            event = parse_event(lines)
+            if event is not None:
+                events.append(event)
+            lines = []
+        return events
@@ -1,7 +1,15 @@
-from pybatchsub.batch_submission import AbstractBatchSubmission
-from pybatchsub.utils import do_multiple_subprocess_attempts
+from pybatchsub.batch_submission import AbstractBatchSubmission, ACTIVE_STATES, TERMINAL_STATES, HELD
+from pybatchsub.condor_event_log import CondorEventLogReader, update_status_from_event
+from pybatchsub.utils import do_multiple_subprocess_attempts, async_do_multiple_subprocess_attempts, memory_translation_to_condor, prepare_directory, RetryPolicy
+from pybatchsub.job_queue import JobQueueCache, JobQueueSnapshot, LazyJobQueue
 import os
 
+# The values of htcondor.JobStatus of the jobs that are in the queue, so that htcondor needn't be imported to parse the queue.
+JOB_STATUS_IDLE = 1
+JOB_STATUS_RUNNING = 2
+JOB_STATUS_HELD = 5
+QUEUED_JOB_STATUSES = [JOB_STATUS_IDLE, JOB_STATUS_RUNNING, JOB_STATUS_HELD]
+
 
 def get_jobid_from_submission(long_info):
     """
@@ -28,24 +36,86 @@ def parse_queue_output(jobqueue):
     """
     Parameters
     ----------
-        list of ClassAd
-            the list of ClassAds returned by htcondor.Schedd().query().
+        iterable of ClassAd
+            the ClassAds returned by htcondor.Schedd().query() or htcondor.Schedd().xquery(), which are read one by one.
 
     Returns
     -------
-        set of int
-            The jobids of the currenty submitted and running jobs on the slurm batch system.
+        JobQueueSnapshot of tuple of (int, int)
+            The jobids, (ClusterId, ProcId), of the currenty submitted and running jobs on the condor batch system. The jobids
+            of held jobs are in its held attribute.
     """
-    import htcondor
-    job_ids = set()
+    job_ids = JobQueueSnapshot()
     for el in jobqueue:
         job_status = el["JobStatus"]
-        running = (job_status == htcondor.JobStatus.RUNNING) or (job_status == htcondor.JobStatus.IDLE)
-        if running:
-            job_ids.add(el["ClusterId"])
+        if job_status == JOB_STATUS_RUNNING or job_status == JOB_STATUS_IDLE:
+            job_ids.add((el["ClusterId"], el["ProcId"]))
+        elif job_status == JOB_STATUS_HELD:
+            job_ids.held.add((el["ClusterId"], el["ProcId"]))
 
     return job_ids
 
+
+def get_queue_constraint(owner, clusters=None):
+    """
+    Return the ClassAd constraint of the jobs of owner that are idle, running or held, optionally only of some clusters.
+
+    Parameters
+    ----------
+        owner : str
+            The user who submitted the jobs.
+        clusters : iterable of int (optional)
+            The ClusterIds of the jobs.
+
+    Returns
+    -------
+        str
+            The constraint, e.g. 'Owner == "user" && member(JobStatus, {1, 2, 5}) && member(ClusterId, {4242})'.
+    """
+    constraint = "Owner == \"{}\" && member(JobStatus, {{{}}})".format(owner, ", ".join(str(status) for status in QUEUED_JOB_STATUSES))
+    if clusters is not None:
+        constraint += " && member(ClusterId, {{{}}})".format(", ".join(str(cluster) for cluster in sorted(clusters)))
+    return constraint
+
+
+def write_cluster_submission_file(sub_file, jobs):
+    """
+    Write a condor submit description that queues all jobs in one cluster. The job specific parameters are set before one queue
+    statement per job, such that the n'th job becomes the n'th proc of the cluster. A value extends to the end of its line, so paths
+    may hold spaces and commas, which would shift the columns of an itemdata table.
+
+    Parameters
+    ----------
+        sub_file : str
+            The path of the submit description file to be written.
+        jobs : list of CondorSubmission
+            The jobs of the cluster.
+
+    Returns
+    -------
+        None
+
+    Raises
+    ------
+        ValueError
+            If a path of a job holds a line break, or its time holds a double quote, which can't be written in a submit description.
+    """
+    with open(sub_file, "w") as f:
+        f.write("Universe = vanilla\n")
+        f.write("request_cpus = 1\n")
+        f.write("should_transfer_files = NO\n")
+        for job in jobs:
+            values = [job.script, job.output, job.error, job.logfile, job.time]
+            if any("\n" in value or "\r" in value for value in values) or "\"" in job.time:
+                raise ValueError("The job {} can't be submitted to condor: its paths hold a line break, or its time a double quote".format(job.jobname))
+            f.write("Executable = {}\n".format(job.script))
+            f.write("Output = {}\n".format(job.output))
+            f.write("Error = {}\n".format(job.error))
+            f.write("Log = {}\n".format(job.logfile))
+            f.write("request_memory = {}\n".format(memory_translation_to_condor(job.memory)))
+            f.write("+JobFlavour = \"{}\"\n".format(job.time))
+            f.write("queue\n")
+
 schedd = None
 def get_schedd():
     """
@@ -57,21 +127,209 @@ def get_schedd():
         schedd = htcondor.Schedd()
     return schedd
 
+def query_schedd(current_schedd, constraint):
+    """
+    Query the schedd for the jobs matching constraint, and return them parsed by parse_queue_output. Only the ClusterId, ProcId
+    and JobStatus of the jobs are requested, and the jobs are parsed while they are streamed if the bindings have xquery.
+    """
+    query = getattr(current_schedd, "xquery", current_schedd.query)
+    return parse_queue_output(query(constraint, ["ClusterId", "ProcId", "JobStatus"]))
+
+
 class CondorSubmission(AbstractBatchSubmission):
-    def get_job_queue(self):
+    """
+    A job submitted to the condor batch system. If use_event_log is True, the status of a submitted job is followed by incrementally
+    reading its condor user log, and the schedd is only queried for jobs whose log holds no events.
+    """
+    __slots__ = ("_event_log_reader",)
+
+    queue_cache = JobQueueCache()
+    retry_policy = RetryPolicy()
+    use_event_log = True
+    # If True, the schedd is only asked for the clusters submitted or updated through this class, rather than all jobs of the user.
+    restrict_queue_query = False
+    # The ClusterIds that the schedd is asked for, and those that left the queue and aren't asked for anymore.
+    tracked_clusterids = set()
+    departed_clusterids = set()
+
+    @property
+    def logfile(self):
+        """
+        The path of the condor user log of this job.
+        """
+        return self.output.replace(".out", ".log")
+
+    def get_parameters(self):
+        """
+        Return the parameters of this job that are needed to recreate it with from_record, including the offset up to which its user
+        log was read.
+        """
+        parameters = super().get_parameters()
+        reader = getattr(self, "_event_log_reader", None)
+        parameters["event_log_offset"] = 0 if reader is None else reader.offset
+        return parameters
+
+    @classmethod
+    def from_record(cls, parameters, state, container_script_function=None):
+        """
+        Recreate a job from the parameters returned by get_parameters and the state returned by get_state, and resume reading its user
+        log from the recorded offset. See AbstractBatchSubmission.from_record.
+        """
+        parameters = dict(parameters)
+        event_log_offset = parameters.pop("event_log_offset", 0)
+        job = super().from_record(parameters, state, container_script_function)
+        if event_log_offset:
+            job._event_log_reader = CondorEventLogReader(job.logfile, event_log_offset)
+        return job
+
+    def update_status_from_event_log(self):
+        """
+        Read the events appended to the user log of this job since the last call, and update self.batch_status accordingly.
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+            bool
+                True if the status of this job is known from its log.
+        """
+        if not self.use_event_log or self.jobid is None: return False
+
+        reader = getattr(self, "_event_log_reader", None)
+        if reader is None:
+            reader = self._event_log_reader = CondorEventLogReader(self.logfile)
+
+        for event in reader.read_events():
+            if (event.cluster, event.proc) != tuple(self.jobid): continue
+            self.batch_status = update_status_from_event(self.batch_status, event)
+
+        return self.batch_status is not None
+
+    @classmethod
+    def update_batch_status(cls, jobs):
+        """
+        Update the batch_status of the jobs from their user logs. See update_status_from_event_log.
+
+        Parameters
+        ----------
+            jobs : list of CondorSubmission
+                The jobs to update.
+
+        Returns
+        -------
+            None
+        """
+        cls.track_jobids([job.jobid for job in jobs if job.jobid is not None])
+        for job in jobs:
+            job.update_status_from_event_log()
+
+    @classmethod
+    def track_jobids(cls, jobids):
         """
-        Get the queue of jobs currently running to the batch system by the user
+        Add the clusters of jobids to those that the schedd is asked for if restrict_queue_query is True. Clusters that already left
+        the queue are ignored. The cached queue is discarded if a cluster is new, since the snapshot didn't include it.
 
         Parameters
         ----------
+            jobids : iterable of tuple of (int, int)
+                The jobids, (ClusterId, ProcId).
 
         Returns
         -------
-            set of {int}
-                A set of jobids for all jobs currently running
+            None
         """
-        long_info = get_schedd().query(constraint="OWNER == \"{}\"".format(os.getenv("USER")), projection=["ClusterId", "JobStatus"])
-        job_ids =  parse_queue_output(long_info)
+        new_clusterids = {jobid[0] for jobid in jobids} - cls.tracked_clusterids - cls.departed_clusterids
+        if len(new_clusterids) == 0: return
+        cls.tracked_clusterids.update(new_clusterids)
+        cls.invalidate_job_queue()
+
+    @classmethod
+    def _forget_departed_jobids(cls, queried_clusterids, job_ids):
+        """
+        Stop tracking the clusters that were queried by a restricted query of the schedd, but have no jobs in the queue, since jobs
+        don't come back to the queue. Clusters tracked while the query ran weren't queried, and are kept.
+        """
+        departed = set(queried_clusterids) - {jobid[0] for jobid in job_ids} - {jobid[0] for jobid in job_ids.held}
+        cls.tracked_clusterids.difference_update(departed)
+        cls.departed_clusterids.update(departed)
+
+    def check_running(self, job_queue=None):
+        """
+        Return True if the job is in the queue, i.e. pending, running or held. Held jobs count as running, so that they are neither
+        failed nor submitted again while they occupy the queue, although status_summary counts them separately. If the user log of
+        the job holds events, the status is taken from the log and job_queue is not used. Otherwise, return whether the jobid is in
+        the job_queue or in its held jobs. See AbstractBatchSubmission.check_running.
+        """
+        if self.update_status_from_event_log():
+            return self.batch_status.state in ACTIVE_STATES or self.batch_status.state == HELD
+        if self.jobid is None: return False
+        if self.batch_status is not None and self.batch_status.state in TERMINAL_STATES: return False
+
+        if job_queue is None:
+            job_queue = LazyJobQueue(self.get_job_queue)
+        return self.jobid in job_queue or self.jobid in getattr(job_queue, "held", ())
+
+    def check_held(self, job_queue=None):
+        """
+        Return True if the job is held in the queue. If the user log of the job holds events, the status is taken from the log and
+        job_queue is not used.
+
+        Parameters
+        ----------
+            job_queue : JobQueueSnapshot (optional)
+                The jobs in the queue, with the held jobs in its held attribute. If this is not provided, the method
+                self.get_job_queue() will be called instead.
+
+        Returns
+        -------
+            bool
+                True if the job is held.
+        """
+        if self.jobid is None: return False
+        if self.update_status_from_event_log():
+            return self.batch_status.state == HELD
+
+        if job_queue is None:
+            job_queue = self.get_job_queue()
+        return self.jobid in getattr(job_queue, "held", ())
+
+    def check_finished(self):
+        """
+        Check if a job has finished executing. If the user log shows that the job has not terminated yet, return False without reading
+        the output file. See AbstractBatchSubmission.check_finished.
+        """
+        if not self.finished and self.update_status_from_event_log() and self.batch_status.state not in TERMINAL_STATES:
+            return False
+        return super().check_finished()
+
+    def _prepare_submission(self):
+        """
+        Reset the status of this job before it is submitted to the batch system, and start reading its new user log from the beginning.
+        """
+        super()._prepare_submission()
+        self._event_log_reader = None
+
+    def _get_job_queue(self):
+        """
+        Get the queue of jobs currently running to the batch system by the user. The schedd only returns the jobs that are idle,
+        running or held, of the tracked clusters if restrict_queue_query is True, and they are read as the schedd streams them
+        if the bindings have xquery.
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+            JobQueueSnapshot of {(int, int)}
+                A set of jobids, (ClusterId, ProcId), for all jobs currently running, with the held jobs in its held attribute.
+        """
+        if self.restrict_queue_query and not self.tracked_clusterids: return JobQueueSnapshot()
+        clusters = set(self.tracked_clusterids) if self.restrict_queue_query else None
+        constraint = get_queue_constraint(os.getenv("USER"), clusters)
+        job_ids = self.retry_policy.call(query_schedd, get_schedd(), constraint)
+        if clusters is not None:
+            self._forget_departed_jobids(clusters, job_ids)
         return job_ids
 
     def _submit(self):
@@ -83,23 +341,50 @@ class CondorSubmission(AbstractBatchSubmission):
 
         Returns
         -------
-            int
-                The jobid of the submission.
+            tuple of (int, int)
+                The jobid, (ClusterId, ProcId), of the submission.
         """
-        import htcondor
-        logfile = self.output.replace(".out", ".log")
+        sub_file = self._write_submission_file()
+        long_info = do_multiple_subprocess_attempts(["condor_submit", sub_file], retry_policy = self.retry_policy)
+        os.remove(sub_file)
 
-        #ensure the necessary permissions on the output files and job directory
-        for fname in [logfile, self.output, self.error]:
-            with open(fname, "w") as f:
-                pass
-            os.system("chmod 777 {}".format(fname))
-        os.system("chmod 777 {}".format(self.job_directory))
+        #get_schedd().submit(submission) has permission issues. I don't know why...
+
+        jobid = (get_jobid_from_submission(long_info), 0)
+        self.track_jobids([jobid])
+        return jobid
+
+    async def _submit_async(self):
+        """
+        Submit the job to the batch system without blocking the event loop, and return the jobid for book keeping.
+        """
+        sub_file = self._write_submission_file()
+        long_info = await async_do_multiple_subprocess_attempts(["condor_submit", sub_file], retry_policy = self.retry_policy)
+        os.remove(sub_file)
+        jobid = (get_jobid_from_submission(long_info), 0)
+        self.track_jobids([jobid])
+        return jobid
+
+    def _write_submission_file(self):
+        """
+        Prepare the output files of this job, and write the submit description to submit it with condor_submit.
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+            str
+                The path of the submit description file.
+        """
+        import htcondor
+        logfile = self.logfile
+        self._prepare_output_files()
 
         submission = htcondor.Submit({\
             "Universe": "vanilla",\
             "Executable": self.script,\
-            "request_memory": self.memory,\
+            "request_memory": memory_translation_to_condor(self.memory),\
             "request_cpus": 1,\
             "Error": self.error,\
             "Output": self.output,\
@@ -112,13 +397,58 @@ class CondorSubmission(AbstractBatchSubmission):
         with open(sub_file, "w") as f:
             f.write(str(submission))
             f.write("\nqueue")
+        return sub_file
 
-        long_info = do_multiple_subprocess_attempts(["condor_submit", sub_file])
-        os.system("rm {}".format(sub_file))
+    def _prepare_output_files(self):
+        """
+        Create empty log, output and error files, and ensure the necessary permissions on them and the job directory.
+        """
+        prepare_directory(self.job_directory)
+        for fname in [self.logfile, self.output, self.error]:
+            with open(fname, "w") as f:
+                pass
+            os.chmod(fname, 0o777)
 
-        #get_schedd().submit(submission) has permission issues. I don't know why...
+    @classmethod
+    def submit_array(cls, jobs, array_directory=None):
+        """
+        Submit a list of jobs as one condor cluster with a single call to condor_submit. The submit description queues one proc
+        per job, and the jobid of the n'th job is set to (ClusterId, n). See write_cluster_submission_file.
+
+        Parameters
+        ----------
+            jobs : list of CondorSubmission
+                The jobs to be submitted.
+            array_directory : str (optional)
+                The directory where the submit description is written. Defaults to the job directory of the first job.
+
+        Returns
+        -------
+            None
+        """
+        if len(jobs) == 0: return
+
+        first_job = jobs[0]
+        if array_directory is None:
+            array_directory = first_job.job_directory
+        prepare_directory(array_directory)
+
+        for job in jobs:
+            job._prepare_submission()
+            job._prepare_output_files()
+
+        sub_file = os.path.join(array_directory, first_job.jobname + "_cluster.sub")
+        write_cluster_submission_file(sub_file, jobs)
+
+        long_info = do_multiple_subprocess_attempts(["condor_submit", sub_file], retry_policy = cls.retry_policy)
+        os.remove(sub_file)
 
-        return get_jobid_from_submission(long_info)
+        cluster_id = get_jobid_from_submission(long_info)
+        for proc_id, job in enumerate(jobs):
+            job.jobid = (cluster_id, proc_id)
+        cls.track_jobids([(cluster_id, 0)])
+        cls.invalidate_job_queue()
+        print("Submitted cluster with id {} and {} jobs".format(cluster_id, len(jobs)))
 
 
 AbstractBatchSubmission.register(CondorSubmission)
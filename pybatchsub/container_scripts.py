@@ -0,0 +1,185 @@
+from collections import OrderedDict
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+
+from pybatchsub.utils import prepare_directory, remove_file
+
+# The number of container scripts kept in a ContainerScriptCache before the least recently used are removed.
+DEFAULT_MAX_ENTRIES = 1000
+# The environment variable through which a shim passes the script of its job to a parametrized container script.
+SCRIPT_VARIABLE = "PYBATCHSUB_SCRIPT"
+# The key of the single container script shared by all jobs in parametrized mode.
+PARAMETRIZED_KEY = "parametrized"
+
+
+def generate_container_script(command, container_script):
+    """
+    Create a script that runs a command inside of a singularity container on ComputeCanada with batchScript.
+
+    Parameters
+    ----------
+        command : str
+            The command to run inside of the container. It is passed to batchScript as is, without being expanded by a shell.
+        container_script : str
+            The path of the script to be created.
+
+    Returns
+    -------
+        None
+    """
+    subprocess.run(["batchScript", command, "-O", container_script], check=True, stdout=subprocess.DEVNULL)
+    os.chmod(container_script, 0o777)
+
+
+def get_container_script_name(script):
+    """
+    Return the path of the container script of a job, given the path of the job's script.
+    """
+    return os.path.splitext(script)[0] + "_container.sh"
+
+
+def link_file(source, destination):
+    """
+    Make destination a hard link to source, replacing destination if it exists. The file is copied if it can't be linked,
+    e.g. because source and destination are on different file systems.
+    """
+    remove_file(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+class ContainerScriptCache:
+    """
+    A container_script_function for AbstractBatchSubmission that only runs batchScript once per distinct job script.
+
+    The container scripts are stored in a cache directory, keyed by the sha256 hash of the content of the job script that they run.
+    Every job whose script has the same content as a script that was seen before gets a hard link to the cached container script,
+    instead of a new call to batchScript. A copy of the job script is stored next to each cached container script, which is what the
+    container script runs, such that it is independent of the job that first created it. Once the cache holds more than max_entries
+    container scripts, the least recently used ones are removed. The copies of the job scripts are never removed, since the container
+    scripts of the jobs that are already written, which are hard links to the removed ones, still run them.
+
+    Jobs that differ only by their arguments have distinct scripts. In parametrized mode, a single container script is created, which runs
+    the script named by the environment variable PYBATCHSUB_SCRIPT. The container script of each job is then a short shim that sets this
+    variable to the job's own script and executes the shared container script, so batchScript is run once for all jobs.
+
+    Attributes
+    ----------
+        directory : str
+            The directory where the container scripts are cached.
+        max_entries : int
+            The largest number of container scripts kept in the cache.
+        parametrized : bool
+            If true, all jobs share one container script that runs the script passed by their shim.
+        generations : int
+            The number of container scripts created with batchScript.
+        hits : int
+            The number of container scripts that were reused from the cache.
+
+    Methods
+    -------
+        get_container_script
+            Return the path of the cached container script for a job script, creating it if needed.
+    """
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES, parametrized=False, generate=generate_container_script):
+        """
+        Open, or create, a cache of container scripts in directory.
+
+        Parameters
+        ----------
+            directory : str
+                The directory where the container scripts are cached.
+            max_entries : int (optional)
+                The largest number of container scripts kept in the cache. A removed container script is created again with
+                batchScript the next time that it is needed.
+            parametrized : bool (optional)
+                If true, all jobs share one container script that runs the script passed by their shim.
+            generate : function (optional)
+                The function that creates a container script, given the command to run inside of the container and the path of the script.
+
+        Returns
+        -------
+            None
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.parametrized = parametrized
+        self.generate = generate
+        self.generations = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+        prepare_directory(directory)
+        # The cached container scripts, from the least to the most recently used. Scripts cached by previous processes are reused.
+        self._entries = OrderedDict()
+        cached = [name for name in os.listdir(directory) if name.endswith("_container.sh")]
+        cached.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+        for name in cached:
+            self._entries[name[:-len("_container.sh")]] = os.path.join(directory, name)
+
+    def __call__(self, script):
+        """
+        Create the container script of a job, given the path of the job's script, and return its path.
+        """
+        container_script = get_container_script_name(script)
+        if self.parametrized:
+            shared_script = self.get_container_script(PARAMETRIZED_KEY, "source \"${}\"".format(SCRIPT_VARIABLE))
+            with open(container_script, "w") as f:
+                f.write("#!/bin/sh\n")
+                f.write("{}={}\n".format(SCRIPT_VARIABLE, shlex.quote(script)))
+                f.write("export {}\n".format(SCRIPT_VARIABLE))
+                f.write("exec {} \"$@\"\n".format(shlex.quote(shared_script)))
+            return container_script
+
+        with open(script, "rb") as f:
+            content = f.read()
+        key = hashlib.sha256(content).hexdigest()
+        copied_script = os.path.join(self.directory, key + ".sh")
+        if not os.path.exists(copied_script):
+            with open(copied_script, "wb") as f:
+                f.write(content)
+            os.chmod(copied_script, 0o777)
+        link_file(self.get_container_script(key, "source {}".format(copied_script)), container_script)
+        return container_script
+
+    def get_container_script(self, key, command):
+        """
+        Return the path of the cached container script with a key, creating it with command if it isn't cached.
+
+        Parameters
+        ----------
+            key : str
+                The key of the container script in the cache.
+            command : str
+                The command run by the container script.
+
+        Returns
+        -------
+            str
+                The path of the cached container script.
+        """
+        with self._lock:
+            container_script = self._entries.get(key)
+            if container_script is not None and os.path.exists(container_script):
+                self.hits += 1
+                self._entries.move_to_end(key)
+                os.utime(container_script)
+                return container_script
+
+            container_script = os.path.join(self.directory, key + "_container.sh")
+            self.generate(command, container_script)
+            self.generations += 1
+            self._entries[key] = container_script
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted_script = self._entries.popitem(last=False)[1]
+                remove_file(evicted_script)
+            return container_script
@@ -0,0 +1,245 @@
+from collections import namedtuple
+import math
+import os
+import re
+
+from pybatchsub.batch_submission_factory import ORDERED_CONDOR_TIMES, check_if_condor_time, get_time_in_seconds
+from pybatchsub.utils import MEMORY_UNITS, parse_memory
+
+# The kinds of failures that are fixed by requesting more resources.
+MEMORY = "MEMORY"
+TIME = "TIME"
+
+# The number of bytes at the end of an error file that are searched for the reason of a failure.
+ERROR_TAIL_SIZE = 1 << 16
+
+# Messages in the error file of a job, or in the reason given by the batch system, that show why the job failed.
+MEMORY_ERROR_MESSAGES = [\
+        "OUT_OF_MEMORY",\
+        "oom-kill",\
+        "out of memory",\
+        "out-of-memory",\
+        "exceeded job memory limit",\
+        "memory limit",\
+        "memoryerror",\
+        "std::bad_alloc",\
+        ]
+TIME_ERROR_MESSAGES = [\
+        "TIMEOUT",\
+        "due to time limit",\
+        "time limit",\
+        "walltime",\
+        "wall time",\
+        "maxruntime",\
+        ]
+# The condor hold reason code of jobs that used more memory than they requested.
+CONDOR_MEMORY_HOLD_CODE = re.compile(r"\bCode 34\b")
+
+ResourceAttempt = namedtuple("ResourceAttempt", ["attempt", "memory", "time", "failure"])
+ResourceAttempt.__doc__ = """
+The resources requested by one submission of a job, as recorded by an EscalationPolicy.
+
+Attributes
+----------
+    attempt : int
+        The number of the submission, starting at 1.
+    memory : str
+        The memory requested by the submission.
+    time : str
+        The time requested by the submission.
+    failure : str or None
+        MEMORY or TIME if the submission failed for lack of that resource, None if the reason of the failure is unknown or if the
+        submission didn't fail.
+"""
+
+
+def find_failure_in_text(text):
+    """
+    Return MEMORY or TIME if text contains a message of a job that ran out of memory or time, otherwise return None.
+    """
+    if not text: return None
+    lower_text = text.lower()
+    if any(message.lower() in lower_text for message in MEMORY_ERROR_MESSAGES) or CONDOR_MEMORY_HOLD_CODE.search(text):
+        return MEMORY
+    if any(message.lower() in lower_text for message in TIME_ERROR_MESSAGES):
+        return TIME
+    return None
+
+
+def read_error_tail(path):
+    """
+    Return the last ERROR_TAIL_SIZE bytes of a file as text, or an empty string if the file doesn't exist.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(os.path.getsize(path) - ERROR_TAIL_SIZE, 0))
+            return f.read().decode(errors="replace")
+    except FileNotFoundError:
+        return ""
+
+
+def scale_memory(memory, factor, max_memory=None):
+    """
+    Return a memory request scaled by a factor, e.g. "2000M" for "1000M" and a factor of 2. The scaled request is in MiB, and has the unit
+    M unless memory is a number without a unit, as used for condor.
+
+    Parameters
+    ----------
+        memory : str
+            The memory request. See utils.parse_memory.
+        factor : float
+            The factor by which the request is scaled.
+        max_memory : str (optional)
+            The largest memory that may be requested. The scaled request is capped at max_memory.
+
+    Returns
+    -------
+        str
+            The scaled memory request, or memory unchanged if it can't be parsed.
+    """
+    try:
+        scaled = parse_memory(memory) * factor
+        if max_memory is not None:
+            scaled = min(scaled, parse_memory(max_memory))
+    except ValueError:
+        return memory
+    scaled = math.ceil(scaled / MEMORY_UNITS["M"])
+    if str(memory).strip().isdigit():
+        return "{}".format(scaled)
+    return "{}M".format(scaled)
+
+
+def scale_time(time, factor, max_time=None):
+    """
+    Return a longer time request. A condor time (e.g. workday) steps up to the next of ORDERED_CONDOR_TIMES, and a slurm time string of
+    the form XX:XX:XX (days, hours and minutes) is scaled by a factor.
+
+    Parameters
+    ----------
+        time : str
+            The time request.
+        factor : float
+            The factor by which a slurm time is scaled.
+        max_time : str (optional)
+            The longest time that may be requested. The longer request is capped at max_time.
+
+    Returns
+    -------
+        str
+            The longer time request, or time unchanged if it can't be parsed.
+    """
+    if check_if_condor_time(time):
+        longer_time = ORDERED_CONDOR_TIMES[min(ORDERED_CONDOR_TIMES.index(time) + 1, len(ORDERED_CONDOR_TIMES) - 1)]
+    else:
+        seconds = get_time_in_seconds(time)
+        if seconds is None: return time
+        minutes = math.ceil(seconds * factor / 60)
+        longer_time = "{:02d}:{:02d}:{:02d}".format(minutes // (24 * 60), (minutes // 60) % 24, minutes % 60)
+
+    if max_time is not None and get_time_in_seconds(max_time) is not None and get_time_in_seconds(longer_time) > get_time_in_seconds(max_time):
+        return max_time
+    return longer_time
+
+
+class EscalationPolicy:
+    """
+    A policy for resubmitting failed jobs with more resources. The reason of a failure is taken from the status reported by the batch
+    system (e.g. the sacct state OUT_OF_MEMORY or TIMEOUT, or the reason a condor job was held), or else from the end of the error file
+    of the job. Jobs that ran out of memory are resubmitted with memory_factor times more memory, and jobs that ran out of time with a longer
+    time, until the job was submitted max_attempts times. Jobs that failed for another reason are resubmitted with the same resources.
+
+    Attributes
+    ----------
+        memory_factor : float
+            The factor by which the memory of a job that ran out of memory is scaled.
+        max_memory : str or None
+            The largest memory that is requested.
+        time_factor : float
+            The factor by which the slurm time of a job that ran out of time is scaled. Condor times step up to the next ORDERED_CONDOR_TIMES.
+        max_time : str or None
+            The longest time that is requested.
+        max_attempts : int
+            The largest number of times that a job is submitted.
+        history : dict of (str, str) to list of ResourceAttempt
+            The resources of every submission of each job, keyed by the job directory and name of the job.
+
+    Methods
+    -------
+        get_failure
+            Return the kind of resource that a failed job ran out of.
+        escalate
+            Record the resources of the failed submission of a job, and increase the resources of the job for its next submission.
+        select
+            Return the failed jobs to resubmit, with escalated resources.
+    """
+
+    def __init__(self, memory_factor=2.0, max_memory=None, time_factor=2.0, max_time=None, max_attempts=3):
+        self.memory_factor = memory_factor
+        self.max_memory = max_memory
+        self.time_factor = time_factor
+        self.max_time = max_time
+        self.max_attempts = max_attempts
+        self.history = {}
+
+    def get_failure(self, job):
+        """
+        Return MEMORY or TIME if a failed job ran out of memory or time, otherwise return None.
+
+        Parameters
+        ----------
+            job : AbstractBatchSubmission
+                The failed job.
+
+        Returns
+        -------
+            str or None
+                The kind of resource that the job ran out of.
+        """
+        if job.batch_status is not None:
+            failure = find_failure_in_text(job.batch_status.reason)
+            if failure is not None: return failure
+        return find_failure_in_text(read_error_tail(job.error))
+
+    def escalate(self, job):
+        """
+        Record the resources of the failed submission of a job, and increase the memory or time of the job if it ran out of them.
+
+        Parameters
+        ----------
+            job : AbstractBatchSubmission
+                The failed job.
+
+        Returns
+        -------
+            str or None
+                The kind of resource that the job ran out of.
+        """
+        failure = self.get_failure(job)
+        history = self.history.setdefault((job.job_directory, job.jobname), [])
+        history.append(ResourceAttempt(job.attempts, job.memory, job.time, failure))
+
+        if failure == MEMORY:
+            job.memory = scale_memory(job.memory, self.memory_factor, self.max_memory)
+        elif failure == TIME:
+            job.time = scale_time(job.time, self.time_factor, self.max_time)
+        print("Job {} failed ({}), and is resubmitted with memory {} and time {}".format(job.jobname, failure or "unknown reason", job.memory, job.time))
+        return failure
+
+    def select(self, jobs):
+        """
+        Return the failed jobs that were submitted fewer than max_attempts times, after escalating their resources.
+
+        Parameters
+        ----------
+            jobs : list of AbstractBatchSubmission
+                The failed jobs.
+
+        Returns
+        -------
+            list of AbstractBatchSubmission
+                The jobs to resubmit.
+        """
+        selected = [job for job in jobs if job.attempts < self.max_attempts]
+        for job in selected:
+            self.escalate(job)
+        return selected
@@ -0,0 +1,172 @@
+import threading
+import time
+
+DEFAULT_QUEUE_TTL = 10
+
+
+class JobQueueCache:
+    """
+    A snapshot of the job queue of one batch system, shared by all jobs submitted to that system. The queue is only
+    queried again once the snapshot is older than the time-to-live, or after the snapshot was explicitly invalidated
+    (e.g. after a submission). This means that checking the status of many jobs costs a single query to the scheduler.
+
+    Attributes
+    ----------
+        ttl : float
+            The number of seconds for which a snapshot of the queue is reused.
+        queries : int
+            The number of times that the batch system was queried through this cache.
+
+    Methods
+    -------
+        get
+            Return the cached snapshot of the queue, querying the batch system if the snapshot is missing or expired.
+        get_async
+            The counterpart of get for asyncio, where the batch system is queried by a coroutine.
+        invalidate
+            Forget the current snapshot, such that the next call to get queries the batch system.
+    """
+
+    def __init__(self, ttl=DEFAULT_QUEUE_TTL):
+        """
+        Initialize a JobQueueCache.
+
+        Parameters
+        ----------
+            ttl : float (optional)
+                The number of seconds for which a snapshot of the queue is reused. A ttl of 0 disables the caching.
+
+        Returns
+        -------
+            None
+        """
+        self.ttl = ttl
+        self.queries = 0
+        self._snapshot = None
+        self._timestamp = None
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        """
+        Return the cached snapshot of the queue.
+
+        Parameters
+        ----------
+            query : function
+                A function without arguments that queries the batch system and returns the set of jobids in the queue.
+                It is only called if there is no valid snapshot.
+
+        Returns
+        -------
+            set
+                The jobids of all jobs in the queue.
+        """
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._timestamp >= self.ttl:
+                self._snapshot = query()
+                self._timestamp = time.monotonic()
+                self.queries += 1
+            return self._snapshot
+
+    async def get_async(self, query):
+        """
+        Return the cached snapshot of the queue, without blocking the event loop.
+
+        Parameters
+        ----------
+            query : coroutine function
+                A coroutine function without arguments that queries the batch system and returns the set of jobids in the queue.
+                It is only awaited if there is no valid snapshot.
+
+        Returns
+        -------
+            set
+                The jobids of all jobs in the queue.
+        """
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._timestamp < self.ttl:
+                return self._snapshot
+
+        snapshot = await query()
+        with self._lock:
+            self._snapshot = snapshot
+            self._timestamp = time.monotonic()
+            self.queries += 1
+        return snapshot
+
+    def invalidate(self):
+        """
+        Forget the current snapshot of the queue.
+        """
+        with self._lock:
+            self._snapshot = None
+            self._timestamp = None
+
+
+class JobQueueSnapshot(set):
+    """
+    The jobids of the jobs in the queue that are pending or running. Jobs that the batch system holds in the queue, which are neither
+    running nor failed, aren't in the set, and are listed separately in held.
+
+    Attributes
+    ----------
+        held : set
+            The jobids of the held jobs.
+    """
+
+    def __init__(self, jobids=(), held=()):
+        super().__init__(jobids)
+        self.held = set(held)
+
+
+class LazyJobQueue:
+    """
+    A job queue that is only queried when the first membership test is made. This lets the jobs of a BatchSubmissionSet share one
+    queue, without querying the batch system at all if every job can determine its status from another source.
+
+    Attributes
+    ----------
+        query : function
+            A function without arguments that returns the set of jobids in the queue.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self._queue = None
+
+    def _get_queue(self):
+        if self._queue is None:
+            self._queue = self.query()
+        return self._queue
+
+    def __contains__(self, jobid):
+        return jobid in self._get_queue()
+
+    @property
+    def held(self):
+        """
+        The jobids of the held jobs, if the batch system reports them. See JobQueueSnapshot.
+        """
+        return getattr(self._get_queue(), "held", frozenset())
+
+
+
+def get_queued_mask(jobids, job_queue):
+    """
+    Return whether each jobid is in the job queue, for many jobids at once.
+
+    Parameters
+    ----------
+        jobids : list
+            The jobids to look up. None is never in the queue.
+        job_queue : set
+            The jobids of all jobs in the queue.
+
+    Returns
+    -------
+        bytearray
+            1 for every jobid in the queue, 0 otherwise.
+    """
+    if not isinstance(job_queue, (set, frozenset)):
+        job_queue = set(job_queue)
+    return bytearray(jobid in job_queue for jobid in jobids)
@@ -0,0 +1,162 @@
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchJobStatus, PENDING, RUNNING, COMPLETED, FAILED, TERMINAL_STATES
+from concurrent.futures import ThreadPoolExecutor, wait
+import itertools
+import os
+import subprocess
+import threading
+
+
+class LocalJobPool:
+    """
+    A bounded pool of processes on the current node, which runs the scripts of LocalSubmission jobs. At most max_workers scripts run at
+    once, and the others wait in the queue of the pool. Each job gets a pseudo-jobid of the form "local_<pid>_<n>", unique to the process
+    that submitted it, and its status is kept until the end of the process.
+
+    Attributes
+    ----------
+        max_workers : int
+            The largest number of scripts that run at once.
+
+    Methods
+    -------
+        submit
+            Queue the script of a job, and return its pseudo-jobid.
+        get_queue
+            Return the pseudo-jobids of the jobs that are queued or running.
+        get_status
+            Return the status of a job.
+        join
+            Wait until all queued jobs have terminated.
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        Initialize a LocalJobPool.
+
+        Parameters
+        ----------
+            max_workers : int (optional)
+                The largest number of scripts that run at once. Defaults to the number of CPUs of the node.
+
+        Returns
+        -------
+            None
+        """
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self._executor = None
+        self._futures = {}
+        self._statuses = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, script, output, error):
+        """
+        Queue a script to be run with /bin/sh. Its standard output and error are written to output and error, which are created when the
+        script starts, as a batch system would.
+
+        Parameters
+        ----------
+            script : str
+                The path of the script.
+            output : str
+                The path of the file where the standard output of the script is written.
+            error : str
+                The path of the file where the standard error of the script is written.
+
+        Returns
+        -------
+            str
+                The pseudo-jobid of the job.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers = self.max_workers, thread_name_prefix = "pybatchsub_local")
+            jobid = "local_{}_{}".format(os.getpid(), next(self._counter))
+            self._statuses[jobid] = BatchJobStatus(PENDING, None, None)
+            self._futures[jobid] = self._executor.submit(self._run, jobid, script, output, error)
+        return jobid
+
+    def _run(self, jobid, script, output, error):
+        """
+        Run the script of a job, and record its exit code. The job leaves the queue only after its output files are closed.
+        """
+        with self._lock:
+            self._statuses[jobid] = BatchJobStatus(RUNNING, None, None)
+        try:
+            with open(output, "wb") as out, open(error, "wb") as err:
+                exit_code = subprocess.run(["/bin/sh", script], stdout = out, stderr = err, stdin = subprocess.DEVNULL).returncode
+            status = BatchJobStatus(COMPLETED, 0, None) if exit_code == 0 else BatchJobStatus(FAILED, exit_code, "NonZeroExitCode")
+        except OSError as e:
+            status = BatchJobStatus(FAILED, None, str(e))
+
+        with self._lock:
+            self._statuses[jobid] = status
+            del self._futures[jobid]
+
+    def get_queue(self):
+        """
+        Return the set of pseudo-jobids of the jobs that are queued or running.
+        """
+        with self._lock:
+            return set(self._futures)
+
+    def get_status(self, jobid):
+        """
+        Return the BatchJobStatus of the job with a pseudo-jobid, or None if the job wasn't submitted to this pool.
+        """
+        with self._lock:
+            return self._statuses.get(jobid)
+
+    def join(self, timeout=None):
+        """
+        Wait until all queued jobs have terminated, or until timeout seconds have passed.
+        """
+        with self._lock:
+            futures = list(self._futures.values())
+        wait(futures, timeout = timeout)
+
+
+class LocalSubmission(AbstractBatchSubmission):
+    """
+    A job run on the current node by a LocalJobPool, without a batch system. The jobs of all LocalSubmissions share the pool of the class,
+    which runs as many jobs at once as there are CPUs. Set LocalSubmission.pool to a LocalJobPool with another max_workers to change this.
+    The time and memory of the job are not enforced.
+    """
+    __slots__ = ()
+
+    pool = LocalJobPool()
+
+    def _get_job_queue(self):
+        """
+        Return the set of pseudo-jobids of the jobs that are queued or running in the pool.
+        """
+        return self.pool.get_queue()
+
+    def _submit(self):
+        """
+        Queue the script of the job in the pool, and return its pseudo-jobid.
+        """
+        return self.pool.submit(self.script, self.output, self.error)
+
+    @classmethod
+    def update_batch_status(cls, jobs):
+        """
+        Update the batch_status of all submitted, unfinished jobs from the statuses recorded by the pool.
+
+        Parameters
+        ----------
+            jobs : list of LocalSubmission
+                The jobs to update.
+
+        Returns
+        -------
+            None
+        """
+        for job in jobs:
+            if job.jobid is None or job.finished or (job.batch_status is not None and job.batch_status.state in TERMINAL_STATES):
+                continue
+            status = cls.pool.get_status(job.jobid)
+            if status is not None:
+                job.batch_status = status
+
+AbstractBatchSubmission.register(LocalSubmission)
@@ -0,0 +1,331 @@
+from array import array
+import functools
+import re
+from pybatchsub.batch_submission import BatchSubmissionSet, create_container_script
+from pybatchsub.condor_event_log import CondorEventLogReader
+
+# The number of jobs of a ParametricJobSet that are instantiated at once. This matches the largest slurm job array submitted by default.
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def make_column(values):
+    """
+    Store a column of the parameter table compactly. Columns of integers and floats are stored in typed arrays, other columns in lists.
+
+    Parameters
+    ----------
+        values : sequence
+            The values of the parameter for every job.
+
+    Returns
+    -------
+        array.array or list
+            The stored column.
+    """
+    values = list(values)
+    if all(type(value) is int for value in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            return values
+    if all(type(value) is float for value in values):
+        return array("d", values)
+    return values
+
+
+@functools.lru_cache(maxsize=None)
+def get_field_pattern(names):
+    """
+    Return the regular expression matching the fields {name} and {name:format_spec} of a template, for the given tuple of names.
+    """
+    return re.compile(r"\{(" + "|".join(re.escape(name) for name in names) + r")(?::([^{}]*))?\}")
+
+
+def fill_template(template, fields):
+    """
+    Replace the fields {name} and {name:format_spec} of a template by the values in fields, formatted as by str.format. Braces that don't
+    enclose the name of a field, e.g. those of ${HOME} or of an awk program, are left as they are. Values that aren't strings are returned
+    as they are.
+
+    Parameters
+    ----------
+        template : str or object
+            The template.
+        fields : dict of str to object
+            The values of the fields.
+
+    Returns
+    -------
+        str or object
+            The filled template.
+    """
+    if not isinstance(template, str) or "{" not in template: return template
+    pattern = get_field_pattern(tuple(fields))
+    return pattern.sub(lambda match: format(fields[match.group(1)], match.group(2) or ""), template)
+
+
+class JobTemplate:
+    """
+    The description of a family of jobs that differ only by their parameters. In all strings of the template, the fields {name} of the
+    parameters of one job and {index} are replaced by their values, which can be formatted as by str.format, e.g. {index:04d}. Other braces,
+    e.g. those of the shell variable ${HOME}, are left as they are. For example, the template with jobname "sweep_{index}" and commands
+    ["python fit.py --seed {seed}"] describes the job "sweep_3" running "python fit.py --seed 42" for the parameters {"seed": 42} of the job
+    with index 3.
+
+    Attributes
+    ----------
+        job_class : type
+            The class of the jobs, derived from AbstractBatchSubmission, e.g. SlurmSubmission.
+        jobname, job_directory, commands, time, memory, output, error, finished_token, in_container, container_script_function
+            The templates of the arguments of job_class. See AbstractBatchSubmission.
+
+    Methods
+    -------
+        create_job
+            Create the job for one set of parameters.
+    """
+
+    def __init__(self, job_class, jobname, job_directory, commands, time, memory, output, error, finished_token="__FINISHED__", in_container=False, container_script_function = create_container_script):
+        self.job_class = job_class
+        self.jobname = jobname
+        self.job_directory = job_directory
+        self.commands = commands
+        self.time = time
+        self.memory = memory
+        self.output = output
+        self.error = error
+        self.finished_token = finished_token
+        self.in_container = in_container
+        self.container_script_function = container_script_function
+
+    def create_job(self, index, parameters):
+        """
+        Create the job for one set of parameters. The scripts of the job are not written until it is submitted.
+
+        Parameters
+        ----------
+            index : int
+                The index of the job, available to the templates as {index}.
+            parameters : dict
+                The parameters of the job.
+
+        Returns
+        -------
+            AbstractBatchSubmission
+                The job, an instance of self.job_class.
+        """
+        fields = dict(parameters, index = index)
+
+        def fill(template):
+            return fill_template(template, fields)
+
+        return self.job_class(fill(self.jobname), fill(self.job_directory), [fill(command) for command in self.commands], fill(self.time), fill(self.memory),\
+                fill(self.output), fill(self.error), finished_token = self.finished_token, in_container = self.in_container,\
+                container_script_function = self.container_script_function)
+
+
+class ParametricJobSet:
+    """
+    A set of jobs defined by a JobTemplate and a table of parameters, with one row per job. Only the parameter table and a few columns with
+    the state of every job (jobid, whether it was submitted and finished, the number of submissions, the status reported by the batch system
+    and how far its output and condor user log were read) are kept in memory. The jobs are instantiated on demand, a chunk at a time,
+    whenever they are submitted or checked, and their state is stored back into the columns. This keeps the memory used by a sweep of a
+    million jobs in the tens of MB. Equal statuses are stored once, so that e.g. all completed jobs share one BatchJobStatus.
+
+    Attributes
+    ----------
+        template : JobTemplate
+            The template of the jobs.
+        parameters : dict of str to array.array or list
+            The columns of the parameter table, keyed by parameter name.
+        chunk_size : int
+            The number of jobs instantiated at once.
+        jobids, submitted, finished, attempts, batch_statuses, output_offsets, event_log_offsets
+            The columns with the state of every job.
+
+    Methods
+    -------
+        get_parameters
+            Return the parameters of one job.
+        submit
+            Submit all jobs that are not running. Optionally group the jobs into job arrays.
+        check_finished
+            Return True if all jobs are not running and finished.
+        check_running
+            Return True if any job is running.
+        get_failed_jobs
+            Return the indices of the failed jobs.
+        resubmit
+            Resubmit all failed jobs.
+    """
+
+    def __init__(self, template, parameters, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Initialize a ParametricJobSet.
+
+        Parameters
+        ----------
+            template : JobTemplate
+                The template of the jobs.
+            parameters : dict of str to sequence
+                The columns of the parameter table, keyed by parameter name. All columns must have the same length, the number of jobs.
+            chunk_size : int (optional)
+                The number of jobs instantiated at once.
+
+        Returns
+        -------
+            None
+
+        Raises
+        ------
+            ValueError if the columns of the parameter table don't all have the same length.
+        """
+        self.template = template
+        self.parameters = {name: make_column(values) for name, values in parameters.items()}
+        self.chunk_size = chunk_size
+
+        lengths = {len(column) for column in self.parameters.values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns of the parameter table must have the same length, got lengths {}".format(sorted(lengths)))
+        n_jobs = lengths.pop() if len(lengths) == 1 else 0
+
+        self.jobids = [None] * n_jobs
+        self.submitted = bytearray(n_jobs)
+        self.finished = bytearray(n_jobs)
+        self.attempts = array("l", bytes(n_jobs * array("l").itemsize))
+        self.batch_statuses = [None] * n_jobs
+        self.output_offsets = array("q", bytes(n_jobs * array("q").itemsize))
+        self.event_log_offsets = array("q", bytes(n_jobs * array("q").itemsize))
+        self._statuses = {}
+
+    def __len__(self):
+        return len(self.jobids)
+
+    def __getitem__(self, index):
+        """
+        Instantiate the job with an index, with its current state.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ParametricJobSet index out of range")
+
+        job = self.template.create_job(index, self.get_parameters(index))
+        job.jobid = self.jobids[index]
+        job.submitted = bool(self.submitted[index])
+        job.finished = bool(self.finished[index])
+        job.attempts = self.attempts[index]
+        job.batch_status = self.batch_statuses[index]
+        job.output_offset = self.output_offsets[index]
+        if self.event_log_offsets[index]:
+            job._event_log_reader = CondorEventLogReader(job.logfile, self.event_log_offsets[index])
+        return job
+
+    def __iter__(self):
+        for index in range(0, len(self)):
+            yield self[index]
+
+    def get_parameters(self, index):
+        """
+        Return the parameters of the job with an index, as a dict.
+        """
+        return {name: column[index] for name, column in self.parameters.items()}
+
+    def _store(self, indices, jobs):
+        """
+        Store the state of instantiated jobs back into the state columns.
+        """
+        for index, job in zip(indices, jobs):
+            self.jobids[index] = job.jobid
+            self.submitted[index] = job.submitted
+            self.finished[index] = job.finished
+            self.attempts[index] = job.attempts
+            self.batch_statuses[index] = None if job.batch_status is None else self._statuses.setdefault(job.batch_status, job.batch_status)
+            self.output_offsets[index] = job.output_offset
+            reader = getattr(job, "_event_log_reader", None)
+            self.event_log_offsets[index] = 0 if reader is None else reader.offset
+
+    def _chunks(self, indices=None):
+        """
+        Iterate over (indices, jobs, BatchSubmissionSet of jobs) for chunks of at most chunk_size jobs.
+        """
+        if indices is None:
+            indices = range(0, len(self))
+        for start in range(0, len(indices), self.chunk_size):
+            chunk = indices[start:start + self.chunk_size]
+            jobs = [self[index] for index in chunk]
+            yield chunk, jobs, BatchSubmissionSet(jobs)
+
+    def submit(self, array=True, max_workers=1):
+        """
+        Submit all jobs that are not running to the batch system. See BatchSubmissionSet.submit.
+
+        Parameters
+        ----------
+            array : bool (optional)
+                If True, every chunk of jobs is submitted with submit_array of the job class, e.g. as a slurm job array or a condor cluster.
+            max_workers : int (optional)
+                The maximum number of submissions in flight at once.
+
+        Returns
+        -------
+            list of int
+                The indices of the jobs that were submitted.
+        """
+        submitted = []
+        for chunk, jobs, jobset in self._chunks():
+            position = {id(job): index for index, job in zip(chunk, jobs)}
+            submitted += [position[id(job)] for job in jobset.submit(array = array, max_workers = max_workers)]
+            self._store(chunk, jobs)
+        return submitted
+
+    def check_finished(self):
+        """
+        Return True if all jobs are not running and have finished. Jobs that were recorded as finished are not checked again.
+        """
+        unfinished = [index for index in range(0, len(self)) if not self.finished[index]]
+        for chunk, jobs, jobset in self._chunks(unfinished):
+            finished = jobset.check_finished()
+            self._store(chunk, jobs)
+            if not finished:
+                return False
+        return True
+
+    def check_running(self):
+        """
+        Return True if any job is running.
+        """
+        unfinished = [index for index in range(0, len(self)) if not self.finished[index]]
+        for chunk, jobs, jobset in self._chunks(unfinished):
+            running = jobset.check_running()
+            self._store(chunk, jobs)
+            if running:
+                return True
+        return False
+
+    def get_failed_jobs(self):
+        """
+        Return the indices of the failed jobs.
+        """
+        failed = []
+        unfinished = [index for index in range(0, len(self)) if not self.finished[index]]
+        for chunk, jobs, jobset in self._chunks(unfinished):
+            position = {id(job): index for index, job in zip(chunk, jobs)}
+            failed += [position[id(job)] for job in jobset.get_failed_jobs()]
+            self._store(chunk, jobs)
+        return failed
+
+    def resubmit(self, array=True, max_workers=1):
+        """
+        Resubmit all failed jobs. See submit.
+
+        Returns
+        -------
+            list of int
+                The indices of the jobs that were resubmitted.
+        """
+        failed = self.get_failed_jobs()
+        for chunk, jobs, jobset in self._chunks(failed):
+            jobset._submit_jobs(jobs, array = array, max_workers = max_workers)
+            self._store(chunk, jobs)
+        return failed
@@ -0,0 +1,164 @@
+"""
+A local simulator of the slurm and condor batch systems, for testing and benchmarking pybatchsub without a cluster.
+
+SchedulerSimulator installs fake sbatch, squeue, sacct, condor_submit and condor_q executables on the PATH and a fake htcondor module on
+sys.path, all backed by one SimulatedScheduler, whose latency, failure rate, queue size and job run time are configurable.
+"""
+import os
+import sys
+import tempfile
+import threading
+
+from pybatchsub.simulator.commands import COMMANDS, DIRECTORY_VARIABLE
+from pybatchsub.simulator.scheduler import SimulatedScheduler, write_config
+
+# The directory holding the fake htcondor module.
+MODULES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules")
+# The directory from which pybatchsub is imported by the fake executables.
+PACKAGE_PARENT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.dirname(MODULES_DIRECTORY)))
+
+
+class SchedulerSimulator:
+    """
+    A simulated batch system, installed in the current process. While it is installed, the slurm and condor commands run by pybatchsub and
+    the htcondor module that it imports are fakes that act on a SimulatedScheduler. It can be used as a context manager:
+
+        with SchedulerSimulator(run_time=1, failure_rate=0.01):
+            jobset.submit(array=True)
+            jobset.wait()
+
+    Attributes
+    ----------
+        directory : str
+            The directory holding the executables, configuration and database of the simulated scheduler.
+        config : dict
+            The configuration of the simulated scheduler. See scheduler.DEFAULT_CONFIG.
+        tick : float or None
+            The interval in seconds at which the jobs are advanced while the simulator is installed, as a real scheduler would, even if
+            it isn't queried, e.g. while condor jobs are followed through their user logs. If None, jobs only advance when queried.
+
+    Methods
+    -------
+        install
+            Put the fake executables on the PATH and the fake htcondor module on sys.path.
+        uninstall
+            Restore the PATH, sys.path and htcondor module.
+        configure
+            Change the configuration of the simulated scheduler.
+        get_scheduler
+            Return the SimulatedScheduler, e.g. to inspect its jobs or count the calls of a command.
+        advance
+            Advance the jobs to the current time.
+    """
+
+    def __init__(self, directory=None, tick=0.1, **config):
+        """
+        Initialize a SchedulerSimulator.
+
+        Parameters
+        ----------
+            directory : str (optional)
+                The directory of the simulated scheduler. Defaults to a new temporary directory.
+            tick : float or None (optional)
+                The interval in seconds at which the jobs are advanced while the simulator is installed.
+            config
+                The options of the simulated scheduler: latency (seconds per command), failure_rate (probability of a transient failure
+                of a command), queue_size (largest number of active jobs), pending_time and run_time (seconds that a job is pending and
+                running), job_failure_rate (probability that a job fails), execute (whether the scripts of the jobs are run) and
+                finished_token (written to the output of jobs that aren't run).
+
+        Returns
+        -------
+            None
+        """
+        self.directory = directory if directory is not None else tempfile.mkdtemp(prefix = "pybatchsub_simulator_")
+        self.config = config
+        self.tick = tick
+        self._saved = None
+        self._stop = None
+        os.makedirs(os.path.join(self.directory, "bin"), exist_ok = True)
+        write_config(self.directory, config)
+        SimulatedScheduler(self.directory).close()
+        for command in COMMANDS:
+            self._write_executable(command)
+
+    def _write_executable(self, command):
+        path = os.path.join(self.directory, "bin", command)
+        with open(path, "w") as f:
+            f.write("#!{}\n".format(sys.executable))
+            f.write("import os, sys\n")
+            f.write("sys.path.insert(0, {!r})\n".format(PACKAGE_PARENT_DIRECTORY))
+            f.write("os.environ.setdefault({!r}, {!r})\n".format(DIRECTORY_VARIABLE, self.directory))
+            f.write("from pybatchsub.simulator.commands import main\n")
+            f.write("sys.exit(main())\n")
+        os.chmod(path, 0o777)
+
+    def configure(self, **config):
+        """
+        Change options of the configuration of the simulated scheduler. See __init__.
+        """
+        self.config = dict(self.config, **config)
+        write_config(self.directory, self.config)
+
+    def get_scheduler(self):
+        """
+        Return the SimulatedScheduler of this simulator. It should be closed after use.
+        """
+        return SimulatedScheduler(self.directory)
+
+    def advance(self):
+        """
+        Advance the jobs of the simulated scheduler to the current time. See SimulatedScheduler.advance.
+        """
+        scheduler = self.get_scheduler()
+        try:
+            scheduler.advance()
+        finally:
+            scheduler.close()
+
+    def _advance_periodically(self, stop):
+        while not stop.wait(self.tick):
+            self.advance()
+
+    def install(self):
+        """
+        Put the fake executables first on the PATH and the fake htcondor module first on sys.path, and discard the htcondor module and
+        schedd that were already imported.
+        """
+        import pybatchsub.condor_submission as condor_submission
+        self._saved = (os.environ.get("PATH"), os.environ.get(DIRECTORY_VARIABLE), sys.modules.pop("htcondor", None), condor_submission.schedd)
+        os.environ["PATH"] = os.path.join(self.directory, "bin") + os.pathsep + os.environ.get("PATH", "")
+        os.environ[DIRECTORY_VARIABLE] = self.directory
+        sys.path.insert(0, MODULES_DIRECTORY)
+        condor_submission.schedd = None
+        if self.tick is not None:
+            self._stop = threading.Event()
+            threading.Thread(target = self._advance_periodically, args = (self._stop,), daemon = True).start()
+
+    def uninstall(self):
+        """
+        Restore the PATH, sys.path and htcondor module as they were before install.
+        """
+        if self._saved is None: return
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+        import pybatchsub.condor_submission as condor_submission
+        path, directory, htcondor, schedd = self._saved
+        self._saved = None
+        for name, value in (("PATH", path), (DIRECTORY_VARIABLE, directory)):
+            if value is None: os.environ.pop(name, None)
+            else: os.environ[name] = value
+        if MODULES_DIRECTORY in sys.path:
+            sys.path.remove(MODULES_DIRECTORY)
+        sys.modules.pop("htcondor", None)
+        if htcondor is not None:
+            sys.modules["htcondor"] = htcondor
+        condor_submission.schedd = schedd
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
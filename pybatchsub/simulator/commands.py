@@ -0,0 +1,255 @@
+import os
+import re
+import shlex
+import sys
+
+from pybatchsub.simulator.scheduler import SimulatedScheduler, SimulatedFailure, QueueFull, PENDING, RUNNING, HELD, DONE
+
+# The environment variable holding the directory of the simulated scheduler used by the fake executables and the fake htcondor module.
+DIRECTORY_VARIABLE = "PYBATCHSUB_SIMULATOR_DIRECTORY"
+
+# The fake executables of the simulator.
+COMMANDS = ["sbatch", "squeue", "sacct", "condor_submit", "condor_q"]
+
+# The errors printed by the fake executables, as the real ones would print them.
+FAILURE_MESSAGES = {\
+        "sbatch": "sbatch: error: Batch job submission failed: Socket timed out on send/recv operation",\
+        "squeue": "slurm_load_jobs error: Socket timed out on send/recv operation",\
+        "sacct": "sacct: error: slurmdbd: Getting response to message type: DBD_GET_JOBS_COND",\
+        "condor_submit": "ERROR: Can't find address of local schedd",\
+        "condor_q": "Error: Couldn't contact the condor_schedd",\
+        }
+QUEUE_FULL_MESSAGES = {\
+        "sbatch": "sbatch: error: QOSMaxSubmitJobPerUserLimit\nsbatch: error: Batch job submission failed: Job violates accounting/QOS policy (job submit limit, user's size and/or time limits)",\
+        "condor_submit": "ERROR: Failed to commit job submission into the queue. Number of submitted jobs would exceed MAX_JOBS_PER_OWNER",\
+        }
+
+SQUEUE_DEFAULT_FORMAT = "%.18i %.9P %.8j %.8u %.2t %.10M %.6D %R"
+SQUEUE_FORMAT_FIELD = re.compile(r"%(\.?)(\d*)([a-zA-Z])")
+SQUEUE_HEADERS = {"i": "JOBID", "P": "PARTITION", "j": "NAME", "u": "USER", "t": "ST", "T": "STATE", "M": "TIME", "D": "NODES", "R": "NODELIST(REASON)"}
+ARRAY_DISPATCH_LINE = re.compile(r"^(\d+)\) exec (.+) ;;$")
+CONDOR_MACRO = re.compile(r"\$\((\w+)\)")
+
+
+def get_option(argv, names, default=None):
+    """
+    Return the value of an option given as "--name=value", "-n value" or "--name value", or default if it isn't given.
+    """
+    for position, arg in enumerate(argv):
+        for name in names:
+            if arg.startswith(name + "=") and name.startswith("--"):
+                return arg[len(name) + 1:]
+            if arg == name and position + 1 < len(argv):
+                return argv[position + 1]
+    return default
+
+
+def parse_array_spec(spec):
+    """
+    Return the task ids of a slurm --array specification, e.g. [0, 1, 2, 5] for "0-2,5%2".
+    """
+    tasks = []
+    for task_range in spec.split("%")[0].split(","):
+        if "-" in task_range:
+            first, last = task_range.split("-")
+            tasks += list(range(int(first), int(last) + 1))
+        else:
+            tasks.append(int(task_range))
+    return tasks
+
+
+def parse_dispatch_script(script):
+    """
+    Return the script, output and error of each task of a dispatch script written by slurm_submission.write_array_dispatch_script, keyed by
+    task id. Return an empty dict if script isn't such a dispatch script.
+    """
+    tasks = {}
+    try:
+        with open(script, "r") as f:
+            for line in f:
+                match = ARRAY_DISPATCH_LINE.match(line.strip())
+                if match is None: continue
+                words = shlex.split(match.group(2))
+                if len(words) == 5 and words[1] == ">" and words[3] == "2>":
+                    tasks[int(match.group(1))] = {"script": words[0], "output": words[2], "error": words[4]}
+    except (OSError, UnicodeDecodeError):
+        return {}
+    return tasks
+
+
+def sbatch(scheduler, argv):
+    positional = [arg for arg in argv if not arg.startswith("-")]
+    if len(positional) == 0:
+        print("sbatch: error: Batch script is empty!", file=sys.stderr)
+        return 1
+    script = os.path.abspath(positional[0])
+    output = get_option(argv, ["--output", "-o"], "slurm-%j.out")
+    error = get_option(argv, ["--error", "-e"], output)
+    array = get_option(argv, ["--array", "-a"])
+
+    if array is None:
+        tasks = [{"script": script, "output": output, "error": error}]
+    else:
+        dispatched = parse_dispatch_script(script)
+        tasks = []
+        for task_id in parse_array_spec(array):
+            task = dispatched.get(task_id, {"script": script, "output": output, "error": error})
+            tasks.append(dict(task, task = task_id))
+    jobid = scheduler.submit("slurm", tasks)
+    print("Submitted batch job {}".format(jobid))
+    return 0
+
+
+def get_squeue_fields(jobid, phase, reason):
+    return {"i": jobid, "P": "simulated", "j": "simjob", "u": os.getenv("USER", "user"), "t": "PD" if phase == PENDING else "R",\
+            "T": "PENDING" if phase == PENDING else "RUNNING", "M": "0:00", "D": "1", "R": reason if phase == PENDING else "simnode"}
+
+
+def format_squeue_line(squeue_format, fields):
+    def replace(match):
+        right, width, field = match.groups()
+        value = str(fields.get(field, ""))
+        if not width: return value
+        return value.rjust(int(width)) if right else value.ljust(int(width))
+    return SQUEUE_FORMAT_FIELD.sub(replace, squeue_format)
+
+
+def squeue(scheduler, argv):
+    scheduler.advance()
+    squeue_format = get_option(argv, ["--format", "-o"], SQUEUE_DEFAULT_FORMAT)
+    one_task_per_line = "-r" in argv or "--array" in argv
+
+    lines = []
+    if not ("-h" in argv or "--noheader" in argv):
+        lines.append(format_squeue_line(squeue_format, SQUEUE_HEADERS))
+
+    requested = get_option(argv, ["--jobs", "-j"])
+    clusters = sorted({int(token.split("_")[0]) for token in requested.split(",") if token}) if requested is not None else None
+    jobs = scheduler.get_jobs("slurm", active_only = True, clusters = clusters)
+    if clusters is not None and len(jobs) == 0:
+        # squeue fails when none of the requested jobs is known anymore
+        print("slurm_load_jobs error: Invalid job id specified", file=sys.stderr)
+        return 1
+
+    pending_tasks = {}
+    for jobid, cluster, task, phase, exit_code, start, end in jobs:
+        if "_" in jobid and phase == PENDING and not one_task_per_line:
+            # pending tasks of an array are shown on one line, as squeue does without -r
+            pending_tasks.setdefault(cluster, []).append(task)
+            continue
+        lines.append(format_squeue_line(squeue_format, get_squeue_fields(jobid, phase, "(Priority)")))
+    for cluster, tasks in pending_tasks.items():
+        jobid = "{}_[{}]".format(cluster, ",".join(str(task) for task in tasks)) if len(tasks) > 1 else "{}_{}".format(cluster, tasks[0])
+        lines.append(format_squeue_line(squeue_format, get_squeue_fields(jobid, PENDING, "(Priority)")))
+
+    sys.stdout.write("".join(line + "\n" for line in lines))
+    return 0
+
+
+def sacct(scheduler, argv):
+    scheduler.advance()
+    fields = get_option(argv, ["--format", "-o"], "JobID,State,ExitCode").split(",")
+    separator = "|" if ("--parsable2" in argv or "-P" in argv) else " "
+    requested = get_option(argv, ["--jobs", "-j"], "")
+    tokens = {token for token in requested.split(",") if token}
+    clusters = sorted({int(token.split("_")[0]) for token in tokens})
+
+    lines = []
+    if not ("--noheader" in argv or "-n" in argv):
+        lines.append(separator.join(fields))
+    for jobid, cluster, task, phase, exit_code, start, end in scheduler.get_jobs("slurm", clusters = clusters):
+        if jobid not in tokens and str(cluster) not in tokens: continue
+        state = {PENDING: "PENDING", RUNNING: "RUNNING"}.get(phase, "COMPLETED" if exit_code == 0 else "FAILED")
+        values = {"JobID": jobid, "State": state, "ExitCode": "{}:0".format(exit_code if phase == DONE else 0),\
+                "Elapsed": "00:00:{:02d}".format(int(max(0, end - start)) % 60), "MaxRSS": ""}
+        lines.append(separator.join(values.get(field, "") for field in fields))
+        if phase == DONE:
+            values.update(JobID = jobid + ".batch", MaxRSS = "1024K")
+            lines.append(separator.join(values.get(field, "") for field in fields))
+
+    sys.stdout.write("".join(line + "\n" for line in lines))
+    return 0
+
+
+def parse_submit_description(path):
+    """
+    Parse a condor submit description, as written by CondorSubmission. Return the list of tasks, with the keys script, output, error and log.
+    Every queue statement queues jobs with the settings made so far: "queue" or "queue N" queues one or N jobs, and "queue ... from ( ... )"
+    queues one job per row of an itemdata table.
+    """
+    with open(path, "r") as f:
+        lines = [line.strip() for line in f.read().split("\n")]
+
+    def expand(value, row):
+        return CONDOR_MACRO.sub(lambda match: row.get(match.group(1).lower(), ""), value) if value is not None else None
+
+    def get_task(settings, row):
+        return {"script": expand(settings.get("executable"), row), "output": expand(settings.get("output"), row),\
+                "error": expand(settings.get("error"), row), "log": expand(settings.get("log"), row)}
+
+    settings = {}
+    tasks = []
+    position = 0
+    while position < len(lines):
+        line = lines[position]
+        position += 1
+        lower = line.lower()
+        if lower == "queue" or lower.startswith("queue "):
+            if " from " in lower and line.endswith("("):
+                names = [name.strip().lower() for name in line[len("queue"):lower.index(" from ")].split(",")]
+                while position < len(lines) and lines[position] != ")":
+                    if lines[position]:
+                        tasks.append(get_task(settings, dict(zip(names, [value.strip() for value in lines[position].split(",")]))))
+                    position += 1
+                position += 1
+            else:
+                count = line[len("queue"):].strip()
+                tasks += [get_task(settings, {}) for i in range(0, int(count) if count else 1)]
+            continue
+        if "=" in line:
+            key, value = line.split("=", 1)
+            settings[key.strip().lower()] = value.strip()
+
+    return tasks
+
+
+def condor_submit(scheduler, argv):
+    positional = [arg for arg in argv if not arg.startswith("-")]
+    if len(positional) == 0:
+        print("ERROR: no submit description file", file=sys.stderr)
+        return 1
+    tasks = parse_submit_description(positional[0])
+    cluster = scheduler.submit("condor", tasks)
+    print("Submitting job(s){}".format("." * len(tasks)))
+    print("{} job(s) submitted to cluster {}.".format(len(tasks), cluster))
+    return 0
+
+
+def condor_q(scheduler, argv):
+    scheduler.advance()
+    jobs = scheduler.get_jobs("condor", active_only = True)
+    print("-- Schedd: simulator")
+    print("Total for query: {} jobs; {} idle, {} running, {} held".format(len(jobs), sum(job[3] == PENDING for job in jobs),\
+            sum(job[3] == RUNNING for job in jobs), sum(job[3] == HELD for job in jobs)))
+    return 0
+
+
+def main(argv=None):
+    """
+    The entry point of the fake executables. The command is the name of the executable, and the simulated scheduler is the one in the
+    directory given by the environment variable PYBATCHSUB_SIMULATOR_DIRECTORY.
+    """
+    if argv is None: argv = sys.argv
+    command = os.path.basename(argv[0])
+    scheduler = SimulatedScheduler(os.environ[DIRECTORY_VARIABLE])
+    try:
+        scheduler.call(command)
+        return globals()[command](scheduler, argv[1:])
+    except SimulatedFailure:
+        print(FAILURE_MESSAGES[command], file=sys.stderr)
+        return 1
+    except QueueFull:
+        print(QUEUE_FULL_MESSAGES[command], file=sys.stderr)
+        return 1
+    finally:
+        scheduler.close()
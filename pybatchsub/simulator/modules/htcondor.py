@@ -0,0 +1,78 @@
+"""
+A fake of the parts of the htcondor python bindings used by pybatchsub, backed by the simulated scheduler in the directory given by the
+environment variable PYBATCHSUB_SIMULATOR_DIRECTORY. It is imported as htcondor once SchedulerSimulator.install() was called.
+"""
+import os
+import re
+
+from pybatchsub.simulator.commands import DIRECTORY_VARIABLE
+from pybatchsub.simulator.scheduler import SimulatedScheduler, SimulatedFailure, PENDING, RUNNING, HELD
+
+# The parts of a ClassAd constraint understood by the fake schedd, and their python counterparts.
+CONSTRAINT_TRANSLATIONS = [\
+        (re.compile(r"member\((\w+),\s*\{([^}]*)\}\)"), r"(\1 in (\2,))"),\
+        (re.compile(r"&&"), " and "),\
+        (re.compile(r"\|\|"), " or "),\
+        (re.compile(r"\btrue\b"), "True"),\
+        (re.compile(r"\bfalse\b"), "False"),\
+        ]
+
+
+class JobStatus:
+    IDLE = 1
+    RUNNING = 2
+    REMOVED = 3
+    COMPLETED = 4
+    HELD = 5
+
+
+class Submit(dict):
+    """
+    A submit description, printed as "key = value" lines.
+    """
+    def __str__(self):
+        return "".join("{} = {}\n".format(key, value) for key, value in self.items())
+
+
+def compile_constraint(constraint):
+    """
+    Translate a ClassAd constraint made of comparisons, member, && and || into a python expression of the attributes of a job.
+    """
+    for pattern, replacement in CONSTRAINT_TRANSLATIONS:
+        constraint = pattern.sub(replacement, constraint)
+    return compile(constraint, "<constraint>", "eval")
+
+
+class Schedd:
+    """
+    The schedd of the simulated scheduler.
+    """
+    def xquery(self, constraint="true", projection=()):
+        """
+        Yield the ClassAds of the condor jobs of the simulated scheduler that match the constraint, as dicts with ClusterId, ProcId,
+        JobStatus and Owner. The projection is ignored.
+        """
+        expression = compile_constraint(constraint)
+        scheduler = SimulatedScheduler(os.environ[DIRECTORY_VARIABLE])
+        try:
+            try:
+                scheduler.call("schedd_query")
+            except SimulatedFailure:
+                raise RuntimeError("Failed to fetch ads from schedd.")
+            scheduler.advance()
+            jobs = scheduler.get_jobs("condor")
+        finally:
+            scheduler.close()
+
+        statuses = {PENDING: JobStatus.IDLE, RUNNING: JobStatus.RUNNING, HELD: JobStatus.HELD}
+        owner = os.getenv("USER", "user")
+        for jobid, cluster, task, phase, exit_code, start, end in jobs:
+            ad = {"ClusterId": cluster, "ProcId": task, "JobStatus": statuses.get(phase, JobStatus.COMPLETED), "Owner": owner}
+            if eval(expression, {"__builtins__": {}}, ad):
+                yield ad
+
+    def query(self, constraint="true", projection=()):
+        """
+        Return the ClassAds of the condor jobs of the simulated scheduler that match the constraint, as a list. See xquery.
+        """
+        return list(self.xquery(constraint, projection))
@@ -0,0 +1,316 @@
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import time
+
+# The name of the file holding the configuration of a simulated scheduler, in its directory.
+CONFIG_FILE = "config.json"
+# The name of the SQLite database holding the jobs of a simulated scheduler, in its directory.
+DATABASE_FILE = "scheduler.db"
+
+DEFAULT_CONFIG = {\
+        "latency": 0.0,\
+        "failure_rate": 0.0,\
+        "queue_size": None,\
+        "pending_time": 0.0,\
+        "run_time": 0.0,\
+        "job_failure_rate": 0.0,\
+        "execute": False,\
+        "finished_token": "__FINISHED__",\
+        }
+
+# The phases of a simulated job. The phases before DONE are those of the jobs in the queue.
+PENDING = 0
+RUNNING = 1
+HELD = 2
+DONE = 3
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS jobs (
+    jobid TEXT PRIMARY KEY,
+    system TEXT NOT NULL,
+    cluster INTEGER NOT NULL,
+    task INTEGER,
+    script TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    log TEXT,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    exit_code INTEGER NOT NULL,
+    phase INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_start ON jobs (phase, start);
+CREATE INDEX IF NOT EXISTS jobs_end ON jobs (phase, end);
+CREATE INDEX IF NOT EXISTS jobs_cluster ON jobs (cluster);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class SimulatedFailure(Exception):
+    """
+    A transient failure of a command of the simulated scheduler, drawn with the failure_rate of its configuration.
+    """
+    pass
+
+
+class QueueFull(Exception):
+    """
+    A submission that would exceed the queue_size of the simulated scheduler.
+    """
+    pass
+
+
+def write_config(directory, config):
+    """
+    Write the configuration of the simulated scheduler in directory. Keys missing from config take their value from DEFAULT_CONFIG.
+    """
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError("Unknown options of the simulated scheduler: {}".format(", ".join(sorted(unknown))))
+    with open(os.path.join(directory, CONFIG_FILE), "w") as f:
+        json.dump(dict(DEFAULT_CONFIG, **config), f)
+
+
+def read_config(directory):
+    """
+    Read the configuration of the simulated scheduler in directory.
+    """
+    try:
+        with open(os.path.join(directory, CONFIG_FILE), "r") as f:
+            return dict(DEFAULT_CONFIG, **json.load(f))
+    except FileNotFoundError:
+        return dict(DEFAULT_CONFIG)
+
+
+def format_condor_event(code, cluster, proc, description, lines=()):
+    """
+    Format an event of a condor user log, as parsed by condor_event_log.parse_event.
+    """
+    event = "{:03d} ({:03d}.{:03d}.000) {} {}\n".format(code, cluster, proc, time.strftime("%Y-%m-%d %H:%M:%S"), description)
+    for line in lines:
+        event += "\t{}\n".format(line)
+    return event + "...\n"
+
+
+class SimulatedScheduler:
+    """
+    The state of a simulated batch system, shared by the fake sbatch, squeue, sacct and condor_submit executables and the fake htcondor
+    module through an SQLite database in a directory. Jobs are not run as they are submitted. Each job is pending for pending_time
+    seconds, then running for run_time seconds, after which it terminates. The phases of the jobs are advanced whenever the scheduler is
+    queried. A job that terminates fails with the probability job_failure_rate, and writes its output and error files: if execute is
+    true its script is run, otherwise its output is written directly, with the finished token unless the job failed. Every command fails
+    with the probability failure_rate after a delay of latency seconds, and submissions that would make more than queue_size jobs
+    active are rejected.
+
+    Attributes
+    ----------
+        directory : str
+            The directory holding the configuration and the database of the scheduler.
+        config : dict
+            The configuration of the scheduler. See DEFAULT_CONFIG.
+
+    Methods
+    -------
+        call
+            Simulate the latency and transient failures of a command, and count the calls of the command.
+        submit
+            Queue a cluster of tasks, and return its id.
+        advance
+            Advance the phases of the jobs to the current time.
+        hold
+            Hold the active jobs of a cluster, as condor holds jobs that exceed their memory.
+        get_jobs
+            Return the jobs of a batch system.
+        get_counter
+            Return the value of a counter, e.g. the number of calls of a command.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.config = read_config(directory)
+        self._connection = sqlite3.connect(os.path.join(directory, DATABASE_FILE), timeout = 60, isolation_level = None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(CREATE_TABLES)
+
+    def close(self):
+        self._connection.close()
+
+    def _increment(self, name, amount=1):
+        """
+        Increment a counter, inside of a transaction, and return its new value.
+        """
+        self._connection.execute("INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + ?", (name, amount, amount))
+        return self._connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def get_counter(self, name):
+        """
+        Return the value of a counter, e.g. "calls_sbatch" for the number of calls of sbatch, or 0 if it was never incremented.
+        """
+        row = self._connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def call(self, command):
+        """
+        Count a call of command, wait for the configured latency, and raise SimulatedFailure with the configured failure rate.
+        """
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._increment("calls_{}".format(command))
+        if self.config["latency"] > 0:
+            time.sleep(self.config["latency"])
+        if random.random() < self.config["failure_rate"]:
+            raise SimulatedFailure("{}: simulated transient failure".format(command))
+
+    def submit(self, system, tasks):
+        """
+        Queue a cluster of tasks.
+
+        Parameters
+        ----------
+            system : str
+                "slurm" or "condor".
+            tasks : list of dict
+                The tasks of the cluster, with the keys script, output, error and log (for condor). For a slurm job array, each task has the
+                key task with its SLURM_ARRAY_TASK_ID.
+
+        Returns
+        -------
+            int
+                The id of the cluster: the slurm jobid, or the condor ClusterId.
+
+        Raises
+        ------
+            QueueFull if the submission would exceed the queue_size.
+        """
+        now = time.time()
+        start = now + self.config["pending_time"]
+        end = start + self.config["run_time"]
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            queue_size = self.config["queue_size"]
+            if queue_size is not None:
+                active = self._connection.execute("SELECT COUNT(*) FROM jobs WHERE phase < ?", (DONE,)).fetchone()[0]
+                if active + len(tasks) > queue_size:
+                    raise QueueFull("{} jobs are queued, and the queue holds at most {}".format(active, queue_size))
+
+            cluster = self._increment("cluster")
+            rows = []
+            for proc, task in enumerate(tasks):
+                if system == "condor":
+                    jobid = "{}.{}".format(cluster, proc)
+                elif task.get("task") is not None:
+                    jobid = "{}_{}".format(cluster, task["task"])
+                else:
+                    jobid = str(cluster)
+                exit_code = 1 if random.random() < self.config["job_failure_rate"] else 0
+                output, error = [self._expand_path(task.get(name), cluster, task.get("task")) for name in ("output", "error")]
+                rows.append((jobid, system, cluster, task.get("task", proc), task["script"], output, error, task.get("log"), start, end, exit_code, PENDING))
+            self._connection.executemany("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+        if system == "condor":
+            for row in rows:
+                self._write_log(row[7], format_condor_event(0, cluster, row[3], "Job submitted from host: <simulator>"))
+        return cluster
+
+    def advance(self):
+        """
+        Advance the phases of the jobs to the current time. Jobs whose start time passed start running, and jobs whose end time passed
+        terminate and write their output.
+        """
+        now = time.time()
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            started = self._connection.execute("SELECT cluster, task, log, system FROM jobs WHERE phase = ? AND start <= ?", (PENDING, now)).fetchall()
+            self._connection.execute("UPDATE jobs SET phase = ? WHERE phase = ? AND start <= ?", (RUNNING, PENDING, now))
+            terminated = self._connection.execute("SELECT jobid, cluster, task, script, output, error, log, exit_code, system FROM jobs WHERE phase = ? AND end <= ?", (RUNNING, now)).fetchall()
+
+            updates = []
+            for cluster, task, log, system in started:
+                if system == "condor":
+                    self._write_log(log, format_condor_event(1, cluster, task, "Job executing on host: <simulator>"))
+            for jobid, cluster, task, script, output, error, log, exit_code, system in terminated:
+                exit_code = self._terminate(jobid, task, script, output, error, exit_code)
+                updates.append((DONE, exit_code, jobid))
+                if system == "condor":
+                    self._write_log(log, format_condor_event(5, cluster, task, "Job terminated.", ["(1) Normal termination (return value {})".format(exit_code)]))
+            self._connection.executemany("UPDATE jobs SET phase = ?, exit_code = ? WHERE jobid = ?", updates)
+
+    def hold(self, cluster, reason="Job has gone over memory limit of 1000 megabytes."):
+        """
+        Hold the pending and running jobs of a cluster until they are removed. Held jobs don't advance, and the hold is written to the
+        user logs of condor jobs.
+        """
+        with self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            held = self._connection.execute("SELECT task, log, system FROM jobs WHERE cluster = ? AND phase < ?", (cluster, HELD)).fetchall()
+            self._connection.execute("UPDATE jobs SET phase = ? WHERE cluster = ? AND phase < ?", (HELD, cluster, HELD))
+        for task, log, system in held:
+            if system == "condor":
+                self._write_log(log, format_condor_event(12, cluster, task, "Job was held.", [reason, "Code 34 Subcode 0"]))
+
+    def _terminate(self, jobid, task, script, output, error, exit_code):
+        """
+        Write the output and error of a terminated job, and return its exit code.
+        """
+        if self.config["execute"]:
+            environment = dict(os.environ, SLURM_ARRAY_TASK_ID = str(task), SLURM_JOB_ID = jobid)
+            with open(output or os.devnull, "wb") as out, open(error or os.devnull, "wb") as err:
+                return subprocess.run(["/bin/sh", script], stdout = out, stderr = err, stdin = subprocess.DEVNULL, env = environment).returncode
+
+        if output is not None:
+            with open(output, "w") as f:
+                f.write("simulated job {}\n".format(jobid))
+                if exit_code == 0:
+                    f.write(self.config["finished_token"] + "\n")
+        if error is not None:
+            with open(error, "w") as f:
+                if exit_code != 0:
+                    f.write("simulated failure of job {}\n".format(jobid))
+        return exit_code
+
+    def _expand_path(self, path, cluster, task):
+        """
+        Replace the slurm filename patterns %j, %A and %a in the path of an output file.
+        """
+        if path is None: return None
+        return path.replace("%j", str(cluster)).replace("%A", str(cluster)).replace("%a", str(task))
+
+    def _write_log(self, log, event):
+        if log is None: return
+        with open(log, "a") as f:
+            f.write(event)
+
+    def get_jobs(self, system, active_only=False, clusters=None):
+        """
+        Return the jobs of a batch system, as a list of tuples of (jobid, cluster, task, phase, exit_code, start, end), ordered by jobid.
+
+        Parameters
+        ----------
+            system : str
+                "slurm" or "condor".
+            active_only : bool (optional)
+                If true, only return the jobs that are pending, running or held.
+            clusters : list of int (optional)
+                If given, only return the jobs of these clusters.
+
+        Returns
+        -------
+            list of tuple
+                The jobs.
+        """
+        query = "SELECT jobid, cluster, task, phase, exit_code, start, end FROM jobs WHERE system = ?"
+        parameters = [system]
+        if active_only:
+            query += " AND phase < ?"
+            parameters.append(DONE)
+        if clusters is not None:
+            query += " AND cluster IN ({})".format(", ".join("?" for cluster in clusters))
+            parameters += list(clusters)
+        return self._connection.execute(query + " ORDER BY cluster, task", parameters).fetchall()
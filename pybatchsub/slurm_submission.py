@@ -1,6 +1,70 @@
-from pybatchsub.batch_submission import AbstractBatchSubmission
-from pybatchsub.utils import do_multiple_subprocess_attempts
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchJobStatus, PENDING, RUNNING, COMPLETED, FAILED, TERMINAL_STATES
+from pybatchsub.utils import do_multiple_subprocess_attempts, async_do_multiple_subprocess_attempts, stream_subprocess_output, memory_translation_to_slurm, prepare_directory, RetryPolicy
+from pybatchsub.job_queue import JobQueueCache
+from collections import namedtuple
 import os
+import shlex
+import subprocess
+import time
+
+# The default MaxArraySize of slurm is 1001, so array indices 0 to 1000 are allowed.
+MAX_ARRAY_SIZE = 1000
+
+# The number of jobids passed to a single call of sacct.
+SACCT_CHUNK_SIZE = 500
+# The number of jobids passed to a single call of squeue, when it is restricted to the tracked jobs. This keeps the --jobs argument
+# far below the limit of the length of a single argument, 128 KiB on linux.
+SQUEUE_CHUNK_SIZE = 1000
+SACCT_FORMAT = "JobID,State,ExitCode,Elapsed,MaxRSS"
+# The number of seconds during which sacct isn't called again after it failed.
+SACCT_COOLDOWN = 300
+# Errors of sacct that mean that it will never work on this system.
+SACCT_UNAVAILABLE_MESSAGES = ["accounting storage is disabled", "Accounting storage is disabled"]
+
+# The translation of the job states reported by sacct to the states of a BatchJobStatus.
+SLURM_STATES = {\
+"PENDING"      : PENDING,
+"REQUEUED"     : PENDING,
+"REQUEUE_HOLD" : PENDING,
+"REQUEUE_FED"  : PENDING,
+"PREEMPTED"    : PENDING,
+"RESIZING"     : PENDING,
+"RUNNING"      : RUNNING,
+"COMPLETING"   : RUNNING,
+"CONFIGURING"  : RUNNING,
+"SIGNALING"    : RUNNING,
+"STAGE_OUT"    : RUNNING,
+"SUSPENDED"    : RUNNING,
+"COMPLETED"    : COMPLETED,
+"FAILED"       : FAILED,
+"CANCELLED"    : FAILED,
+"TIMEOUT"      : FAILED,
+"OUT_OF_MEMORY": FAILED,
+"NODE_FAIL"    : FAILED,
+"BOOT_FAIL"    : FAILED,
+"DEADLINE"     : FAILED,
+"LAUNCH_FAILED": FAILED,
+"REVOKED"      : FAILED,
+"SPECIAL_EXIT" : FAILED,
+}
+
+SacctRecord = namedtuple("SacctRecord", ["jobid", "state", "exit_code", "elapsed", "max_rss"])
+SacctRecord.__doc__ = """
+The accounting information of a slurm job, as reported by sacct.
+
+Attributes
+----------
+    jobid : int or str
+        The jobid of the job, following the conventions of parse_jobid.
+    state : str
+        The state of the job as reported by sacct, e.g. "OUT_OF_MEMORY" or "CANCELLED by 1234".
+    exit_code : str
+        The exit code of the job and the signal that terminated it, e.g. "1:0".
+    elapsed : str
+        The run time of the job.
+    max_rss : str
+        The maximum resident set size of all steps of the job, e.g. "1024K". Empty if unknown.
+"""
 
 def get_jobid_from_submission(long_info):
     """
@@ -20,30 +84,289 @@ def get_jobid_from_submission(long_info):
     return job_id
 
 
-def parse_queue_output(long_info):
+def get_array_jobid(array_id, task_id):
     """
+    Return the jobid of a single task of a job array, as shown by squeue and sacct. E.g. "58508066_3".
+    """
+    return "{}_{}".format(array_id, task_id)
+
+
+def parse_jobid(token):
+    """
+    Parse the jobid column of squeue.
+
     Parameters
     ----------
-        The byte-string returned by querying the slurm system for the currently running jobs.
+        token : str
+            The jobid as printed by squeue. This is either a plain jobid (e.g. 58508066), a single array task (e.g. 58508066_3) or
+            a compressed range of pending array tasks (e.g. 58508066_[4-10,12%5]).
 
     Returns
     -------
-        set of int
-            The jobids of the currenty submitted and running jobs on the slurm batch system.
+        list of int or str
+            The jobids represented by the token. Plain jobids are integers, array tasks are strings of the form "arrayid_taskid".
     """
-    long_info = long_info.decode("utf-8")
-    long_info = long_info.rstrip("\n")
-    lines = long_info.split("\n")
-    if len(lines) < 2: return {}
-    lines = lines[1:] #remove the header line
-    lines = [l.strip() for l in lines]
-    job_ids = {int(l.split(" ")[0]) for l in lines}
+    if "_" not in token:
+        return [int(token)]
+
+    array_id, tasks = token.split("_", 1)
+    if not tasks.startswith("["):
+        return [get_array_jobid(array_id, int(tasks))]
+
+    tasks = tasks.strip("[]").split("%")[0] # remove the limit on simultaneously running tasks
+    job_ids = []
+    for task_range in tasks.split(","):
+        if "-" in task_range:
+            first, last = task_range.split("-")
+            job_ids += [get_array_jobid(array_id, task) for task in range(int(first), int(last) + 1)]
+        else:
+            job_ids.append(get_array_jobid(array_id, int(task_range)))
     return job_ids
 
+
+def parse_queue_stream(lines, header=False):
+    """
+    Parse the output of squeue line by line, e.g. as it is read from the pipe of the squeue process, without holding the whole output
+    in memory. Only the first column of each line is read, so the output of "squeue --noheader -o %i" is parsed fastest.
+
+    Parameters
+    ----------
+        lines : iterable of bytes
+            The lines printed by squeue.
+        header : bool (optional)
+            Whether the first line is a header, to be skipped.
+
+    Returns
+    -------
+        set of int or str
+            The jobids of the currenty submitted and running jobs on the slurm batch system. Tasks of job arrays are
+            represented by strings of the form "arrayid_taskid".
+    """
+    job_ids = set()
+    lines = iter(lines)
+    if header: next(lines, None)
+    for line in lines:
+        token = line.split(None, 1)[0] if b" " in line else line.strip()
+        if not token: continue
+        if b"_" in token:
+            job_ids.update(parse_jobid(token.decode("utf-8")))
+            continue
+        try:
+            job_ids.add(int(token))
+        except ValueError:
+            if token != b"JOBID": raise # a header printed although none was asked for
+    return job_ids
+
+
+def parse_queue_output(long_info, header=True):
+    """
+    Parameters
+    ----------
+        long_info : bytes
+            The byte-string returned by querying the slurm system for the currently running jobs.
+        header : bool (optional)
+            Whether the first line of long_info is a header, to be skipped.
+
+    Returns
+    -------
+        set of int or str
+            The jobids of the currenty submitted and running jobs on the slurm batch system. Tasks of job arrays are
+            represented by strings of the form "arrayid_taskid". See parse_queue_stream.
+    """
+    return parse_queue_stream(long_info.split(b"\n"), header = header)
+
+
+def get_base_jobid(jobid):
+    """
+    Return the jobid of the job array of an array task, or the jobid itself for other jobs, as a string. E.g. "58508066" for "58508066_3".
+    """
+    return str(jobid).split("_", 1)[0]
+
+
+def write_array_dispatch_script(dispatch_script, jobs):
+    """
+    Write a script that runs the script of the job selected by the environment variable SLURM_ARRAY_TASK_ID.
+    The output and error of each job are redirected to the job's own output and error files.
+
+    Parameters
+    ----------
+        dispatch_script : str
+            The path of the script to be written.
+        jobs : list of SlurmSubmission
+            The jobs of the array. The n'th job is run by the task with SLURM_ARRAY_TASK_ID equal to n.
+
+    Returns
+    -------
+        None
+    """
+    with open(dispatch_script, "w") as f:
+        f.write("#!/bin/sh\n")
+        f.write("case \"$SLURM_ARRAY_TASK_ID\" in\n")
+        for task_id, job in enumerate(jobs):
+            f.write("{}) exec {} > {} 2> {} ;;\n".format(task_id, shlex.quote(job.script), shlex.quote(job.output), shlex.quote(job.error)))
+        f.write("*) echo \"No job for array task $SLURM_ARRAY_TASK_ID\" >&2; exit 1 ;;\n")
+        f.write("esac\n")
+    os.chmod(dispatch_script, 0o777)
+
+def get_status_from_sacct_record(record):
+    """
+    Translate a SacctRecord to a BatchJobStatus. The reason of the status is the state reported by sacct, e.g. "OUT_OF_MEMORY".
+    Return None for the states that aren't in SLURM_STATES, e.g. STOPPED, so that the status of the job is taken from squeue and its
+    output file instead.
+    """
+    slurm_state = record.state.split(" ")[0].rstrip("+")
+    state = SLURM_STATES.get(slurm_state)
+    if state is None: return None
+    exit_code = None
+    if ":" in record.exit_code:
+        exit_code = int(record.exit_code.split(":")[0])
+    return BatchJobStatus(state, exit_code, record.state)
+
+
+def parse_sacct_output(long_info):
+    """
+    Parameters
+    ----------
+        The byte-string returned by sacct --noheader --parsable2 --format=JobID,State,ExitCode,Elapsed,MaxRSS.
+
+    Returns
+    -------
+        dict of {int or str : SacctRecord}
+            The accounting information of each job, keyed by jobid. The job steps (e.g. 58508066.batch) are merged into their job.
+    """
+    records = {}
+    max_rss = {}
+    for line in long_info.decode("utf-8").split("\n"):
+        fields = line.strip().split("|")
+        if len(fields) < 5: continue
+        jobid_token, state, exit_code, elapsed, rss = fields[:5]
+
+        if "." in jobid_token:
+            # a job step, which holds the memory usage of the job
+            job_ids = parse_jobid(jobid_token.split(".")[0])
+            if rss and job_ids[0] not in max_rss:
+                max_rss[job_ids[0]] = rss
+            continue
+
+        for jobid in parse_jobid(jobid_token):
+            records[jobid] = SacctRecord(jobid, state, exit_code, elapsed, rss)
+
+    for jobid, rss in max_rss.items():
+        if jobid in records and not records[jobid].max_rss:
+            records[jobid] = records[jobid]._replace(max_rss = rss)
+    return records
+
+
+class SacctStatusResolver:
+    """
+    Resolve the status of many slurm jobs with a few calls to sacct. The jobids are queried in chunks, and the records of jobs in a
+    terminal state are cached permanently, so that they are never queried again.
+
+    Attributes
+    ----------
+        chunk_size : int
+            The maximum number of jobids passed to a single call of sacct.
+        records : dict of {int or str : SacctRecord}
+            The most recent accounting record of every job resolved so far.
+        retry_policy : RetryPolicy
+            The policy of the calls to sacct. sacct is only a complement to squeue and the output files, so by default a failed call
+            isn't retried, and sacct is skipped for SACCT_COOLDOWN seconds instead.
+        cooldown : float
+            The number of seconds during which sacct isn't called again after a failed call.
+        enabled : bool
+            False if sacct is not available on this system. Then no status is resolved.
+        queries : int
+            The number of calls made to sacct.
+
+    Methods
+    -------
+        resolve
+            Return the accounting records of a list of jobids.
+    """
+
+    def __init__(self, chunk_size=SACCT_CHUNK_SIZE, retry_policy=None, cooldown=SACCT_COOLDOWN):
+        self.chunk_size = chunk_size
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy(max_attempts = 1, timeout = 60)
+        self.cooldown = cooldown
+        self.records = {}
+        self.enabled = True
+        self.queries = 0
+        self._terminal = set()
+        self._failed_at = None
+
+    def resolve(self, jobids, retry_policy=None):
+        """
+        Return the accounting records of a list of jobids. Only jobs that are not known to be in a terminal state are queried.
+
+        Parameters
+        ----------
+            jobids : list of int or str
+                The jobids to resolve.
+            retry_policy : RetryPolicy (optional)
+                The policy used to retry failed calls to sacct. Defaults to self.retry_policy.
+
+        Returns
+        -------
+            dict of {int or str : SacctRecord}
+                The records of the jobids known to sacct. Jobs that couldn't be queried keep their previous record, if any.
+        """
+        if retry_policy is None: retry_policy = self.retry_policy
+        cooling_down = self._failed_at is not None and time.monotonic() - self._failed_at < self.cooldown
+        to_query = [jobid for jobid in set(jobids) if jobid not in self._terminal]
+
+        for start in range(0, len(to_query) if self.enabled and not cooling_down else 0, self.chunk_size):
+            chunk = to_query[start:start + self.chunk_size]
+            command = ["sacct", "-j", ",".join(str(jobid) for jobid in chunk), "--noheader", "--parsable2", "--format={}".format(SACCT_FORMAT)]
+            try:
+                long_info = do_multiple_subprocess_attempts(command, retry_policy = retry_policy)
+            except FileNotFoundError:
+                print("sacct is not available. The status of slurm jobs will be taken from squeue and their output files.")
+                self.enabled = False
+                break
+            except Exception as e:
+                stderr = getattr(e, "stderr", None) or b""
+                if isinstance(e, subprocess.CalledProcessError) and (not retry_policy.is_retryable(e) or\
+                        any(message.encode() in stderr for message in SACCT_UNAVAILABLE_MESSAGES)):
+                    print("sacct can't be used. The status of slurm jobs will be taken from squeue and their output files.")
+                    self.enabled = False
+                else:
+                    print("sacct failed, and won't be called for {} seconds".format(self.cooldown))
+                    self._failed_at = time.monotonic()
+                print(e)
+                break
+            self._failed_at = None
+            self.queries += 1
+
+            for jobid, record in parse_sacct_output(long_info).items():
+                self.records[jobid] = record
+                status = get_status_from_sacct_record(record)
+                if status is not None and status.state in TERMINAL_STATES:
+                    self._terminal.add(jobid)
+
+        return {jobid: self.records[jobid] for jobid in jobids if jobid in self.records}
+
+
 class SlurmSubmission(AbstractBatchSubmission):
-    def get_job_queue(self):
+    """
+    A job submitted to the slurm batch system. If use_sacct is True, the status of submitted jobs is resolved in bulk with sacct by
+    update_batch_status, which lets jobs that failed be identified without reading their output files.
+    """
+    __slots__ = ()
+
+    queue_cache = JobQueueCache()
+    retry_policy = RetryPolicy()
+    status_resolver = SacctStatusResolver()
+    use_sacct = True
+    # If True, squeue is only asked for the jobs submitted or updated through this class, rather than all jobs of the user.
+    restrict_queue_query = False
+    # The jobids (without array task) that squeue is asked for, and those that left the queue and aren't asked for anymore.
+    tracked_jobids = set()
+    departed_jobids = set()
+
+    def _get_job_queue(self):
         """
-        Get the queue of jobs currently submitted to the batch system by the user
+        Get the queue of jobs currently submitted to the batch system by the user. The output of squeue is parsed as it is read,
+        and isn't held in memory. If restrict_queue_query is True, the tracked jobs are queried in chunks of SQUEUE_CHUNK_SIZE.
 
         Parameters
         ----------
@@ -53,10 +376,97 @@ class SlurmSubmission(AbstractBatchSubmission):
             set of {int}
                 A set of jobids for all jobs currently running
         """
-        long_info = do_multiple_subprocess_attempts(["squeue", "-u", os.getenv("USER")])
-        job_ids = parse_queue_output(long_info)
+        if not self.restrict_queue_query:
+            return stream_subprocess_output(self.get_queue_command(), parse_queue_stream, retry_policy = self.retry_policy)
+
+        job_ids = set()
+        chunks = self._get_queue_chunks()
+        for chunk in chunks:
+            try:
+                job_ids.update(stream_subprocess_output(self.get_queue_command(chunk), parse_queue_stream, retry_policy = self.retry_policy))
+            except subprocess.CalledProcessError as e:
+                if not (e.stderr and b"Invalid job id" in e.stderr): raise
+                # none of the requested jobs is in the queue anymore
+        self._forget_departed_jobids([jobid for chunk in chunks for jobid in chunk], job_ids)
+        return job_ids
+
+    async def _get_job_queue_async(self):
+        """
+        Get the queue of jobs currently submitted to the batch system by the user, without blocking the event loop.
+        """
+        if not self.restrict_queue_query:
+            long_info = await async_do_multiple_subprocess_attempts(self.get_queue_command(), retry_policy = self.retry_policy)
+            return parse_queue_output(long_info, header = False)
+
+        job_ids = set()
+        chunks = self._get_queue_chunks()
+        for chunk in chunks:
+            try:
+                long_info = await async_do_multiple_subprocess_attempts(self.get_queue_command(chunk), retry_policy = self.retry_policy)
+            except subprocess.CalledProcessError as e:
+                if not (e.stderr and b"Invalid job id" in e.stderr): raise
+                continue
+            job_ids.update(parse_queue_output(long_info, header = False))
+        self._forget_departed_jobids([jobid for chunk in chunks for jobid in chunk], job_ids)
         return job_ids
 
+    def _get_queue_chunks(self):
+        """
+        Return the tracked jobids, sorted and split into lists of at most SQUEUE_CHUNK_SIZE jobids.
+        """
+        jobids = sorted(self.tracked_jobids, key = int)
+        return [jobids[start:start + SQUEUE_CHUNK_SIZE] for start in range(0, len(jobids), SQUEUE_CHUNK_SIZE)]
+
+    def get_queue_command(self, jobids=None):
+        """
+        Create the shell command to query the jobs of the user. Only the jobids are printed, without a header, and tasks of job arrays
+        are listed one per line.
+
+        Parameters
+        ----------
+            jobids : list of str (optional)
+                If given, only these jobs are queried.
+
+        Returns
+        -------
+            list of str
+                The squeue command
+        """
+        command = ["squeue", "-r", "--noheader", "-o", "%i", "-u", os.getenv("USER")]
+        if jobids is not None:
+            command.append("--jobs={}".format(",".join(jobids)))
+        return command
+
+    @classmethod
+    def track_jobids(cls, jobids):
+        """
+        Add jobids to the jobs that squeue is asked for if restrict_queue_query is True. Jobids that already left the queue are
+        ignored. The cached queue is discarded if a jobid is new, since the snapshot didn't include it.
+
+        Parameters
+        ----------
+            jobids : iterable of int or str
+                The jobids, which can be tasks of job arrays.
+
+        Returns
+        -------
+            None
+        """
+        new_jobids = {get_base_jobid(jobid) for jobid in jobids} - cls.tracked_jobids - cls.departed_jobids
+        if len(new_jobids) == 0: return
+        cls.tracked_jobids.update(new_jobids)
+        cls.invalidate_job_queue()
+
+    @classmethod
+    def _forget_departed_jobids(cls, queried_jobids, job_ids):
+        """
+        Stop tracking the jobs that were queried by a restricted squeue query, but weren't found, since jobs don't come back to the
+        queue. Jobs tracked while the query ran weren't queried, and are kept.
+        """
+        departed = set(queried_jobids) - {get_base_jobid(jobid) for jobid in job_ids}
+        cls.tracked_jobids.difference_update(departed)
+        cls.departed_jobids.update(departed)
+
     def _submit(self):
         """
         Submit the job to the batch system, and return the jobid for book keeping.
@@ -70,8 +480,18 @@ class SlurmSubmission(AbstractBatchSubmission):
                 The jobid of the submission.
         """
         submission_command = self.get_submission_command()
-        long_info = do_multiple_subprocess_attempts(submission_command)
+        long_info = do_multiple_subprocess_attempts(submission_command, retry_policy = self.retry_policy)
+        jobid = get_jobid_from_submission(long_info)
+        self.track_jobids([jobid])
+        return jobid
+
+    async def _submit_async(self):
+        """
+        Submit the job to the batch system without blocking the event loop, and return the jobid for book keeping.
+        """
+        long_info = await async_do_multiple_subprocess_attempts(self.get_submission_command(), retry_policy = self.retry_policy)
         jobid = get_jobid_from_submission(long_info)
+        self.track_jobids([jobid])
         return jobid
 
     def get_submission_command(self):
@@ -87,7 +507,7 @@ class SlurmSubmission(AbstractBatchSubmission):
                 The submission command
         """
         submission_command = ["sbatch"]
-        submission_command.append("--mem={}".format(self.memory))
+        submission_command.append("--mem={}".format(memory_translation_to_slurm(self.memory)))
         submission_command.append("--time={}".format(self.time))
         submission_command.append("--output={}".format(self.output))
         submission_command.append("--error={}".format(self.error))
@@ -95,4 +515,103 @@ class SlurmSubmission(AbstractBatchSubmission):
 
         return submission_command
 
+    @classmethod
+    def update_batch_status(cls, jobs):
+        """
+        Update the batch_status of the submitted, unfinished jobs that left the queue with calls to sacct. See SacctStatusResolver.
+        The queue is read through the queue_cache, so this is the same query that the checks of the jobs use, and sacct is only asked
+        for the jobs that are missing from it. The status of the jobs in the queue is left to the queue. The jobs are tracked for
+        restricted queue queries even if sacct isn't used.
+
+        Parameters
+        ----------
+            jobs : list of SlurmSubmission
+                The jobs to update.
+
+        Returns
+        -------
+            None
+        """
+        cls.track_jobids([job.jobid for job in jobs if job.jobid is not None])
+        if not cls.use_sacct: return
+
+        jobs = [job for job in jobs if job.jobid is not None and not job.finished and (job.batch_status is None or job.batch_status.state not in TERMINAL_STATES)]
+        if len(jobs) == 0: return
+
+        job_queue = jobs[0].get_job_queue()
+        departed_jobs = []
+        for job in jobs:
+            if job.jobid in job_queue:
+                job.batch_status = None
+            else:
+                departed_jobs.append(job)
+        jobs = departed_jobs
+        if len(jobs) == 0: return
+
+        records = cls.status_resolver.resolve([job.jobid for job in jobs])
+        for job in jobs:
+            if job.jobid in records:
+                job.batch_status = get_status_from_sacct_record(records[job.jobid])
+
+    @classmethod
+    def submit_array(cls, jobs, array_directory=None, max_array_size=MAX_ARRAY_SIZE):
+        """
+        Submit a list of jobs as slurm job arrays. Jobs requesting the same memory and time are grouped into one array, and
+        one sbatch call is made per array. Each task of the array runs its job through a dispatch script that selects the job
+        with SLURM_ARRAY_TASK_ID. The jobid of each job is set to "arrayid_taskid".
+
+        Parameters
+        ----------
+            jobs : list of SlurmSubmission
+                The jobs to be submitted.
+            array_directory : str (optional)
+                The directory where the dispatch scripts and the slurm logs of the arrays are written. Defaults to the job directory
+                of the first job in each array.
+            max_array_size : int (optional)
+                The maximum number of tasks per array. Larger groups of jobs are split into several arrays.
+
+        Returns
+        -------
+            None
+        """
+        groups = {}
+        for job in jobs:
+            groups.setdefault((memory_translation_to_slurm(job.memory), job.time), []).append(job)
+
+        for group in groups.values():
+            for start in range(0, len(group), max_array_size):
+                cls._submit_single_array(group[start:start + max_array_size], array_directory)
+
+    @classmethod
+    def _submit_single_array(cls, jobs, array_directory=None):
+        """
+        Submit a list of jobs, all requesting the same memory and time, as one job array.
+        """
+        first_job = jobs[0]
+        if array_directory is None:
+            array_directory = first_job.job_directory
+        prepare_directory(array_directory)
+
+        for job in jobs:
+            job._prepare_submission()
+
+        array_name = os.path.join(array_directory, first_job.jobname + "_array")
+        dispatch_script = array_name + ".sh"
+        write_array_dispatch_script(dispatch_script, jobs)
+
+        submission_command = ["sbatch"]
+        submission_command.append("--array=0-{}".format(len(jobs) - 1))
+        submission_command.append("--mem={}".format(memory_translation_to_slurm(first_job.memory)))
+        submission_command.append("--time={}".format(first_job.time))
+        submission_command.append("--output={}_%a.log".format(array_name))
+        submission_command.append(dispatch_script)
+
+        long_info = do_multiple_subprocess_attempts(submission_command, retry_policy = cls.retry_policy)
+        array_id = get_jobid_from_submission(long_info)
+        for task_id, job in enumerate(jobs):
+            job.jobid = get_array_jobid(array_id, task_id)
+        cls.track_jobids([array_id])
+        cls.invalidate_job_queue()
+        print("Submitted job array with id {} and {} tasks".format(array_id, len(jobs)))
+
 AbstractBatchSubmission.register(SlurmSubmission)
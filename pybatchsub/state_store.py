@@ -0,0 +1,212 @@
+import importlib
+import json
+import sqlite3
+import threading
+import time
+
+# The number of changed jobs that are buffered before they are written to the database.
+DEFAULT_BATCH_SIZE = 1000
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_directory TEXT NOT NULL,
+    jobname TEXT NOT NULL,
+    job_class TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    jobid TEXT,
+    submitted INTEGER NOT NULL,
+    finished INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    state TEXT,
+    exit_code INTEGER,
+    reason TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job_directory, jobname)
+)
+"""
+
+UPSERT = """
+INSERT INTO jobs (job_directory, jobname, job_class, parameters, jobid, submitted, finished, attempts, state, exit_code, reason, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (job_directory, jobname) DO UPDATE SET
+    job_class = excluded.job_class,
+    parameters = excluded.parameters,
+    jobid = excluded.jobid,
+    submitted = excluded.submitted,
+    finished = excluded.finished,
+    attempts = excluded.attempts,
+    state = excluded.state,
+    exit_code = excluded.exit_code,
+    reason = excluded.reason,
+    updated = excluded.updated
+"""
+
+SELECT = """
+SELECT job_class, parameters, jobid, submitted, finished, attempts, state, exit_code, reason FROM jobs ORDER BY rowid
+"""
+
+
+def encode_jobid(jobid):
+    """
+    Encode a jobid as a JSON string. Integer jobids, array task jobids ("arrayid_taskid") and condor jobids ((ClusterId, ProcId)) are supported.
+    """
+    if jobid is None: return None
+    return json.dumps(jobid)
+
+
+def decode_jobid(text):
+    """
+    Decode a jobid encoded by encode_jobid.
+    """
+    if text is None: return None
+    jobid = json.loads(text)
+    if isinstance(jobid, list):
+        jobid = tuple(jobid)
+    return jobid
+
+
+def get_class_name(job_class):
+    """
+    Return the importable name of a class, e.g. "pybatchsub.slurm_submission.SlurmSubmission".
+    """
+    return "{}.{}".format(job_class.__module__, job_class.__qualname__)
+
+
+def import_class(class_name):
+    """
+    Import a class from its name, as returned by get_class_name.
+    """
+    module_name, name = class_name.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), name)
+
+
+class JobStateStore:
+    """
+    A durable record of the jobs of a BatchSubmissionSet, kept in an SQLite database. For every job, keyed by its job directory and jobname,
+    the store records the parameters needed to recreate the job, its jobid, whether it was submitted and has finished, the number of
+    submission attempts and the last status reported by the batch system. This lets a campaign be monitored again after the process
+    monitoring it was restarted, without resubmitting jobs or reading their output files.
+
+    Writes are buffered: only jobs whose state changed since they were last recorded are written, in one transaction per batch.
+    The database uses write-ahead logging, so that it can be read while it is written.
+
+    Attributes
+    ----------
+        path : str
+            The path of the SQLite database.
+        batch_size : int
+            The number of changed jobs buffered before they are written to the database.
+
+    Methods
+    -------
+        record
+            Buffer the current state of a job, if it changed since it was last recorded.
+        flush
+            Write all buffered jobs to the database.
+        load_jobs
+            Recreate all recorded jobs.
+        close
+            Flush the buffered jobs and close the database.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Open, or create, the database at path.
+
+        Parameters
+        ----------
+            path : str
+                The path of the SQLite database.
+            batch_size : int (optional)
+                The number of changed jobs buffered before they are written to the database.
+
+        Returns
+        -------
+            None
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(CREATE_TABLE)
+        self._connection.commit()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._recorded = {}
+
+    def record(self, job):
+        """
+        Buffer the current state of a job, if it changed since it was last recorded. The buffer is written to the database once it holds
+        batch_size jobs.
+
+        Parameters
+        ----------
+            job : AbstractBatchSubmission
+                The job to record.
+
+        Returns
+        -------
+            None
+        """
+        key = (job.job_directory, job.jobname)
+        state = job.get_state()
+        with self._lock:
+            if self._recorded.get(key) == state: return
+            self._recorded[key] = state
+            self._pending[key] = (get_class_name(type(job)), json.dumps(job.get_parameters()), state)
+            flush = len(self._pending) >= self.batch_size
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered jobs to the database, in a single transaction.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            if len(pending) == 0: return
+
+            now = time.time()
+            rows = []
+            for (job_directory, jobname), (class_name, parameters, state) in pending.items():
+                jobid, submitted, finished, attempts, batch_state, exit_code, reason = state
+                rows.append((job_directory, jobname, class_name, parameters, encode_jobid(jobid), int(submitted), int(finished), attempts, batch_state, exit_code, reason, now))
+
+            with self._connection:
+                self._connection.executemany(UPSERT, rows)
+
+    def load_jobs(self, container_script_function=None):
+        """
+        Recreate all recorded jobs, in the order in which they were first recorded. The scripts of the jobs are not written again.
+
+        Parameters
+        ----------
+            container_script_function : callable, optional
+                The function creating the container scripts of the jobs, which isn't recorded. By default, create_container_script.
+
+        Returns
+        -------
+            list of AbstractBatchSubmission
+                The recorded jobs, with their recorded state.
+        """
+        self.flush()
+        jobs = []
+        classes = {}
+        with self._lock:
+            for class_name, parameters, jobid, submitted, finished, attempts, batch_state, exit_code, reason in self._connection.execute(SELECT):
+                if class_name not in classes:
+                    classes[class_name] = import_class(class_name)
+                state = (decode_jobid(jobid), bool(submitted), bool(finished), attempts, batch_state, exit_code, reason)
+                job = classes[class_name].from_record(json.loads(parameters), state, container_script_function)
+                self._recorded[(job.job_directory, job.jobname)] = job.get_state()
+                jobs.append(job)
+        return jobs
+
+    def close(self):
+        """
+        Flush the buffered jobs and close the database.
+        """
+        self.flush()
+        self._connection.close()
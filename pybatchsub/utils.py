@@ -1,6 +1,284 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import errno
+import math
+import os
+import random
+import re
 import subprocess
+import tempfile
+import threading
+import time
 
-def check_for_command(command):
+# The number of bytes read at once when searching a file for a line.
+READ_CHUNK_SIZE = 1 << 20
+# The number of bytes at the end of a file that are searched first for a line.
+TAIL_SIZE = 1 << 16
+
+# Messages printed by the schedulers for errors that will not go away by trying again.
+FATAL_ERROR_MESSAGES = [\
+        "Invalid",\
+        "invalid option",\
+        "unrecognized option",\
+        "Parse error",\
+        ]
+
+# The number of bytes in each unit of memory. Slurm and condor both interpret the units as binary units, so K, KB and KiB all mean
+# 1024 bytes, M, MB and MiB all mean 2^20 bytes, and so on. A number without a unit is in MiB, as for both batch systems.
+MEMORY_UNITS = {\
+        "B": 1,\
+        "K": 1 << 10,\
+        "M": 1 << 20,\
+        "G": 1 << 30,\
+        "T": 1 << 40,\
+        }
+MEMORY_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(?:([KMGT])(?:I?B)?|(B))?\s*$", re.IGNORECASE)
+
+
+class RetryStatistics:
+    """
+    Counters of the attempts made through a RetryPolicy, for monitoring.
+
+    Attributes
+    ----------
+        calls : int
+            The number of operations executed through the policy.
+        attempts : int
+            The total number of attempts of all operations.
+        retries : int
+            The number of attempts that followed a failed attempt.
+        failures : int
+            The number of operations that failed after all attempts.
+        time_spent : float
+            The total number of seconds spent in the operations, including the delays between attempts.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.time_spent = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, attempts, time_spent, failed):
+        """
+        Record an operation that took a number of attempts.
+        """
+        with self._lock:
+            self.calls += 1
+            self.attempts += attempts
+            self.retries += attempts - 1
+            self.failures += int(failed)
+            self.time_spent += time_spent
+
+
+class RetryPolicy:
+    """
+    A policy to retry operations that fail intermittently, such as queries to an overloaded scheduler. The delay between attempts grows
+    exponentially, with random jitter so that many clients don't retry in lockstep. Errors that won't go away by trying again, like a
+    missing command or an invalid argument, are not retried.
+
+    Attributes
+    ----------
+        max_attempts : int
+            The maximum number of attempts of an operation.
+        initial_delay : float
+            The delay in seconds after the first failed attempt.
+        multiplier : float
+            The factor by which the delay grows after each failed attempt.
+        max_delay : float
+            The maximum delay in seconds between two attempts.
+        jitter : float
+            The fraction of each delay that is randomized. A jitter of 0.5 gives delays between 50% and 100% of the nominal delay.
+        max_elapsed : float or None
+            The maximum number of seconds spent on an operation, after which no further attempt is made. None for no limit.
+        timeout : float or None
+            The maximum number of seconds of a single attempt to execute a command. None for no limit.
+        retryable_exit_codes : set of int or None
+            If not None, a command that fails with an exit code not in this set is not retried.
+        fatal_error_messages : list of str
+            A command that fails with any of these strings in its standard error is not retried.
+        statistics : RetryStatistics
+            The counters of attempts made through this policy.
+
+    Methods
+    -------
+        call
+            Call a function, retrying it according to this policy.
+        run
+            Execute a command, retrying it according to this policy, and return its output.
+        stream
+            Execute a command, retrying it according to this policy, and parse its output as it is produced.
+        run_async
+            The counterpart of run for asyncio.
+    """
+
+    def __init__(self, max_attempts=10, initial_delay=0.5, multiplier=2.0, max_delay=30.0, jitter=0.5, max_elapsed=120.0, timeout=None, retryable_exit_codes=None, fatal_error_messages=FATAL_ERROR_MESSAGES):
+        self.max_attempts = max_attempts
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.timeout = timeout
+        self.retryable_exit_codes = retryable_exit_codes
+        self.fatal_error_messages = fatal_error_messages
+        self.statistics = RetryStatistics()
+
+    def get_delay(self, attempt):
+        """
+        Return the number of seconds to wait after the attempt'th failed attempt, counting from 1.
+        """
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+        return delay * (1.0 - self.jitter * random.random())
+
+    def is_retryable(self, exception):
+        """
+        Return True if an operation that failed with the exception should be attempted again.
+        """
+        if isinstance(exception, (FileNotFoundError, PermissionError)):
+            return False # the command doesn't exist or can't be executed
+        if isinstance(exception, OSError) and exception.errno == errno.E2BIG:
+            return False # the arguments of the command are too long
+        if isinstance(exception, subprocess.CalledProcessError):
+            if self.retryable_exit_codes is not None and exception.returncode not in self.retryable_exit_codes:
+                return False
+            stderr = exception.stderr.decode("utf-8", errors="replace") if exception.stderr else ""
+            if any(message in stderr for message in self.fatal_error_messages):
+                return False
+        return True
+
+    def _should_stop(self, exception, attempt, elapsed):
+        """
+        Return True if no further attempt should be made after the attempt'th failed attempt.
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(exception):
+            return True
+        return self.max_elapsed is not None and elapsed + self.get_delay(attempt) > self.max_elapsed
+
+    def call(self, function, *args, **kwargs):
+        """
+        Call function with args and kwargs, and retry it according to this policy if it raises an exception.
+
+        Returns
+        -------
+            The return value of function.
+
+        Raises
+        ------
+            The exception raised by the last attempt, if all attempts failed.
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                if self._should_stop(e, attempt, elapsed):
+                    self.statistics.record(attempt, elapsed, failed=True)
+                    raise
+                time.sleep(self.get_delay(attempt))
+                continue
+            self.statistics.record(attempt, time.monotonic() - start, failed=False)
+            return result
+
+    def _run_once(self, command):
+        """
+        Execute the command once, and return its output.
+        """
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, command, output=result.stdout, stderr=result.stderr)
+        return result.stdout
+
+    def run(self, command):
+        """
+        Execute the command, retrying it according to this policy, and return its output as a byte-string.
+        """
+        return self.call(self._run_once, command)
+
+    def _stream_once(self, command, parse):
+        """
+        Execute the command once, and return the result of parse on its standard output, read as a binary stream while the command runs.
+        The standard error is written to a temporary file, so that a command writing a lot of errors can't block on a full pipe.
+        """
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+            timer = None
+            if self.timeout is not None:
+                timer = threading.Timer(self.timeout, process.kill)
+                timer.start()
+            try:
+                with process.stdout:
+                    result = parse(process.stdout)
+                    process.stdout.read() # drain the output that parse didn't consume, so that the command can exit
+                returncode = process.wait()
+            finally:
+                if timer is not None: timer.cancel()
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+            if timer is not None and not timer.is_alive() and returncode < 0:
+                raise subprocess.TimeoutExpired(command, self.timeout)
+            if returncode != 0:
+                stderr.seek(0)
+                raise subprocess.CalledProcessError(returncode, command, output=None, stderr=stderr.read())
+        return result
+
+    def stream(self, command, parse):
+        """
+        Execute the command, retrying it according to this policy, and return the result of parse on its standard output. parse is
+        given the output as a binary file object, and can consume it line by line, without holding the whole output in memory.
+        The result of an attempt that fails is discarded.
+        """
+        return self.call(self._stream_once, command, parse)
+
+    async def _run_once_async(self, command):
+        """
+        Execute the command once as an asyncio subprocess, and return its output.
+        """
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, self.timeout)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command, output=stdout, stderr=stderr)
+        return stdout
+
+    async def run_async(self, command):
+        """
+        Execute the command as an asyncio subprocess, retrying it according to this policy, and return its output as a byte-string.
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = await self._run_once_async(command)
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                if self._should_stop(e, attempt, elapsed):
+                    self.statistics.record(attempt, elapsed, failed=True)
+                    raise
+                await asyncio.sleep(self.get_delay(attempt))
+                continue
+            self.statistics.record(attempt, time.monotonic() - start, failed=False)
+            return result
+
+
+#sometimes the slurm batch system fails when queried often, so provide a protection by trying to query it multiple times
+DEFAULT_RETRY_POLICY = RetryPolicy()
+COMMAND_CHECK_RETRY_POLICY = RetryPolicy(max_attempts=3, initial_delay=0.1)
+
+
+def check_for_command(command, retry_policy=None):
     """
     Check if the command can be successfully executed.
 
@@ -8,32 +286,35 @@ def check_for_command(command):
     ----------
         list of str
             List of string representing the command to be executed. E.g. ["ls", "-al"] is equivalent to "ls -al".
+        retry_policy : RetryPolicy (optional)
+            The policy used to retry the command. Defaults to COMMAND_CHECK_RETRY_POLICY, with three attempts.
 
     Returns
     -------
         bool
             True if the command was successfully executed.
     """
-    for i in range(0, 3):
-        try:
-            output = subprocess.check_output(command)
-            return True
-        except Exception as e:
-            if i == 2:
-                print("comand \"{}\" failed".format(" ".join(command)))
-                print(e)
+    if retry_policy is None: retry_policy = COMMAND_CHECK_RETRY_POLICY
+    try:
+        retry_policy.run(command)
+        return True
+    except Exception as e:
+        print("comand \"{}\" failed".format(" ".join(command)))
+        print(e)
     return False
 
-#sometimes the slurm batch system fails when queried often, so provide a protection by trying to query it multiple times
-def do_multiple_subprocess_attempts(command):
+
+def do_multiple_subprocess_attempts(command, retry_policy=None):
     """
-    Execute the the terminal command. If it fails, try it up to ten times. Occasionally, the slurm system will fail, if queried often.
-    Multiple attmepts account for these failures.
+    Execute the the terminal command. If it fails, try it again according to the retry policy. Occasionally, the slurm system will fail,
+    if queried often. Multiple attmepts, spaced by a growing delay, account for these failures.
 
     Parameters
     ----------
         command : list of str
             The command to be executed, where each element is separated by a space. E.G. ls directory would be represented by ["ls", "directory"].
+        retry_policy : RetryPolicy (optional)
+            The policy used to retry the command. Defaults to DEFAULT_RETRY_POLICY, with up to ten attempts.
 
     Returns
     -------
@@ -41,11 +322,311 @@ def do_multiple_subprocess_attempts(command):
             The output as printed on the terminal screen after the command was executed.
 
     """
-    for i in range(0, 10):
-        try:
-           result = subprocess.check_output(command)
-        except Exception as e:
-           if i != 9: continue
-           else: raise(e)
-        break
-    return result
+    if retry_policy is None: retry_policy = DEFAULT_RETRY_POLICY
+    try:
+        return retry_policy.run(command)
+    except subprocess.CalledProcessError as e:
+        if e.stderr: print(e.stderr.decode("utf-8", errors="replace"))
+        raise
+
+
+def stream_subprocess_output(command, parse, retry_policy=None):
+    """
+    Execute the terminal command, and parse its output as it is produced. If it fails, try it again according to the retry policy.
+    See do_multiple_subprocess_attempts.
+
+    Parameters
+    ----------
+        command : list of str
+            The command to be executed, where each element is separated by a space. E.G. ls directory would be represented by ["ls", "directory"].
+        parse : function
+            A function that is given the standard output of the command as a binary file object, and returns the parsed output.
+        retry_policy : RetryPolicy (optional)
+            The policy used to retry the command. Defaults to DEFAULT_RETRY_POLICY, with up to ten attempts.
+
+    Returns
+    -------
+        The value returned by parse for the successful attempt.
+    """
+    if retry_policy is None: retry_policy = DEFAULT_RETRY_POLICY
+    try:
+        return retry_policy.stream(command, parse)
+    except subprocess.CalledProcessError as e:
+        if e.stderr: print(e.stderr.decode("utf-8", errors="replace"))
+        raise
+
+
+async def async_do_multiple_subprocess_attempts(command, retry_policy=None):
+    """
+    Execute the terminal command as an asyncio subprocess, without blocking the event loop. If it fails, try it again according to the
+    retry policy. See do_multiple_subprocess_attempts.
+
+    Parameters
+    ----------
+        command : list of str
+            The command to be executed, where each element is separated by a space. E.G. ls directory would be represented by ["ls", "directory"].
+        retry_policy : RetryPolicy (optional)
+            The policy used to retry the command. Defaults to DEFAULT_RETRY_POLICY, with up to ten attempts.
+
+    Returns
+    -------
+        bytes
+            The output as printed on the terminal screen after the command was executed.
+
+    """
+    if retry_policy is None: retry_policy = DEFAULT_RETRY_POLICY
+    try:
+        return await retry_policy.run_async(command)
+    except subprocess.CalledProcessError as e:
+        if e.stderr: print(e.stderr.decode("utf-8", errors="replace"))
+        raise
+
+def _contains_line(data, line):
+    """
+    Return True if the byte-string line is one of the complete lines in data. data must start at the beginning of a line.
+    """
+    data = b"\n" + data
+    return (b"\n" + line + b"\n") in data or (b"\n" + line + b"\r") in data
+
+
+def find_line_in_file(path, line, offset=0):
+    """
+    Search a file for a line equal to line, skipping the first offset bytes of the file, which were already searched. This allows
+    a growing file to be searched repeatedly, at a cost that only depends on the number of bytes appended since the previous search.
+    The end of the file is searched first, as this is where a line marking the completion of a job is usually found.
+
+    Parameters
+    ----------
+        path : str
+            The path of the file.
+        line : str
+            The line to search for, without the newline character.
+        offset : int (optional)
+            The number of bytes at the start of the file that were already searched. This must be the start of a line, e.g. the offset
+            returned by a previous call. If the file is shorter than offset, it was recreated, and it is searched from the beginning.
+
+    Returns
+    -------
+        bool
+            True if the line was found.
+        int
+            The offset from which to continue the search, once more bytes have been appended to the file.
+    """
+    line = line.encode("utf-8")
+    size = os.path.getsize(path)
+    if size < offset: offset = 0
+
+    with open(path, "rb") as f:
+        tail_start = max(offset, size - TAIL_SIZE)
+        f.seek(tail_start)
+        tail = f.read()
+        if tail_start != offset:
+            # the tail may start in the middle of a line, so skip its first line
+            tail = tail[tail.find(b"\n") + 1:] if b"\n" in tail else b""
+        if _contains_line(tail, line):
+            return True, size
+
+        f.seek(offset)
+        leftover = b""
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk: break
+            data = leftover + chunk
+            last_newline = data.rfind(b"\n")
+            if last_newline < 0:
+                leftover = data
+                continue
+            if _contains_line(data[:last_newline + 1], line):
+                return True, size
+            offset += last_newline + 1
+            leftover = data[last_newline + 1:]
+
+    # the last line may not end with a newline
+    if leftover.rstrip(b"\r") == line:
+        return True, size
+    return False, offset
+
+
+def parse_memory(memory):
+    """
+    Return the number of bytes of a memory request, e.g. "4000M", "4G", "4 GB", "4GiB" or 4000 (MiB). This is the canonical representation
+    of memory, from which the memory request of each batch system is derived.
+
+    Parameters
+    ----------
+        memory : str or int
+            The memory request.
+
+    Returns
+    -------
+        int
+            The number of bytes of the memory request.
+
+    Raises
+    ------
+        ValueError if memory isn't a valid memory request.
+    """
+    if isinstance(memory, (int, float)) and not isinstance(memory, bool):
+        return math.ceil(memory * MEMORY_UNITS["M"])
+    match = MEMORY_PATTERN.match(memory) if isinstance(memory, str) else None
+    if match is None:
+        raise ValueError("{} is not a valid memory request".format(memory))
+    value, unit, byte_unit = match.groups()
+    unit = (unit or byte_unit or "M").upper()
+    return math.ceil(float(value) * MEMORY_UNITS[unit])
+
+
+def check_if_memory(memory):
+    """
+    Check if memory is a valid memory request. See parse_memory.
+    """
+    try:
+        parse_memory(memory)
+    except ValueError:
+        return False
+    return True
+
+
+def memory_translation_to_slurm(memory):
+    """
+    Translate a memory request to a slurm memory string in MiB, e.g. "4096M" for "4G".
+    """
+    return "{}M".format(math.ceil(parse_memory(memory) / MEMORY_UNITS["M"]))
+
+
+def memory_translation_to_condor(memory):
+    """
+    Translate a memory request to a condor request_memory in MiB, e.g. "4096" for "4G".
+    """
+    return "{}".format(math.ceil(parse_memory(memory) / MEMORY_UNITS["M"]))
+
+
+# The directories already created and made writable by prepare_directory in this process.
+_prepared_directories = set()
+_prepared_directories_lock = threading.Lock()
+
+
+def prepare_directory(directory, mode=0o777):
+    """
+    Create a directory, if needed, and set its permissions. Directories that were already prepared by this process are not touched again,
+    so that preparing the same job directory for many jobs costs one set lookup per job.
+
+    Parameters
+    ----------
+        directory : str
+            The directory to prepare.
+        mode : int (optional)
+            The permissions of the directory.
+
+    Returns
+    -------
+        None
+    """
+    directory = os.path.abspath(directory)
+    with _prepared_directories_lock:
+        if directory in _prepared_directories: return
+    os.makedirs(directory, exist_ok=True)
+    os.chmod(directory, mode)
+    with _prepared_directories_lock:
+        _prepared_directories.add(directory)
+
+
+def remove_file(path):
+    """
+    Remove a file, if it exists.
+
+    Parameters
+    ----------
+        path : str
+            The file to remove.
+
+    Returns
+    -------
+        bool
+            True if the file was removed, False if it didn't exist.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def map_in_parallel(function, items, max_workers=1):
+    """
+    Call function on every element of items, with up to max_workers calls running at once in a pool of threads.
+
+    Parameters
+    ----------
+        function : function
+            The function to call with each element of items.
+        items : list
+            The arguments of the calls.
+        max_workers : int (optional)
+            The maximum number of concurrent calls. If one or less, the calls are made one after the other in this thread.
+
+    Returns
+    -------
+        list
+            The return values of the calls, in the order of items.
+
+    Raises
+    ------
+        The first exception raised by any call, in the order of items, once all calls have completed.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers = min(max_workers, len(items))) as executor:
+        futures = [executor.submit(function, item) for item in items]
+
+    for future in futures:
+        if future.exception() is not None:
+            raise future.exception()
+    return [future.result() for future in futures]
+
+
+class RateLimiter:
+    """
+    Limit the rate of an operation shared between threads, e.g. the submission of jobs to a batch system. Calls to acquire
+    are spaced by at least 1/rate seconds.
+
+    Attributes
+    ----------
+        rate : float
+            The maximum number of operations per second.
+
+    Methods
+    -------
+        acquire
+            Block until the next operation is allowed.
+        acquire_async
+            Wait until the next operation is allowed, without blocking the event loop.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until the next operation is allowed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + 1.0 / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """
+        Wait until the next operation is allowed, without blocking the event loop.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + 1.0 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -6,6 +6,7 @@ setup(
    description='A module to submit jobs to a batch system, and then to monitor them.',
    author='Lukas Adamek',
    author_email='lukas.adamek@mail.utoronto.ca',
-   packages=['pybatchsub'],
+   packages=['pybatchsub', 'pybatchsub.simulator'],
+   package_data={'pybatchsub.simulator': ['modules/htcondor.py']},
    install_requires=[],
 )
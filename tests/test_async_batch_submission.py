@@ -0,0 +1,94 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission
+from pybatchsub.batch_submission import BatchSubmissionSet
+import asyncio
+import os
+import tempfile
+import threading
+
+# stand-ins for sbatch, which uses its process id as jobid, and squeue, which lists the jobids written to a file
+fake_bin_directory = tempfile.mkdtemp()
+queue_file = os.path.join(fake_bin_directory, "queue")
+with open(os.path.join(fake_bin_directory, "sbatch"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"Submitted batch job $$\"\n")
+with open(os.path.join(fake_bin_directory, "squeue"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"JOBID USER\"\n")
+    f.write("cat {}\n".format(queue_file))
+for command in ["sbatch", "squeue"]:
+    os.chmod(os.path.join(fake_bin_directory, command), 0o777)
+with open(queue_file, "w") as f:
+    pass
+os.environ.setdefault("USER", "testing")
+
+job_directory = tempfile.mkdtemp()
+jobs = [SlurmSubmission("testing_{}".format(i), job_directory, ["echo __FINISHED__"], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 4)]
+jobset = BatchSubmissionSet(jobs)
+
+
+class TestAsyncBatchSubmission(unittest.TestCase):
+    def setUp(self):
+        self.original_path = os.environ["PATH"]
+        os.environ["PATH"] = fake_bin_directory + os.pathsep + self.original_path
+        self.original_ttl = SlurmSubmission.queue_cache.ttl
+        SlurmSubmission.queue_cache.ttl = 0
+        SlurmSubmission.use_sacct = False
+
+    def tearDown(self):
+        os.environ["PATH"] = self.original_path
+        SlurmSubmission.queue_cache.ttl = self.original_ttl
+        SlurmSubmission.use_sacct = True
+
+    def test_submit_and_wait(self):
+        async def run():
+            submitted = await jobset.submit_async(max_in_flight = 2)
+            self.assertEqual(submitted, jobs)
+            self.assertEqual(len({job.jobid for job in jobs}), 4)
+
+            # the jobs are yielded as they leave the queue
+            with open(queue_file, "w") as f:
+                f.write("{}\n{}\n".format(jobs[1].jobid, jobs[3].jobid))
+            completed = []
+            async for job in jobset.as_completed_async(poll_interval = 0.01):
+                completed.append(job)
+                if len(completed) == 2:
+                    self.assertEqual(completed, [jobs[0], jobs[2]])
+                    with open(queue_file, "w") as f:
+                        f.write("{}\n".format(jobs[3].jobid))
+                if len(completed) == 3:
+                    self.assertEqual(completed[2], jobs[1])
+                    with open(queue_file, "w") as f:
+                        pass
+            self.assertEqual(completed[3], jobs[3])
+
+            for job in jobs[:3]:
+                with open(job.output, "w") as f:
+                    f.write("__FINISHED__\n")
+            self.assertFalse(await jobset.wait_async(poll_interval = 0.01))
+            with open(jobs[3].output, "w") as f:
+                f.write("__FINISHED__\n")
+            self.assertTrue(await jobset.wait_async(poll_interval = 0.01))
+
+        asyncio.run(run())
+
+    def test_scripts_are_written_off_the_event_loop(self):
+        threads = []
+        def container_script_function(script):
+            threads.append(threading.get_ident())
+            return script
+
+        lazy_jobs = [SlurmSubmission("testing_lazy_{}".format(i), job_directory, ["echo __FINISHED__"], "00:00:02", "1000M", "testing_output_lazy_{}.out".format(i),\
+                "testing_error_lazy_{}.err".format(i), in_container = True, container_script_function = container_script_function) for i in range(0, 2)]
+        async def run():
+            await BatchSubmissionSet(lazy_jobs).submit_async()
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+        self.assertTrue(all(job.script_materialized for job in lazy_jobs))
+
+
+if __name__ == '__main__':
+    unittest.main()
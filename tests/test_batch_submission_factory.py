@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+import pybatchsub.batch_submission_factory as batch_submission_factory
+from pybatchsub.batch_submission_factory import BatchSubmissionFactory, BATCH_SYSTEM_VARIABLE, detect_batch_system
+from pybatchsub.slurm_submission import SlurmSubmission
+from pybatchsub.condor_submission import CondorSubmission
+import os
+import tempfile
+
+
+def make_fake_bin_directory(commands):
+    directory = tempfile.mkdtemp()
+    for command in commands:
+        with open(os.path.join(directory, command), "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(os.path.join(directory, command), 0o777)
+    return directory
+
+
+class TestBatchSystemDetection(unittest.TestCase):
+    def setUp(self):
+        self.original_batch_system = batch_submission_factory.BATCH_SYSTEM
+        batch_submission_factory.BATCH_SYSTEM = None
+        self.original_variable = os.environ.pop(BATCH_SYSTEM_VARIABLE, None)
+
+    def tearDown(self):
+        batch_submission_factory.BATCH_SYSTEM = self.original_batch_system
+        os.environ.pop(BATCH_SYSTEM_VARIABLE, None)
+        if self.original_variable is not None:
+            os.environ[BATCH_SYSTEM_VARIABLE] = self.original_variable
+
+    def test_detection(self):
+        with mock.patch.dict(os.environ, {"PATH": make_fake_bin_directory(["squeue"])}):
+            self.assertEqual(detect_batch_system(), "slurm")
+
+        # the batch system is only detected once
+        with mock.patch.dict(os.environ, {"PATH": make_fake_bin_directory(["condor_q"])}):
+            self.assertEqual(detect_batch_system(), "slurm")
+            batch_submission_factory.BATCH_SYSTEM = None
+            self.assertEqual(detect_batch_system(), "condor")
+
+        batch_submission_factory.BATCH_SYSTEM = None
+        with mock.patch.dict(os.environ, {"PATH": make_fake_bin_directory([])}):
+            with self.assertRaises(ValueError):
+                detect_batch_system()
+
+    def test_environment_variable(self):
+        with mock.patch.dict(os.environ, {"PATH": make_fake_bin_directory(["condor_q", "squeue"]), BATCH_SYSTEM_VARIABLE: "slurm"}):
+            self.assertEqual(detect_batch_system(), "slurm")
+        batch_submission_factory.BATCH_SYSTEM = None
+        with mock.patch.dict(os.environ, {BATCH_SYSTEM_VARIABLE: "pbs"}):
+            with self.assertRaises(ValueError):
+                detect_batch_system()
+
+    def test_get_batch_job(self):
+        batch_submission_factory.BATCH_SYSTEM = "condor"
+        job = BatchSubmissionFactory("testing", tempfile.mkdtemp(), ["echo a"], "00:08:00", memory = "4G", output = "testing.out", error = "testing.err").get_batch_job()
+        self.assertIsInstance(job, CondorSubmission)
+        self.assertEqual((job.time, job.memory), ("workday", "4096"))
+
+    def test_get_batch_jobs(self):
+        batch_submission_factory.BATCH_SYSTEM = "slurm"
+        job_directory = tempfile.mkdtemp()
+        rows = [("testing_0", job_directory, ["echo 0"], "workday", "1G", "testing_0.out", "testing_0.err"),\
+                {"jobname": "testing_1", "job_directory": job_directory, "commands": ["echo 1"], "time": "00:00:02", "memory": 2000, "output": "testing_1.out", "error": "testing_1.err"}]
+        jobs = BatchSubmissionFactory.get_batch_jobs(rows)
+        self.assertEqual([type(job) for job in jobs], [SlurmSubmission] * 2)
+        self.assertEqual([(job.jobname, job.time, job.memory) for job in jobs], [("testing_0", "00:08:00", "1024M"), ("testing_1", "00:00:02", "2000M")])
+
+        with self.assertRaises(ValueError):
+            BatchSubmissionFactory.get_batch_jobs([("testing", job_directory, ["echo"], "forever", "1G", "testing.out", "testing.err")])
+
+
+if __name__ == '__main__':
+    unittest.main()
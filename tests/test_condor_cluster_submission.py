@@ -0,0 +1,98 @@
+import unittest
+from unittest import mock
+from pybatchsub.condor_submission import CondorSubmission, get_jobid_from_submission, parse_queue_output, get_queue_constraint, write_cluster_submission_file
+from pybatchsub.simulator.commands import parse_submit_description
+from pybatchsub.job_queue import JobQueueSnapshot
+from pybatchsub.batch_submission import BatchSubmissionSet
+import os
+import tempfile
+
+# a stand-in for condor_submit that saves the submit description and reports a fixed cluster id
+fake_bin_directory = tempfile.mkdtemp()
+saved_submission = os.path.join(fake_bin_directory, "saved.sub")
+with open(os.path.join(fake_bin_directory, "condor_submit"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("cp \"$1\" {}\n".format(saved_submission))
+    f.write("echo \"Submitting job(s)...\"\n")
+    f.write("echo \"3 job(s) submitted to cluster 4242.\"\n")
+os.chmod(os.path.join(fake_bin_directory, "condor_submit"), 0o777)
+
+job_directory = tempfile.mkdtemp()
+jobs = []
+for i in range(0, 3):
+    jobs.append(CondorSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i), "echo __FINISHED__"], "workday", "1000", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)))
+jobset = BatchSubmissionSet(jobs)
+
+long_info_submission = b'Submitting job(s)...\n3 job(s) submitted to cluster 4242.\n'
+
+
+class TestCondorClusterSubmission(unittest.TestCase):
+    def test_jobid(self):
+        self.assertEqual(get_jobid_from_submission(long_info_submission), 4242)
+
+    def test_queue(self):
+        ads = iter([{"ClusterId": 4242, "ProcId": 0, "JobStatus": 1}, {"ClusterId": 4242, "ProcId": 1, "JobStatus": 2}, {"ClusterId": 4242, "ProcId": 2, "JobStatus": 5}])
+        queue = parse_queue_output(ads)
+        self.assertEqual(queue, {(4242, 0), (4242, 1)})
+        self.assertEqual(queue.held, {(4242, 2)})
+        self.assertEqual(get_queue_constraint("user"), 'Owner == "user" && member(JobStatus, {1, 2, 5})')
+        self.assertEqual(get_queue_constraint("user", {4243, 4242}), 'Owner == "user" && member(JobStatus, {1, 2, 5}) && member(ClusterId, {4242, 4243})')
+
+    def test_forget_departed_clusters(self):
+        with mock.patch.object(CondorSubmission, "tracked_clusterids", {4242, 4243}),\
+                mock.patch.object(CondorSubmission, "departed_clusterids", set()):
+            CondorSubmission.track_jobids([(4244, 0)]) # tracked while the schedd was queried for 4242 and 4243
+            CondorSubmission._forget_departed_jobids({4242, 4243}, JobQueueSnapshot(held = {(4242, 0)}))
+            self.assertEqual(CondorSubmission.tracked_clusterids, {4242, 4244})
+            self.assertEqual(CondorSubmission.departed_clusterids, {4243})
+
+    def test_held_job_not_failed(self):
+        job = CondorSubmission("testing_held", tempfile.mkdtemp(), ["echo held"], "workday", "1000", "testing_output_held.out", "testing_error_held.err")
+        job.jobid = (4242, 2)
+        job.submitted = True
+        queue = JobQueueSnapshot({(4242, 0)}, held = {(4242, 2)})
+        self.assertTrue(job.check_running(job_queue = queue))
+        self.assertTrue(job.check_held(job_queue = queue))
+        self.assertFalse(job.check_failed(job_queue = queue))
+        self.assertTrue(job.check_failed(job_queue = JobQueueSnapshot()))
+
+    def test_cluster_submission(self):
+        original_path = os.environ["PATH"]
+        os.environ["PATH"] = fake_bin_directory + os.pathsep + original_path
+        try:
+            jobset._submit_jobs(jobs, array = True)
+        finally:
+            os.environ["PATH"] = original_path
+
+        self.assertEqual([job.jobid for job in jobs], [(4242, 0), (4242, 1), (4242, 2)])
+        self.assertTrue(all(job.submitted for job in jobs))
+        self.assertTrue(jobs[1].check_running(job_queue = {(4242, 1)}))
+        self.assertFalse(jobs[1].check_running(job_queue = {(4242, 0)}))
+        self.assertFalse(os.path.exists(os.path.join(job_directory, "testing_0_cluster.sub")))
+
+        with open(saved_submission, "r") as f:
+            lines = f.read().split("\n")
+        self.assertEqual(lines.count("queue"), 3)
+        for job in jobs:
+            self.assertIn("Executable = {}".format(job.script), lines)
+            self.assertIn("Output = {}".format(job.output), lines)
+            self.assertTrue(os.path.exists(job.logfile))
+        self.assertIn("request_memory = 1000", lines)
+        self.assertIn("+JobFlavour = \"workday\"", lines)
+
+    def test_paths_with_spaces(self):
+        directory = os.path.join(tempfile.mkdtemp(), "my jobs, v2")
+        cluster_jobs = [CondorSubmission("testing_{}".format(i), directory, ["echo {}".format(i)], "workday", "1000", "testing output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 2)]
+        sub_file = os.path.join(tempfile.mkdtemp(), "cluster.sub")
+        write_cluster_submission_file(sub_file, cluster_jobs)
+        tasks = parse_submit_description(sub_file)
+        self.assertEqual([(task["script"], task["output"], task["error"], task["log"]) for task in tasks],\
+                [(job.script, job.output, job.error, job.logfile) for job in cluster_jobs])
+
+        cluster_jobs[1].output = "testing\noutput.out"
+        with self.assertRaises(ValueError):
+            write_cluster_submission_file(sub_file, cluster_jobs)
+
+
+if __name__ == '__main__':
+    unittest.main()
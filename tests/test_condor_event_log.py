@@ -0,0 +1,106 @@
+import unittest
+from pybatchsub.condor_event_log import CondorEventLogReader, update_status_from_event
+from pybatchsub.condor_submission import CondorSubmission
+from pybatchsub.batch_submission import BatchSubmissionSet, PENDING, RUNNING, HELD, COMPLETED, FAILED
+import os
+import tempfile
+from unittest import mock
+
+submitted_event = "000 (4242.000.000) 2024-01-15 10:00:00 Job submitted from host: <127.0.0.1:9618>\n...\n"
+executing_event = "001 (4242.000.000) 2024-01-15 10:00:05 Job executing on host: <127.0.0.1:9618>\n...\n"
+held_event = "012 (4242.000.000) 2024-01-15 10:00:10 Job was held.\n\tJob has gone over memory limit of 2048 megabytes.\n\tCode 34 Subcode 0\n...\n"
+released_event = "013 (4242.000.000) 2024-01-15 10:00:15 Job was released.\n\tvia condor_release (by user ladamek)\n...\n"
+terminated_event = "005 (4242.000.000) 2024-01-15 10:01:00 Job terminated.\n\t(1) Normal termination (return value {})\n\t\tUsr 0 00:00:00, Sys 0 00:00:00  -  Run Remote Usage\n\t0  -  Run Bytes Sent By Job\n...\n"
+
+
+class UnusedQueue:
+    """
+    A job queue that fails the test if it is used.
+    """
+    def __contains__(self, jobid):
+        raise AssertionError("The job queue should not be queried")
+
+
+def make_job(job_directory, i):
+    job = CondorSubmission("testing_{}".format(i), job_directory, ["echo __FINISHED__"], "workday", "1000", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i))
+    job.submitted = True
+    job.jobid = (4242, i)
+    return job
+
+
+class TestCondorEventLog(unittest.TestCase):
+    def test_incremental_reading(self):
+        log = os.path.join(tempfile.mkdtemp(), "testing.log")
+        reader = CondorEventLogReader(log)
+        self.assertEqual(reader.read_events(), [])
+
+        # an incomplete event is not returned until it is terminated
+        with open(log, "w") as f:
+            f.write(submitted_event + executing_event[:20])
+        self.assertEqual([event.code for event in reader.read_events()], [0])
+        with open(log, "a") as f:
+            f.write(executing_event[20:] + held_event)
+        events = reader.read_events()
+        self.assertEqual([event.code for event in events], [1, 12])
+        self.assertEqual(reader.read_events(), [])
+        self.assertEqual(reader.offset, os.path.getsize(log))
+
+        status = None
+        for event in events:
+            status = update_status_from_event(status, event)
+        self.assertEqual(status.state, HELD)
+        self.assertIn("Code 34", status.reason)
+
+        # a recreated log is read from the beginning
+        with open(log, "w") as f:
+            f.write(submitted_event)
+        self.assertEqual([event.code for event in reader.read_events()], [0])
+
+    def test_job_status_from_log(self):
+        job_directory = tempfile.mkdtemp()
+        job = make_job(job_directory, 0)
+        with open(job.logfile, "w") as f:
+            f.write(submitted_event)
+        self.assertTrue(job.check_running(job_queue = UnusedQueue()))
+        self.assertEqual(job.batch_status.state, PENDING)
+
+        with open(job.logfile, "a") as f:
+            f.write(executing_event + held_event + released_event + executing_event)
+        self.assertTrue(job.check_running(job_queue = UnusedQueue()))
+        self.assertEqual(job.batch_status.state, RUNNING)
+        self.assertFalse(job.check_finished())
+
+        with open(job.output, "w") as f:
+            f.write("__FINISHED__\n")
+        with open(job.logfile, "a") as f:
+            f.write(terminated_event.format(0))
+        self.assertFalse(job.check_running(job_queue = UnusedQueue()))
+        self.assertEqual(job.batch_status.state, COMPLETED)
+        self.assertTrue(job.check_finished())
+
+    def test_set_without_schedd(self):
+        job_directory = tempfile.mkdtemp()
+        jobs = [make_job(job_directory, i) for i in range(0, 3)]
+        for i, job in enumerate(jobs):
+            with open(job.logfile, "w") as f:
+                f.write(submitted_event.replace("4242.000", "4242.00{}".format(i)))
+                f.write(executing_event.replace("4242.000", "4242.00{}".format(i)))
+                f.write(terminated_event.replace("4242.000", "4242.00{}".format(i)).format(1 if i == 2 else 0))
+            if i != 2:
+                with open(job.output, "w") as f:
+                    f.write("__FINISHED__\n")
+
+        def unused_query(self):
+            raise AssertionError("The schedd should not be queried")
+
+        jobset = BatchSubmissionSet(jobs)
+        with mock.patch.object(CondorSubmission, "get_job_queue", unused_query):
+            self.assertFalse(jobset.check_running())
+            self.assertFalse(jobset.check_finished())
+            self.assertEqual(jobset.get_failed_jobs(), [jobs[2]])
+        self.assertEqual(jobs[2].batch_status.state, FAILED)
+        self.assertEqual(jobs[2].batch_status.exit_code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission
+from pybatchsub.batch_submission import BatchSubmissionSet
+from pybatchsub.container_scripts import ContainerScriptCache
+import os
+import subprocess
+import tempfile
+
+# a stand-in for batchScript, which writes a bash script running the command and records every call
+fake_bin_directory = tempfile.mkdtemp()
+calls_file = os.path.join(fake_bin_directory, "calls")
+with open(os.path.join(fake_bin_directory, "batchScript"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"$1\" >> {}\n".format(calls_file))
+    f.write("printf '#!/bin/bash\\n%s\\n' \"$1\" > \"$3\"\n")
+os.chmod(os.path.join(fake_bin_directory, "batchScript"), 0o777)
+
+
+def make_jobs(job_directory, cache, commands):
+    return [SlurmSubmission("testing_{}".format(i), job_directory, [command], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i), in_container = True, container_script_function = cache) for i, command in enumerate(commands)]
+
+
+def count_calls():
+    if not os.path.exists(calls_file): return 0
+    with open(calls_file, "r") as f:
+        return len(f.readlines())
+
+
+class TestContainerScriptCache(unittest.TestCase):
+    def setUp(self):
+        self.original_path = os.environ["PATH"]
+        os.environ["PATH"] = fake_bin_directory + os.pathsep + self.original_path
+        self.job_directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.job_directory, "container_cache")
+        with open(calls_file, "w") as f:
+            pass
+
+    def tearDown(self):
+        os.environ["PATH"] = self.original_path
+
+    def test_identical_scripts(self):
+        cache = ContainerScriptCache(self.cache_directory, max_entries = 2)
+        jobs = make_jobs(self.job_directory, cache, ["echo a", "echo a", "echo b", "echo a"])
+        BatchSubmissionSet(jobs).materialize_scripts()
+
+        self.assertEqual(count_calls(), 2)
+        self.assertEqual((cache.generations, cache.hits), (2, 2))
+        self.assertEqual(os.stat(jobs[0].script).st_ino, os.stat(jobs[1].script).st_ino)
+        self.assertNotEqual(os.stat(jobs[0].script).st_ino, os.stat(jobs[2].script).st_ino)
+        self.assertEqual(subprocess.check_output([jobs[3].script]), b"a\n")
+
+        # the least recently used script, for "echo b", is evicted, and a new cache reuses the scripts on disk
+        make_jobs(self.job_directory, cache, ["echo c"])[0].materialize_script()
+        self.assertEqual(len([name for name in os.listdir(self.cache_directory) if name.endswith("_container.sh")]), 2)
+        reopened = ContainerScriptCache(self.cache_directory)
+        make_jobs(self.job_directory, reopened, ["echo a", "echo b"])[0].materialize_script()
+        self.assertEqual((reopened.generations, reopened.hits), (0, 1))
+        make_jobs(self.job_directory, reopened, ["echo a", "echo b"])[1].materialize_script()
+        self.assertEqual((reopened.generations, reopened.hits), (1, 1))
+
+    def test_scripts_survive_eviction(self):
+        cache = ContainerScriptCache(self.cache_directory, max_entries = 2)
+        jobs = make_jobs(self.job_directory, cache, ["echo a", "echo b", "echo c"])
+        BatchSubmissionSet(jobs).materialize_scripts()
+
+        self.assertEqual(len([name for name in os.listdir(self.cache_directory) if name.endswith("_container.sh")]), 2)
+        for job, output in zip(jobs, [b"a\n", b"b\n", b"c\n"]):
+            self.assertEqual(subprocess.check_output([job.script]), output)
+
+    def test_parametrized(self):
+        cache = ContainerScriptCache(self.cache_directory, parametrized = True)
+        jobs = make_jobs(self.job_directory, cache, ["echo {}".format(i) for i in range(0, 5)])
+        BatchSubmissionSet(jobs).materialize_scripts(max_workers = 4)
+
+        self.assertEqual(count_calls(), 1)
+        for i, job in enumerate(jobs):
+            self.assertEqual(subprocess.check_output([job.script]), "{}\n".format(i).encode())
+
+
+if __name__ == '__main__':
+    unittest.main()
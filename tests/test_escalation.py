@@ -0,0 +1,65 @@
+import unittest
+from pybatchsub.escalation import EscalationPolicy, ResourceAttempt, scale_memory, scale_time, MEMORY, TIME
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchSubmissionSet, BatchJobStatus, FAILED, HELD
+import tempfile
+
+
+class QueueSubmission(AbstractBatchSubmission):
+    """
+    A batch submission with an empty queue, whose submissions are recorded.
+    """
+    submissions = []
+
+    def _get_job_queue(self):
+        return set()
+
+    def _submit(self):
+        type(self).submissions.append((self.jobname, self.memory, self.time))
+        return len(type(self).submissions)
+
+
+class TestEscalation(unittest.TestCase):
+    def test_scaling(self):
+        self.assertEqual(scale_memory("1000M", 2), "2000M")
+        self.assertEqual(scale_memory("1.5G", 2), "3072M")
+        self.assertEqual(scale_memory("3000", 1.5), "4500")
+        self.assertEqual(scale_memory("3G", 2, max_memory = "4000M"), "4000M")
+        self.assertEqual(scale_memory("lots", 2), "lots")
+
+        self.assertEqual(scale_time("espresso", 2), "microcentury")
+        self.assertEqual(scale_time("nextweek", 2), "nextweek")
+        self.assertEqual(scale_time("00:08:00", 2), "00:16:00")
+        self.assertEqual(scale_time("00:16:00", 2), "01:08:00")
+        self.assertEqual(scale_time("00:16:00", 2, max_time = "01:00:00"), "01:00:00")
+
+    def test_escalation(self):
+        job_directory = tempfile.mkdtemp()
+        jobs = [QueueSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i)], "00:08:00", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 4)]
+        jobset = BatchSubmissionSet(jobs)
+        jobset.submit()
+
+        # the reason is taken from sacct, from a condor hold reason, or from the error file
+        jobs[0].batch_status = BatchJobStatus(FAILED, 0, "OUT_OF_MEMORY")
+        jobs[1].batch_status = BatchJobStatus(HELD, None, "Job has gone over memory limit of 1000 megabytes. Code 34 Subcode 0")
+        with open(jobs[2].error, "w") as f:
+            f.write("slurmstepd: error: *** JOB 3 ON node1 CANCELLED AT 2024-01-15T10:00:00 DUE TO TIME LIMIT ***\n")
+        with open(jobs[3].error, "w") as f:
+            f.write("Segmentation fault\n")
+
+        policy = EscalationPolicy(max_attempts = 2)
+        self.assertEqual([policy.get_failure(job) for job in jobs], [MEMORY, MEMORY, TIME, None])
+
+        QueueSubmission.submissions = []
+        self.assertEqual(jobset.resubmit(escalation_policy = policy), jobs)
+        self.assertEqual(QueueSubmission.submissions, [("testing_0", "2000M", "00:08:00"), ("testing_1", "2000M", "00:08:00"),\
+                ("testing_2", "1000M", "00:16:00"), ("testing_3", "1000M", "00:08:00")])
+        self.assertEqual(policy.history[(job_directory, "testing_2")], [ResourceAttempt(1, "1000M", "00:08:00", TIME)])
+
+        # the attempts are capped
+        jobs[0].batch_status = BatchJobStatus(FAILED, 0, "OUT_OF_MEMORY")
+        self.assertEqual(jobset.resubmit(escalation_policy = policy), [])
+        self.assertEqual(jobs[0].memory, "2000M")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchSubmissionSet
+from pybatchsub.job_queue import JobQueueCache
+import tempfile
+import time
+
+
+class CountingSubmission(AbstractBatchSubmission):
+    """
+    A batch submission that counts the queries of its job queue, and hands out consecutive jobids.
+    """
+    queue_cache = JobQueueCache(ttl=60)
+    queue = set()
+
+    def _get_job_queue(self):
+        return set(self.queue)
+
+    def _submit(self):
+        jobid = len(self.queue) + 1
+        self.queue.add(jobid)
+        return jobid
+
+
+job_directory = tempfile.mkdtemp()
+jobs = [CountingSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i)], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 20)]
+jobset = BatchSubmissionSet(jobs)
+
+
+class TestJobQueueCache(unittest.TestCase):
+    def test_ttl(self):
+        cache = JobQueueCache(ttl=0.05)
+        self.assertEqual(cache.get(lambda: {1}), {1})
+        self.assertEqual(cache.get(lambda: {2}), {1})
+        self.assertEqual(cache.queries, 1)
+        time.sleep(0.06)
+        self.assertEqual(cache.get(lambda: {2}), {2})
+        self.assertEqual(cache.queries, 2)
+        cache.invalidate()
+        self.assertEqual(cache.get(lambda: {3}), {3})
+        self.assertEqual(cache.queries, 3)
+
+    def test_one_query_per_poll(self):
+        jobset.submit()
+        queries = CountingSubmission.queue_cache.queries
+
+        # the submissions invalidate the queue, which is then queried once for all of the jobs
+        self.assertTrue(jobset.check_running())
+        self.assertFalse(jobset.check_finished())
+        self.assertEqual(jobset.get_failed_jobs(), [])
+        self.assertTrue(all(job.check_running() for job in jobs))
+        self.assertEqual(CountingSubmission.queue_cache.queries, queries + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
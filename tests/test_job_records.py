@@ -0,0 +1,28 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission
+import os
+import tempfile
+
+
+class TestJobRecords(unittest.TestCase):
+    def test_slotted_paths(self):
+        job_directory = tempfile.mkdtemp()
+        job = SlurmSubmission("testing", job_directory, ["echo 1"], "00:00:02", "1000M", "testing_output", "testing_error.err")
+        self.assertFalse(hasattr(job, "__dict__"))
+        with self.assertRaises(AttributeError):
+            job.unknown_attribute = 1
+
+        self.assertEqual(job.output, os.path.join(job_directory, "testing_output.out"))
+        self.assertEqual(job.error, os.path.join(job_directory, "testing_error.err"))
+        self.assertEqual(job.script, os.path.join(job_directory, "testing.sh"))
+        self.assertEqual(job.script, job.outside_of_container_script)
+        self.assertEqual(job._output, "testing_output.out")
+
+        # paths outside of the job directory are kept as they are
+        job.script = "/elsewhere/testing_container.sh"
+        self.assertEqual(job.script, "/elsewhere/testing_container.sh")
+        self.assertNotEqual(job.script, job.outside_of_container_script)
+
+
+if __name__ == '__main__':
+    unittest.main()
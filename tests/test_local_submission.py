@@ -0,0 +1,55 @@
+import unittest
+from pybatchsub.local_submission import LocalSubmission, LocalJobPool
+from pybatchsub.batch_submission import BatchSubmissionSet, BatchJobStatus, COMPLETED, FAILED, FINISHED
+import tempfile
+
+
+def make_jobs(job_directory, n=4, failing=()):
+    jobs = []
+    for i in range(0, n):
+        commands = ["echo output {}".format(i), "echo error {} >&2".format(i)]
+        commands += ["exit 3"] if i in failing else ["echo __FINISHED__"]
+        jobs.append(LocalSubmission("testing_{}".format(i), job_directory, commands, "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)))
+    return jobs
+
+
+class TestLocalSubmission(unittest.TestCase):
+    def setUp(self):
+        self.original_pool = LocalSubmission.pool
+        LocalSubmission.pool = LocalJobPool(max_workers = 2)
+        self.job_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        LocalSubmission.pool.join()
+        LocalSubmission.pool = self.original_pool
+
+    def test_submission(self):
+        jobset = BatchSubmissionSet(make_jobs(self.job_directory, failing = [2]))
+        jobset.submit()
+        self.assertEqual(len({job.jobid for job in jobset.jobs}), 4)
+        LocalSubmission.pool.join()
+
+        self.assertFalse(jobset.check_running())
+        self.assertEqual(jobset.get_failed_jobs(), [jobset.jobs[2]])
+        self.assertEqual(jobset.jobs[2].batch_status, BatchJobStatus(FAILED, 3, "NonZeroExitCode"))
+        self.assertEqual(jobset.jobs[0].batch_status, BatchJobStatus(COMPLETED, 0, None))
+        with open(jobset.jobs[1].output) as f:
+            self.assertEqual(f.read(), "output 1\n__FINISHED__\n")
+        with open(jobset.jobs[1].error) as f:
+            self.assertEqual(f.read(), "error 1\n")
+        self.assertEqual(jobset.status_summary().counts[FINISHED], 3)
+
+        jobset.resubmit()
+        LocalSubmission.pool.join()
+        self.assertEqual(jobset.jobs[2].attempts, 2)
+        self.assertEqual(jobset.get_failed_jobs(), [jobset.jobs[2]])
+
+    def test_wait(self):
+        jobset = BatchSubmissionSet(make_jobs(self.job_directory, n = 6))
+        jobset.submit(max_workers = 3)
+        self.assertTrue(jobset.wait(timeout = 30, min_interval = 0.05, max_interval = 0.1))
+        self.assertTrue(jobset.check_finished())
+
+
+if __name__ == '__main__':
+    unittest.main()
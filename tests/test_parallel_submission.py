@@ -0,0 +1,87 @@
+import unittest
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchSubmissionSet
+from pybatchsub.utils import map_in_parallel, RateLimiter
+import os
+import tempfile
+import threading
+import time
+
+
+class SlowSubmission(AbstractBatchSubmission):
+    """
+    A batch submission where every submission takes 50 ms, and that records the largest number of submissions in flight.
+    """
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    next_jobid = 0
+
+    def _get_job_queue(self):
+        return set()
+
+    def _submit(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.next_jobid += 1
+            jobid = cls.next_jobid
+        time.sleep(0.05)
+        with cls.lock:
+            cls.in_flight -= 1
+        return jobid
+
+
+job_directory = tempfile.mkdtemp()
+jobs = [SlowSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i)], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 20)]
+jobset = BatchSubmissionSet(jobs)
+
+
+class TestParallelSubmission(unittest.TestCase):
+    def test_map_in_parallel(self):
+        self.assertEqual(map_in_parallel(lambda x: x * x, list(range(0, 10)), max_workers = 4), [x * x for x in range(0, 10)])
+
+        def fail_on_three(x):
+            if x == 3: raise ValueError("three")
+            return x
+        with self.assertRaises(ValueError):
+            map_in_parallel(fail_on_three, list(range(0, 10)), max_workers = 4)
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(100)
+        start = time.monotonic()
+        map_in_parallel(lambda x: limiter.acquire(), list(range(0, 11)), max_workers = 4)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_bounded_concurrency(self):
+        start = time.monotonic()
+        submitted = jobset.submit(max_workers = 5)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(submitted, jobs)
+        self.assertEqual(SlowSubmission.max_in_flight, 5)
+        self.assertLess(elapsed, 20 * 0.05)
+        self.assertEqual(sorted(job.jobid for job in jobs), list(range(1, 21)))
+        self.assertTrue(all(job.submitted for job in jobs))
+
+    def test_lazy_scripts(self):
+        def slow_container_script(script):
+            time.sleep(0.05)
+            return script.replace(".sh", "_container.sh")
+
+        directory = tempfile.mkdtemp()
+        lazy_jobs = [SlowSubmission("testing_{}".format(i), directory, ["echo {}".format(i)], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i), in_container = True, container_script_function = slow_container_script) for i in range(0, 10)]
+        self.assertEqual(os.listdir(directory), [])
+
+        lazy_jobs[0].submit()
+        self.assertTrue(os.path.exists(lazy_jobs[0].outside_of_container_script))
+        self.assertEqual(lazy_jobs[0].script, lazy_jobs[0].outside_of_container_script.replace(".sh", "_container.sh"))
+
+        start = time.monotonic()
+        BatchSubmissionSet(lazy_jobs).materialize_scripts(max_workers = 9)
+        self.assertLess(time.monotonic() - start, 9 * 0.05)
+        self.assertTrue(all(job.script_materialized and os.path.exists(job.outside_of_container_script) for job in lazy_jobs))
+
+
+if __name__ == '__main__':
+    unittest.main()
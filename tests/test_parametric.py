@@ -0,0 +1,125 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission
+from pybatchsub.condor_submission import CondorSubmission
+from pybatchsub.batch_submission import RUNNING, COMPLETED
+from pybatchsub.parametric import JobTemplate, ParametricJobSet
+from array import array
+import os
+import tempfile
+from unittest import mock
+
+executing_event = "001 (42.00{}.000) 2024-01-15 10:00:05 Job executing on host: <127.0.0.1:9618>\n...\n"
+terminated_event = "005 (42.00{}.000) 2024-01-15 10:01:00 Job terminated.\n\t(1) Normal termination (return value 0)\n...\n"
+
+# stand-ins for sbatch, which records its arguments and reports a fixed jobid, and squeue, which reports an empty queue
+fake_bin_directory = tempfile.mkdtemp()
+sbatch_log = os.path.join(fake_bin_directory, "sbatch.log")
+with open(os.path.join(fake_bin_directory, "sbatch"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"$@\" >> {}\n".format(sbatch_log))
+    f.write("echo \"Submitted batch job 777\"\n")
+with open(os.path.join(fake_bin_directory, "squeue"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"JOBID USER\"\n")
+for command in ["sbatch", "squeue"]:
+    os.chmod(os.path.join(fake_bin_directory, command), 0o777)
+os.environ.setdefault("USER", "testing")
+
+
+class TestParametricJobSet(unittest.TestCase):
+    def setUp(self):
+        self.original_path = os.environ["PATH"]
+        os.environ["PATH"] = fake_bin_directory + os.pathsep + self.original_path
+        self.original_ttl = SlurmSubmission.queue_cache.ttl
+        SlurmSubmission.queue_cache.ttl = 0
+        SlurmSubmission.use_sacct = False
+
+        self.job_directory = tempfile.mkdtemp()
+        template = JobTemplate(SlurmSubmission, "sweep_{index}", self.job_directory, ["echo {seed} {label}", "echo __FINISHED__"], "00:00:02", "{memory}M",\
+                "sweep_output_{index}.out", "sweep_error_{index}.err")
+        self.jobset = ParametricJobSet(template, {"seed": list(range(0, 7)), "label": ["a", "b", "c", "d", "e", "f", "g"], "memory": [1000] * 7}, chunk_size = 3)
+
+    def tearDown(self):
+        os.environ["PATH"] = self.original_path
+        SlurmSubmission.queue_cache.ttl = self.original_ttl
+        SlurmSubmission.use_sacct = True
+
+    def test_views(self):
+        self.assertEqual(len(self.jobset), 7)
+        self.assertIsInstance(self.jobset.parameters["seed"], array)
+        self.assertIsInstance(self.jobset.parameters["label"], list)
+
+        job = self.jobset[-2]
+        self.assertEqual(job.jobname, "sweep_5")
+        self.assertEqual(job.commands, ["echo 5 f", "echo __FINISHED__"])
+        self.assertEqual(job.memory, "1000M")
+        self.assertEqual(job.output, os.path.join(self.job_directory, "sweep_output_5.out"))
+        self.assertEqual(os.listdir(self.job_directory), [])
+
+        # only the fields of the parameters are filled, and the braces of the shell are left as they are
+        template = JobTemplate(SlurmSubmission, "sweep_{index:03d}", self.job_directory, ["cd ${HOME}", "echo {seed} | awk '{print $1}'"], "00:00:02",\
+                "1000M", "sweep_output_{index}.out", "sweep_error_{index}.err")
+        job = ParametricJobSet(template, {"seed": [42]})[0]
+        self.assertEqual(job.jobname, "sweep_000")
+        self.assertEqual(job.commands, ["cd ${HOME}", "echo 42 | awk '{print $1}'"])
+
+        with self.assertRaises(ValueError):
+            ParametricJobSet(self.jobset.template, {"seed": [1, 2], "label": ["a"]})
+
+    def test_array_submission(self):
+        with open(sbatch_log, "w") as f:
+            pass
+        self.assertEqual(self.jobset.submit(), list(range(0, 7)))
+
+        # one job array per chunk of jobs
+        with open(sbatch_log, "r") as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertEqual(self.jobset.jobids[:4], ["777_0", "777_1", "777_2", "777_0"])
+        self.assertEqual(list(self.jobset.attempts), [1] * 7)
+
+        self.assertFalse(self.jobset.check_finished())
+        for index in range(0, 7):
+            if index == 4: continue
+            with open(self.jobset[index].output, "w") as f:
+                f.write("__FINISHED__\n")
+        self.assertFalse(self.jobset.check_finished())
+        self.assertEqual(self.jobset.get_failed_jobs(), [4])
+        self.assertEqual(list(self.jobset.finished), [1, 1, 1, 1, 0, 1, 1])
+
+        self.assertEqual(self.jobset.resubmit(), [4])
+        self.assertEqual(self.jobset.attempts[4], 2)
+        with open(self.jobset[4].output, "w") as f:
+            f.write("__FINISHED__\n")
+        self.assertTrue(self.jobset.check_finished())
+
+    def test_condor_state_is_kept(self):
+        template = JobTemplate(CondorSubmission, "sweep_{index}", self.job_directory, ["echo __FINISHED__"], "workday", "1000",\
+                "sweep_output_{index}.out", "sweep_error_{index}.err")
+        jobset = ParametricJobSet(template, {"seed": [0, 1, 2]}, chunk_size = 2)
+        for index in range(0, 3):
+            jobset.jobids[index], jobset.submitted[index] = (42, index), True
+            with open(jobset[index].logfile, "w") as f:
+                f.write(executing_event.format(index))
+
+        def unused_query(self):
+            raise AssertionError("The schedd should not be queried")
+
+        with mock.patch.object(CondorSubmission, "get_job_queue", unused_query), mock.patch.object(CondorSubmission, "tracked_clusterids", set()):
+            self.assertTrue(jobset.check_running())
+            self.assertEqual(jobset.batch_statuses[0].state, RUNNING)
+            self.assertEqual(jobset.event_log_offsets[0], os.path.getsize(jobset[0].logfile))
+
+            # the logs are read from where they were left, and the status of the jobs is kept between checks
+            for index in range(0, 3):
+                with open(jobset[index].logfile, "a") as f:
+                    f.write(terminated_event.format(index))
+                with open(jobset[index].output, "w") as f:
+                    f.write("__FINISHED__\n")
+            self.assertEqual(jobset[0]._event_log_reader.offset, jobset.event_log_offsets[0])
+            self.assertTrue(jobset.check_finished())
+        self.assertEqual([status.state for status in jobset.batch_statuses], [COMPLETED] * 3)
+        self.assertIs(jobset.batch_statuses[0], jobset.batch_statuses[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
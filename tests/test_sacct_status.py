@@ -0,0 +1,128 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission, SacctStatusResolver, SacctRecord, parse_sacct_output, get_status_from_sacct_record
+from pybatchsub.batch_submission import RUNNING, COMPLETED, FAILED
+from unittest import mock
+import os
+import tempfile
+import time
+
+long_info_sacct = b'58508061|COMPLETED|0:0|00:00:05|\n58508061.batch|COMPLETED|0:0|00:00:05|1024K\n58508061.extern|COMPLETED|0:0|00:00:05|0\n58508062|OUT_OF_MEMORY|0:125|00:00:03|\n58508062.batch|OUT_OF_MEMORY|0:125|00:00:03|51200K\n58508063_0|RUNNING|0:0|00:00:01|\n58508063_[1-2]|PENDING|0:0|00:00:00|\n'
+
+# a stand-in for sacct that prints the accounting records of the jobids it is given, and counts its calls
+fake_bin_directory = tempfile.mkdtemp()
+sacct_log = os.path.join(fake_bin_directory, "sacct.log")
+with open(os.path.join(fake_bin_directory, "sacct"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"$2\" >> {}\n".format(sacct_log))
+    f.write("for jobid in $(echo \"$2\" | tr ',' ' '); do\n")
+    f.write("case $jobid in\n")
+    f.write("1) echo \"1|COMPLETED|0:0|00:00:05|\" ;;\n")
+    f.write("2) echo \"2|TIMEOUT|0:0|00:00:05|\" ;;\n")
+    f.write("*) echo \"$jobid|RUNNING|0:0|00:00:05|\" ;;\n")
+    f.write("esac\n")
+    f.write("done\n")
+os.chmod(os.path.join(fake_bin_directory, "sacct"), 0o777)
+
+
+class TestSacctStatus(unittest.TestCase):
+    def test_parse_sacct_output(self):
+        records = parse_sacct_output(long_info_sacct)
+        self.assertEqual(set(records), {58508061, 58508062, "58508063_0", "58508063_1", "58508063_2"})
+        self.assertEqual(records[58508061].state, "COMPLETED")
+        self.assertEqual(records[58508061].max_rss, "1024K")
+        self.assertEqual(records[58508062].state, "OUT_OF_MEMORY")
+        self.assertEqual(records["58508063_2"].state, "PENDING")
+
+    def test_unmapped_states(self):
+        self.assertIsNone(get_status_from_sacct_record(SacctRecord(1, "STOPPED", "0:0", "00:00:05", "")))
+        self.assertEqual(get_status_from_sacct_record(SacctRecord(1, "SPECIAL_EXIT", "1:0", "00:00:05", "")).state, FAILED)
+
+        # a job in an unmapped state is left to the queue and its output file, and is queried again
+        job = SlurmSubmission("testing", tempfile.mkdtemp(), ["echo __FINISHED__"], "00:00:02", "1000M", "testing_output.out", "testing_error.err")
+        job.submitted, job.jobid = True, 1
+        resolver = SacctStatusResolver()
+        with mock.patch.object(SlurmSubmission, "status_resolver", resolver), mock.patch.object(SlurmSubmission, "get_job_queue", return_value = set()),\
+                mock.patch("pybatchsub.slurm_submission.do_multiple_subprocess_attempts", return_value = b"1|STOPPED|0:0|00:00:05|\n"):
+            SlurmSubmission.update_batch_status([job])
+            SlurmSubmission.update_batch_status([job])
+        self.assertIsNone(job.batch_status)
+        self.assertEqual(resolver.queries, 2)
+        self.assertTrue(job.check_failed(job_queue = set()))
+        self.assertTrue(job.check_running(job_queue = {1}))
+
+    def test_bulk_resolution(self):
+        original_path = os.environ["PATH"]
+        os.environ["PATH"] = fake_bin_directory + os.pathsep + original_path
+        job_directory = tempfile.mkdtemp()
+        jobs = []
+        for i in range(0, 3):
+            job = SlurmSubmission("testing_{}".format(i), job_directory, ["echo __FINISHED__"], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i))
+            job.submitted = True
+            job.jobid = i + 1
+            jobs.append(job)
+        with open(jobs[0].output, "w") as f:
+            f.write("__FINISHED__\n")
+
+        SlurmSubmission.status_resolver = SacctStatusResolver(chunk_size=2)
+        try:
+            with mock.patch.object(SlurmSubmission, "get_job_queue", return_value = {3}):
+                SlurmSubmission.update_batch_status(jobs)
+            with mock.patch.object(SlurmSubmission, "get_job_queue", return_value = set()):
+                SlurmSubmission.update_batch_status(jobs)
+                SlurmSubmission.update_batch_status(jobs)
+        finally:
+            os.environ["PATH"] = original_path
+            SlurmSubmission.status_resolver = SacctStatusResolver()
+
+        # only the jobs missing from the queue are queried, in chunks, and jobs in a terminal state are not queried again
+        with open(sacct_log, "r") as f:
+            self.assertEqual([l.strip() for l in f.readlines()], ["1,2", "3", "3"])
+        self.assertEqual([job.batch_status.state for job in jobs], [COMPLETED, FAILED, RUNNING])
+        self.assertEqual(jobs[1].batch_status.reason, "TIMEOUT")
+
+        # jobs that terminated are not looked up in the queue, and the failed job's output is not read
+        self.assertFalse(jobs[0].check_running(job_queue = {1, 2, 3}))
+        self.assertTrue(jobs[0].check_finished())
+        self.assertTrue(jobs[1].check_failed(job_queue = {1, 2, 3}))
+        self.assertTrue(jobs[2].check_running(job_queue = {1, 2, 3}))
+
+    def test_failing_sacct(self):
+        # stand-ins for a sacct that can never work, and for one that fails intermittently
+        bin_directory = tempfile.mkdtemp()
+        log = os.path.join(bin_directory, "sacct.log")
+        job_directory = tempfile.mkdtemp()
+        jobs = [SlurmSubmission("testing_{}".format(i), job_directory, ["echo __FINISHED__"], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 3)]
+        for i, job in enumerate(jobs):
+            job.submitted = True
+            job.jobid = i + 1
+
+        original_path = os.environ["PATH"]
+        os.environ["PATH"] = bin_directory + os.pathsep + original_path
+        try:
+            for message, enabled in (("sacct: error: Slurm accounting storage is disabled", False), ("sacct: error: slurmdbd: Socket timed out", True)):
+                with open(os.path.join(bin_directory, "sacct"), "w") as f:
+                    f.write("#!/bin/sh\n")
+                    f.write("echo call >> {}\n".format(log))
+                    f.write("echo \"{}\" >&2\n".format(message))
+                    f.write("exit 1\n")
+                os.chmod(os.path.join(bin_directory, "sacct"), 0o777)
+                if os.path.exists(log): os.remove(log)
+
+                resolver = SacctStatusResolver(chunk_size = 1)
+                with mock.patch.object(SlurmSubmission, "status_resolver", resolver), mock.patch.object(SlurmSubmission, "get_job_queue", return_value = set()):
+                    start = time.monotonic()
+                    for attempt in range(0, 5):
+                        SlurmSubmission.update_batch_status(jobs)
+                    self.assertLess(time.monotonic() - start, 5)
+
+                # sacct is called once, and then either disabled or skipped during its cool-down
+                with open(log, "r") as f:
+                    self.assertEqual(len(f.readlines()), 1)
+                self.assertEqual(resolver.enabled, enabled)
+                self.assertTrue(all(job.batch_status is None for job in jobs))
+        finally:
+            os.environ["PATH"] = original_path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from unittest import mock
+from pybatchsub.simulator import SchedulerSimulator
+from pybatchsub.slurm_submission import SlurmSubmission, SacctStatusResolver
+from pybatchsub.condor_submission import CondorSubmission
+from pybatchsub.batch_submission import BatchSubmissionSet, FINISHED, FAILED, RUNNING, HELD
+from pybatchsub.utils import RetryPolicy
+import os
+import subprocess
+import tempfile
+
+
+def make_jobs(job_class, job_directory, n=4, time="00:00:02", memory="1000M"):
+    return [job_class("testing_{}".format(i), job_directory, ["echo {}".format(i), "echo __FINISHED__"], time, memory, "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, n)]
+
+
+class TestSchedulerSimulator(unittest.TestCase):
+    def setUp(self):
+        self.job_directory = tempfile.mkdtemp()
+        self.simulator = SchedulerSimulator(tick = None, pending_time = 60)
+        self.simulator.install()
+        self.patches = [mock.patch.dict(os.environ, {"USER": "user"}),\
+                mock.patch.object(SlurmSubmission, "status_resolver", SacctStatusResolver()),\
+                mock.patch.object(SlurmSubmission, "retry_policy", RetryPolicy(max_attempts = 1)),\
+                mock.patch.object(CondorSubmission, "retry_policy", RetryPolicy(max_attempts = 1))]
+        for patch in self.patches:
+            patch.start()
+        SlurmSubmission.invalidate_job_queue()
+        CondorSubmission.invalidate_job_queue()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.simulator.uninstall()
+
+    def test_slurm(self):
+        jobs = make_jobs(SlurmSubmission, self.job_directory)
+        jobset = BatchSubmissionSet(jobs)
+        jobset._submit_jobs(jobs[:3], array = True)
+        jobset._submit_jobs(jobs[3:])
+        self.assertEqual(jobs[1].jobid, "1_1")
+        self.assertEqual(jobs[3].jobid, 2)
+        # sacct isn't asked for the jobs that are in the queue
+        self.assertEqual(jobset.status_summary().counts[RUNNING], 4)
+        scheduler = self.simulator.get_scheduler()
+        self.assertEqual(scheduler.get_counter("calls_sacct"), 0)
+        scheduler.close()
+
+        # pending array tasks are compressed into one line without -r
+        output = subprocess.check_output(["squeue", "-u", "user"]).decode()
+        self.assertIn("1_[0,1,2]", output)
+
+        with mock.patch.object(SlurmSubmission, "restrict_queue_query", True),\
+                mock.patch.object(SlurmSubmission, "tracked_jobids", set()),\
+                mock.patch.object(SlurmSubmission, "departed_jobids", set()):
+            SlurmSubmission.track_jobids(["1_0", 3])
+            self.assertEqual(jobs[0].get_job_queue(), {"1_0", "1_1", "1_2"})
+            self.assertEqual(SlurmSubmission.tracked_jobids, {"1"})
+
+        self.simulator.configure(pending_time = 0, job_failure_rate = 1.0)
+        jobset._submit_jobs(jobs[2:3])
+        SlurmSubmission.invalidate_job_queue()
+        self.assertFalse(jobset.check_finished())
+        summary = jobset.status_summary()
+        self.assertEqual(summary.counts[FAILED], 1)
+        self.assertEqual(list(summary.indices[FAILED]), [2])
+        with open(jobs[2].error) as f:
+            self.assertIn("simulated failure", f.read())
+
+        scheduler = self.simulator.get_scheduler()
+        self.assertEqual(scheduler.get_counter("calls_sbatch"), 3)
+        scheduler.close()
+
+    def test_condor(self):
+        self.simulator.configure(pending_time = 0)
+        jobs = make_jobs(CondorSubmission, self.job_directory, time = "workday", memory = "1000")
+        jobset = BatchSubmissionSet(jobs)
+        jobset._submit_jobs(jobs[:3], array = True)
+        jobset._submit_jobs(jobs[3:])
+        self.assertEqual([job.jobid for job in jobs], [(1, 0), (1, 1), (1, 2), (2, 0)])
+        self.simulator.advance()
+
+        self.assertEqual(jobset.status_summary().counts[FINISHED], 4)
+        self.assertTrue(jobset.check_finished())
+        CondorSubmission.invalidate_job_queue()
+        with mock.patch.object(CondorSubmission, "use_event_log", False):
+            self.assertFalse(jobset.check_running())
+
+    def test_condor_held(self):
+        jobs = make_jobs(CondorSubmission, self.job_directory, time = "workday", memory = "1000")
+        jobset = BatchSubmissionSet(jobs)
+        with mock.patch.object(CondorSubmission, "restrict_queue_query", True),\
+                mock.patch.object(CondorSubmission, "tracked_clusterids", set()),\
+                mock.patch.object(CondorSubmission, "departed_clusterids", set()):
+            jobset._submit_jobs(jobs[:2], array = True)
+            jobset._submit_jobs(jobs[2:3])
+            scheduler = self.simulator.get_scheduler()
+            scheduler.hold(1)
+            scheduler.close()
+
+            # the held jobs are neither running nor failed, and aren't resubmitted
+            with mock.patch.object(CondorSubmission, "use_event_log", False):
+                queue = jobs[0].get_job_queue()
+                self.assertEqual(queue, {(2, 0)})
+                self.assertEqual(queue.held, {(1, 0), (1, 1)})
+                self.assertEqual(CondorSubmission.tracked_clusterids, {1, 2})
+                self.assertEqual(jobset.get_failed_jobs(), [])
+                self.assertEqual(jobset.status_summary().counts[HELD], 2)
+            CondorSubmission.invalidate_job_queue()
+            self.assertEqual(jobset.status_summary().counts[HELD], 2)
+            self.assertEqual(jobs[0].batch_status.reason, "Job has gone over memory limit of 1000 megabytes. Code 34 Subcode 0")
+            self.assertEqual(jobset.resubmit(), [])
+
+            # submitting the set again doesn't submit the held jobs while they are in the queue
+            self.assertEqual(jobset.submit(array = True), [jobs[3]])
+            self.assertEqual([job.jobid for job in jobs], [(1, 0), (1, 1), (2, 0), (3, 0)])
+
+    def test_queue_size_and_failures(self):
+        self.simulator.configure(queue_size = 3)
+        jobs = make_jobs(SlurmSubmission, self.job_directory)
+        with self.assertRaises(subprocess.CalledProcessError):
+            SlurmSubmission.submit_array(jobs)
+        SlurmSubmission.submit_array(jobs[:3])
+
+        self.simulator.configure(failure_rate = 1.0)
+        with self.assertRaises(subprocess.CalledProcessError):
+            jobs[0].get_job_queue()
+
+    def test_execute(self):
+        self.simulator.configure(pending_time = 0, execute = True)
+        jobs = make_jobs(SlurmSubmission, self.job_directory, n = 2)
+        BatchSubmissionSet(jobs)._submit_jobs(jobs, array = True)
+        self.simulator.advance()
+        self.assertTrue(BatchSubmissionSet(jobs).check_finished())
+        with open(jobs[1].output) as f:
+            self.assertEqual(f.read(), "1\n__FINISHED__\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
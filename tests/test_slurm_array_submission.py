@@ -0,0 +1,106 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission, parse_jobid, parse_queue_output, parse_queue_stream
+from unittest import mock
+from pybatchsub.batch_submission import BatchSubmissionSet
+import os
+import tempfile
+
+# a stand-in for sbatch that records its arguments and reports a fixed jobid
+fake_bin_directory = tempfile.mkdtemp()
+sbatch_log = os.path.join(fake_bin_directory, "sbatch.log")
+with open(os.path.join(fake_bin_directory, "sbatch"), "w") as f:
+    f.write("#!/bin/sh\n")
+    f.write("echo \"$@\" >> {}\n".format(sbatch_log))
+    f.write("echo \"Submitted batch job 58508066\"\n")
+os.chmod(os.path.join(fake_bin_directory, "sbatch"), 0o777)
+
+job_directory = tempfile.mkdtemp()
+jobs = []
+for i in range(0, 4):
+    memory = "1000M" if i < 3 else "2000M"
+    jobs.append(SlurmSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i), "echo __FINISHED__"], "00:00:02", memory, "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)))
+jobset = BatchSubmissionSet(jobs)
+
+long_info_queue = b'JOBID     USER              ACCOUNT           NAME  ST  TIME_LEFT NODES CPUS TRES_PER_N MIN_MEM NODELIST (REASON) \n58508061  ladamek      def-psavard_cpu        test.sh  PD       1:00     1    1        N/A   1000M  (Priority) \n58508066_0  ladamek      def-psavard_cpu        test.sh  R       1:00     1    1        N/A   1000M  node1 \n58508066_[1-2,4%2]  ladamek      def-psavard_cpu        test.sh  PD       1:00     1    1        N/A   1000M  (Priority) \n\n'
+
+
+class TestSlurmArraySubmission(unittest.TestCase):
+    def test_parse_jobid(self):
+        self.assertEqual(parse_jobid("58508066"), [58508066])
+        self.assertEqual(parse_jobid("58508066_3"), ["58508066_3"])
+        self.assertEqual(parse_jobid("58508066_[1-3,5%2]"), ["58508066_1", "58508066_2", "58508066_3", "58508066_5"])
+
+    def test_queue_with_arrays(self):
+        self.assertEqual(parse_queue_output(long_info_queue), {58508061, "58508066_0", "58508066_1", "58508066_2", "58508066_4"})
+        self.assertEqual(parse_queue_output(long_info_queue.split(b"\n", 1)[0] + b"\n"), set())
+        self.assertEqual(parse_queue_output(b"", header = False), set())
+        self.assertEqual(parse_queue_stream([b"58508061\n", b"58508066_[1-2]\n", b"\n"]), {58508061, "58508066_1", "58508066_2"})
+
+    def test_restricted_queue_query(self):
+        with mock.patch.dict(os.environ, {"USER": "user"}),\
+                mock.patch.object(SlurmSubmission, "restrict_queue_query", True),\
+                mock.patch.object(SlurmSubmission, "tracked_jobids", set()),\
+                mock.patch.object(SlurmSubmission, "departed_jobids", set()):
+            self.assertEqual(jobs[0]._get_job_queue(), set()) # nothing is tracked, so squeue isn't called
+            SlurmSubmission.track_jobids([58508070, "58508066_1", "58508066_2"])
+            self.assertEqual(jobs[0].get_queue_command(), ["squeue", "-r", "--noheader", "-o", "%i", "-u", "user"])
+            self.assertEqual(jobs[0].get_queue_command(["58508066", "58508070"]), ["squeue", "-r", "--noheader", "-o", "%i", "-u", "user", "--jobs=58508066,58508070"])
+
+            # the tracked jobs are queried in chunks, whose outputs are merged
+            fake_squeue_directory = tempfile.mkdtemp()
+            squeue_log = os.path.join(fake_squeue_directory, "squeue.log")
+            with open(os.path.join(fake_squeue_directory, "squeue"), "w") as f:
+                f.write("#!/bin/sh\n")
+                f.write("jobs=\"$7\"\n")
+                f.write("echo \"$jobs\" >> {}\n".format(squeue_log))
+                f.write("echo \"$jobs\" | grep -q 58508070 && echo 58508070\n")
+                f.write("echo \"$jobs\" | grep -q 58508066 && echo 58508066_1\n")
+                f.write("exit 0\n")
+            os.chmod(os.path.join(fake_squeue_directory, "squeue"), 0o777)
+            with mock.patch.dict(os.environ, {"PATH": fake_squeue_directory + os.pathsep + os.environ["PATH"]}),\
+                    mock.patch("pybatchsub.slurm_submission.SQUEUE_CHUNK_SIZE", 1):
+                SlurmSubmission.track_jobids([58508071])
+                self.assertEqual(jobs[0]._get_job_queue(), {58508070, "58508066_1"})
+            with open(squeue_log, "r") as f:
+                self.assertEqual([line.strip() for line in f], ["--jobs=58508066", "--jobs=58508070", "--jobs=58508071"])
+            self.assertEqual(SlurmSubmission.departed_jobids, {"58508071"})
+
+            # the jobs that left the queue aren't asked for anymore, and jobs tracked during a query aren't forgotten
+            SlurmSubmission.track_jobids([58508072])
+            SlurmSubmission._forget_departed_jobids(["58508066", "58508070"], {"58508066_1"})
+            self.assertEqual(SlurmSubmission.tracked_jobids, {"58508066", "58508072"})
+            SlurmSubmission.track_jobids([58508070])
+            self.assertEqual(SlurmSubmission.tracked_jobids, {"58508066", "58508072"})
+
+    def test_array_submission(self):
+        original_path = os.environ["PATH"]
+        os.environ["PATH"] = fake_bin_directory + os.pathsep + original_path
+        try:
+            jobset._submit_jobs(jobs, array = True)
+        finally:
+            os.environ["PATH"] = original_path
+
+        # the jobs with different memory requirements are submitted in different arrays
+        with open(sbatch_log, "r") as f:
+            sbatch_calls = f.readlines()
+        self.assertEqual(len(sbatch_calls), 2)
+        self.assertIn("--array=0-2", sbatch_calls[0])
+        self.assertIn("--mem=1000M", sbatch_calls[0])
+        self.assertIn("--array=0-0", sbatch_calls[1])
+        self.assertIn("--mem=2000M", sbatch_calls[1])
+
+        self.assertEqual([job.jobid for job in jobs], ["58508066_0", "58508066_1", "58508066_2", "58508066_0"])
+        self.assertTrue(all(job.submitted for job in jobs))
+        self.assertTrue(jobs[1].check_running(job_queue = {"58508066_1"}))
+
+        # the dispatch script runs the script of the job selected by the array task id
+        dispatch_script = os.path.join(job_directory, "testing_0_array.sh")
+        for task_id in range(0, 3):
+            os.system("SLURM_ARRAY_TASK_ID={} {}".format(task_id, dispatch_script))
+            self.assertTrue(jobs[task_id].check_finished())
+            with open(jobs[task_id].output, "r") as f:
+                self.assertEqual(f.readline(), "{}\n".format(task_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
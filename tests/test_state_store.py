@@ -0,0 +1,78 @@
+import unittest
+from pybatchsub.slurm_submission import SlurmSubmission
+from pybatchsub.condor_submission import CondorSubmission
+from pybatchsub.condor_event_log import CondorEventLogReader
+from pybatchsub.batch_submission import BatchSubmissionSet, BatchJobStatus, FAILED
+from pybatchsub.state_store import JobStateStore
+import os
+import tempfile
+
+
+def make_jobs(job_directory, n=4):
+    return [SlurmSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i)], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, n)]
+
+
+class TestJobStateStore(unittest.TestCase):
+    def setUp(self):
+        self.job_directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.job_directory, "state.db")
+
+    def test_reload(self):
+        jobs = make_jobs(self.job_directory)
+        jobs[0].jobid, jobs[0].submitted, jobs[0].attempts = 12345, True, 1
+        jobs[1].jobid, jobs[1].submitted, jobs[1].attempts = "6789_1", True, 2
+        jobs[2].jobid, jobs[2].submitted, jobs[2].attempts = (42, 3), True, 1
+        jobs[2].batch_status = BatchJobStatus(FAILED, 1, "NonZeroExitCode")
+        jobs[3].finished = True
+        BatchSubmissionSet(jobs, state_store = JobStateStore(self.path)).state_store.close()
+
+        jobset = BatchSubmissionSet.load(self.path)
+        self.assertEqual([type(job) for job in jobset.jobs], [SlurmSubmission] * 4)
+        self.assertEqual([job.get_state() for job in jobset.jobs], [job.get_state() for job in jobs])
+        self.assertEqual([job.get_parameters() for job in jobset.jobs], [job.get_parameters() for job in jobs])
+        self.assertEqual(jobset.jobs[2].jobid, (42, 3))
+        self.assertEqual(jobset.jobs[2].batch_status, BatchJobStatus(FAILED, 1, "NonZeroExitCode"))
+        self.assertTrue(jobset.jobs[3].check_finished())
+
+    def test_load_does_not_write_scripts(self):
+        jobs = make_jobs(self.job_directory)
+        jobs[0].materialize_script()
+        BatchSubmissionSet(jobs, state_store = JobStateStore(self.path)).state_store.close()
+        os.remove(jobs[0].script)
+
+        jobset = BatchSubmissionSet.load(self.path)
+        self.assertEqual(len(jobset.jobs), 4)
+        self.assertFalse(any(os.path.exists(job.script) for job in jobset.jobs))
+        self.assertEqual([job.script_materialized for job in jobset.jobs], [True, False, False, False])
+
+    def test_reload_offsets_and_container_script_function(self):
+        container_script_function = lambda *args: None
+        jobs = make_jobs(self.job_directory, 2)
+        jobs[0].jobid, jobs[0].submitted, jobs[0].output_offset = 12345, True, 100
+        condor_job = CondorSubmission("testing_condor", self.job_directory, ["echo 0"], "workday", "1000", "testing_output_condor.out", "testing_error_condor.err")
+        condor_job.jobid, condor_job.submitted = (42, 0), True
+        condor_job._event_log_reader = CondorEventLogReader(condor_job.logfile, 200)
+        BatchSubmissionSet(jobs + [condor_job], state_store = JobStateStore(self.path)).state_store.close()
+
+        jobset = BatchSubmissionSet.load(self.path, container_script_function = container_script_function)
+        self.assertEqual([job.output_offset for job in jobset.jobs], [100, 0, 0])
+        self.assertEqual(jobset.jobs[2]._event_log_reader.offset, 200)
+        self.assertTrue(all(job.container_script_function is container_script_function for job in jobset.jobs))
+
+    def test_unchanged_jobs_are_not_written(self):
+        jobs = make_jobs(self.job_directory)
+        store = JobStateStore(self.path, batch_size = 2)
+        jobset = BatchSubmissionSet(jobs, state_store = store)
+        self.assertEqual(len(store._pending), 0)
+
+        jobs[1].jobid = 1
+        for job in jobs:
+            store.record(job)
+        self.assertEqual(list(store._pending), [(self.job_directory, "testing_1")])
+        jobset.save()
+        self.assertEqual(len(store._pending), 0)
+        self.assertEqual(JobStateStore(self.path).load_jobs()[1].jobid, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
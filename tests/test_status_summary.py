@@ -0,0 +1,50 @@
+import unittest
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchSubmissionSet, BatchJobStatus, NOT_SUBMITTED, PENDING, RUNNING, HELD, FINISHED, FAILED
+from pybatchsub.job_queue import get_queued_mask, JobQueueSnapshot
+import tempfile
+
+
+class QueueSubmission(AbstractBatchSubmission):
+    """
+    A batch submission whose queue is a fixed set of jobids, and that counts the queries of the queue.
+    """
+    queue = set()
+    queries = 0
+
+    def _get_job_queue(self):
+        type(self).queries += 1
+        return type(self).queue
+
+    def _submit(self):
+        return None
+
+
+class TestStatusSummary(unittest.TestCase):
+    def test_queued_mask(self):
+        jobids = [1, "1_0", "1_1", (1, 0), (1, 1), 2, None]
+        self.assertEqual(list(get_queued_mask(jobids, {1, "1_1", (1, 0)})), [True, False, True, True, False, False, False])
+
+    def test_summary(self):
+        job_directory = tempfile.mkdtemp()
+        jobs = [QueueSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i)], "00:00:02", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 9)]
+        for i, job in enumerate(jobs[1:]):
+            job.submitted = True
+            job.jobid = "100_{}".format(i)
+        QueueSubmission.queue = JobQueueSnapshot({"100_0", "100_1"}, held = {"100_7"})
+        jobs[2].batch_status = BatchJobStatus(PENDING, None, None)
+        for job in jobs[3:5]:
+            with open(job.output, "w") as f:
+                f.write("__FINISHED__\n")
+        jobs[5].batch_status = BatchJobStatus(FAILED, 1, "FAILED")
+        jobs[7].batch_status = BatchJobStatus(HELD, None, "Job has gone over memory limit of 1000 megabytes.")
+
+        summary = BatchSubmissionSet(jobs).status_summary()
+        self.assertEqual(summary.counts, {NOT_SUBMITTED: 1, PENDING: 1, RUNNING: 1, HELD: 2, FINISHED: 2, FAILED: 2})
+        self.assertEqual({state: list(indices) for state, indices in summary.indices.items()},\
+                {NOT_SUBMITTED: [0], PENDING: [2], RUNNING: [1], HELD: [7, 8], FINISHED: [3, 4], FAILED: [5, 6]})
+        self.assertEqual(QueueSubmission.queries, 1)
+        self.assertTrue(jobs[3].finished)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -40,6 +40,13 @@ class TestSlurmBatchSubmission(unittest.TestCase):
         self.assertEqual(time_translation_slurm_to_condor("02:00:00"), "testmatch")
         self.assertEqual(time_translation_slurm_to_condor("10:00:00"), "nextweek")
 
+    def test_get_time_in_seconds(self):
+        self.assertEqual(get_time_in_seconds("espresso"), 20 * 60)
+        self.assertEqual(get_time_in_seconds("00:08:00"), 8 * 3600)
+        self.assertEqual(get_time_in_seconds("01:00:30"), 24 * 3600 + 30 * 60)
+        self.assertEqual(get_time_in_seconds("notatime"), None)
+        self.assertEqual(get_time_in_seconds(None), None)
+
     def time_time_translation_condor_to_slurm(self):
         self.assertEqual("workday", "00:08:00")
         self.assertEqual("nextweek", "07:00:00")
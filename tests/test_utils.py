@@ -0,0 +1,195 @@
+import unittest
+from pybatchsub.utils import find_line_in_file, RetryPolicy, do_multiple_subprocess_attempts, stream_subprocess_output, prepare_directory, remove_file, parse_memory, check_if_memory, memory_translation_to_slurm, memory_translation_to_condor
+import errno
+import os
+import subprocess
+import tempfile
+import time
+
+token = "__FINISHED__"
+filler = "x" * 99 + "\n"
+
+
+class TestFindLineInFile(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "testing_output.out")
+
+    def write(self, text, mode="w"):
+        with open(self.path, mode) as f:
+            f.write(text)
+
+    def test_whole_lines_only(self):
+        self.write("Hello World\n" + token + "_NOT\n" + " " + token + "\n")
+        self.assertFalse(find_line_in_file(self.path, token)[0])
+        self.write(token + "\nHello World\n")
+        self.assertTrue(find_line_in_file(self.path, token)[0])
+        self.write("Hello World\n" + token)
+        self.assertTrue(find_line_in_file(self.path, token)[0])
+        self.write("Hello World\r\n" + token + "\r\n")
+        self.assertTrue(find_line_in_file(self.path, token)[0])
+
+    def test_token_before_tail(self):
+        self.write(token + "\n" + filler * 10000)
+        self.assertTrue(find_line_in_file(self.path, token)[0])
+        self.write(filler * 10000 + token + "\n" + filler * 10000)
+        self.assertTrue(find_line_in_file(self.path, token)[0])
+
+    def test_incremental_search(self):
+        self.write(filler * 10000)
+        found, offset = find_line_in_file(self.path, token)
+        self.assertFalse(found)
+        self.assertEqual(offset, len(filler) * 10000)
+
+        # a line that is still being written is searched again once it is complete
+        self.write(filler + token[:5], mode="a")
+        found, offset = find_line_in_file(self.path, token, offset)
+        self.assertFalse(found)
+        self.assertEqual(offset, len(filler) * 10001)
+        self.write(token[5:] + "\n" + filler, mode="a")
+        self.assertTrue(find_line_in_file(self.path, token, offset)[0])
+
+        # bytes before the offset are not searched again
+        self.assertFalse(find_line_in_file(self.path, token, os.path.getsize(self.path))[0])
+
+    def test_recreated_file(self):
+        self.write(filler * 10)
+        found, offset = find_line_in_file(self.path, token)
+        self.write(token + "\n")
+        self.assertTrue(find_line_in_file(self.path, token, offset)[0])
+
+
+class FlakyFunction:
+    """
+    A function that fails a number of times before it succeeds.
+    """
+    def __init__(self, failures, exception):
+        self.failures = failures
+        self.exception = exception
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exception
+        return self.calls
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_retries(self):
+        policy = RetryPolicy(max_attempts=5, initial_delay=0.001)
+        self.assertEqual(policy.call(FlakyFunction(3, OSError("busy"))), 4)
+        self.assertEqual((policy.statistics.calls, policy.statistics.attempts, policy.statistics.retries, policy.statistics.failures), (1, 4, 3, 0))
+
+        flaky = FlakyFunction(10, OSError("busy"))
+        with self.assertRaises(OSError):
+            policy.call(flaky)
+        self.assertEqual(flaky.calls, 5)
+        self.assertEqual(policy.statistics.failures, 1)
+
+    def test_backoff(self):
+        policy = RetryPolicy(initial_delay=1.0, multiplier=2.0, max_delay=5.0, jitter=0.5)
+        for attempt, nominal_delay in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)]:
+            delay = policy.get_delay(attempt)
+            self.assertLessEqual(delay, nominal_delay)
+            self.assertGreaterEqual(delay, nominal_delay * 0.5)
+
+        policy = RetryPolicy(max_attempts=100, initial_delay=0.02, multiplier=1.0, jitter=0.0, max_elapsed=0.1)
+        flaky = FlakyFunction(100, OSError("busy"))
+        with self.assertRaises(OSError):
+            policy.call(flaky)
+        self.assertLessEqual(flaky.calls, 6)
+
+    def test_classification(self):
+        policy = RetryPolicy(initial_delay=0.001, retryable_exit_codes={1})
+        missing_command = FlakyFunction(10, FileNotFoundError("sbatch"))
+        with self.assertRaises(FileNotFoundError):
+            policy.call(missing_command)
+        self.assertEqual(missing_command.calls, 1)
+
+        invalid_argument = FlakyFunction(10, subprocess.CalledProcessError(1, ["sbatch"], stderr=b"sbatch: error: Batch job submission failed: Invalid account"))
+        with self.assertRaises(subprocess.CalledProcessError):
+            policy.call(invalid_argument)
+        self.assertEqual(invalid_argument.calls, 1)
+
+        wrong_exit_code = FlakyFunction(10, subprocess.CalledProcessError(2, ["sbatch"]))
+        with self.assertRaises(subprocess.CalledProcessError):
+            policy.call(wrong_exit_code)
+        self.assertEqual(wrong_exit_code.calls, 1)
+
+        too_long = FlakyFunction(10, OSError(errno.E2BIG, "Argument list too long"))
+        with self.assertRaises(OSError):
+            policy.call(too_long)
+        self.assertEqual(too_long.calls, 1)
+
+        self.assertEqual(policy.call(FlakyFunction(2, subprocess.CalledProcessError(1, ["sbatch"], stderr=b"Socket timed out"))), 3)
+
+    def test_commands(self):
+        policy = RetryPolicy(max_attempts=3, initial_delay=0.001, timeout=0.2)
+        self.assertEqual(do_multiple_subprocess_attempts(["echo", "Hello World"], retry_policy = policy), b"Hello World\n")
+        with self.assertRaises(subprocess.CalledProcessError):
+            do_multiple_subprocess_attempts(["sh", "-c", "exit 3"], retry_policy = policy)
+        start = time.monotonic()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            do_multiple_subprocess_attempts(["sleep", "10"], retry_policy = policy)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(policy.statistics.attempts, 7)
+
+    def test_stream(self):
+        policy = RetryPolicy(max_attempts=2, initial_delay=0.001, timeout=0.2)
+        self.assertEqual(stream_subprocess_output(["seq", "1", "1000"], lambda lines: sum(int(line) for line in lines), retry_policy = policy), 500500)
+        # the output that isn't parsed is drained
+        self.assertEqual(stream_subprocess_output(["seq", "1", "100000"], lambda lines: next(lines), retry_policy = policy), b"1\n")
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            stream_subprocess_output(["sh", "-c", "echo Invalid job id >&2; exit 1"], list, retry_policy = policy)
+        self.assertIn(b"Invalid job id", context.exception.stderr)
+        with self.assertRaises(subprocess.TimeoutExpired):
+            stream_subprocess_output(["sleep", "10"], list, retry_policy = policy)
+        self.assertEqual(policy.statistics.attempts, 5) # the invalid job id is not retried
+
+
+class TestFileHelpers(unittest.TestCase):
+    def test_prepare_directory(self):
+        directory = os.path.join(tempfile.mkdtemp(), "a", "b")
+        prepare_directory(directory)
+        self.assertTrue(os.path.isdir(directory))
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o777)
+
+        # a prepared directory is not touched again
+        os.chmod(directory, 0o755)
+        prepare_directory(directory)
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o755)
+
+    def test_remove_file(self):
+        path = os.path.join(tempfile.mkdtemp(), "testing_output.out")
+        with open(path, "w") as f:
+            f.write("Hello World\n")
+        self.assertTrue(remove_file(path))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(remove_file(path))
+
+
+class TestMemory(unittest.TestCase):
+    def test_parse_memory(self):
+        self.assertEqual(parse_memory("4G"), 4 * 1024 ** 3)
+        self.assertEqual(parse_memory("4GB"), parse_memory("4 GiB"))
+        self.assertEqual(parse_memory("1.5g"), 1536 * 1024 ** 2)
+        self.assertEqual(parse_memory("2048"), 2048 * 1024 ** 2)
+        self.assertEqual(parse_memory(2048), 2048 * 1024 ** 2)
+        self.assertEqual(parse_memory("512K"), 512 * 1024)
+        self.assertEqual(parse_memory("100B"), 100)
+        for memory in ["", "G", "4X", "-1G", "4 G B", None, True]:
+            self.assertFalse(check_if_memory(memory))
+            with self.assertRaises(ValueError):
+                parse_memory(memory)
+
+    def test_memory_translation(self):
+        self.assertEqual(memory_translation_to_slurm("4G"), "4096M")
+        self.assertEqual(memory_translation_to_slurm("1000"), "1000M")
+        self.assertEqual(memory_translation_to_slurm("1000M"), "1000M")
+        self.assertEqual(memory_translation_to_condor("4GB"), "4096")
+        self.assertEqual(memory_translation_to_condor("1000M"), "1000")
+        self.assertEqual(memory_translation_to_condor("1500K"), "2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from pybatchsub.batch_submission import AbstractBatchSubmission, BatchSubmissionSet, FINISHED
+from unittest import mock
+import tempfile
+
+
+class QueueSubmission(AbstractBatchSubmission):
+    """
+    A batch submission whose queue is a set of jobids, to which submitted jobs are added.
+    """
+    queue = set()
+
+    def _get_job_queue(self):
+        return type(self).queue
+
+    def _submit(self):
+        jobid = int(self.jobname.split("_")[1])
+        type(self).queue.add(jobid)
+        return jobid
+
+
+class FakeClock:
+    """
+    A clock that only advances when sleeping, and runs an action after each sleep.
+    """
+    def __init__(self, actions):
+        self.now = 0.0
+        self.sleeps = []
+        self.actions = actions
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        if len(self.actions) > 0:
+            self.actions.pop(0)()
+
+
+class TestWait(unittest.TestCase):
+    def setUp(self):
+        job_directory = tempfile.mkdtemp()
+        self.jobs = [QueueSubmission("testing_{}".format(i), job_directory, ["echo {}".format(i)], "espresso", "1000M", "testing_output_{}.out".format(i), "testing_error_{}.err".format(i)) for i in range(0, 10)]
+        self.jobset = BatchSubmissionSet(self.jobs)
+        QueueSubmission.queue = set()
+        self.jobset.submit()
+
+    def finish(self, indices, failed=()):
+        for index in indices:
+            QueueSubmission.queue.discard(index)
+            if index not in failed:
+                with open(self.jobs[index].output, "w") as f:
+                    f.write("__FINISHED__\n")
+
+    def run_wait(self, clock, **kwargs):
+        with mock.patch("pybatchsub.batch_submission.time.monotonic", clock.monotonic), mock.patch("pybatchsub.batch_submission.time.sleep", clock.sleep):
+            return self.jobset.wait(**kwargs)
+
+    def test_adaptive_interval(self):
+        clock = FakeClock([lambda: None, lambda: self.finish(range(0, 5)), lambda: self.finish(range(5, 10), failed = [5]), lambda: self.finish([5])])
+        progress = []
+        self.assertTrue(self.run_wait(clock, on_progress = lambda summary: progress.append(summary.counts[FINISHED]), max_attempts = 2, min_interval = 1))
+
+        # a twentieth of the 20 minutes of an espresso job, then a back off, then five jobs complete in 90 seconds
+        self.assertEqual(clock.sleeps, [60, 90, 4.5, 1])
+        self.assertEqual(progress, [0, 0, 5, 9, 9, 10])
+        self.assertEqual(self.jobs[5].attempts, 2)
+
+    def test_timeout(self):
+        clock = FakeClock([])
+        self.assertFalse(self.run_wait(clock, timeout = 100))
+        self.assertEqual(clock.sleeps, [60, 40])
+
+    def test_failure_budget(self):
+        clock = FakeClock([lambda: self.finish(range(0, 10), failed = [3])])
+        self.assertFalse(self.run_wait(clock))
+        self.assertEqual(self.jobs[3].attempts, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()